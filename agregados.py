@@ -0,0 +1,618 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cubo de conteos de viajes para las visualizaciones
+- Un solo paso de agregación sobre (mes, semana, dia_semana, hora_salida, origen, destino)
+- Se guarda junto al Parquet del dataset (.cubo.npz) y se regenera si el CSV cambia
+- Los gráficos filtran por mes/temporada sumando a lo sumo 12 cortes de marginales densas,
+  así que su costo no depende de la cantidad de viajes
+- Se construye por bloques (AgregadorPorGrupo): agregados parciales que se combinan
+  bloque a bloque, con memoria acotada aunque el log de viajes no entre en memoria
+
+Uso:
+    python agregados.py            # construye (o actualiza) el cubo del dataset
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datos import DATASET_PATHS, FILAS_POR_BLOQUE, buscar_dataset, iterar_dataset
+
+# Dimensiones del cubo (en este orden)
+DIMENSIONES_CUBO = ['mes', 'semana', 'dia_semana', 'hora_salida', 'origen', 'destino']
+
+# Columnas del dataset necesarias para construirlo
+COLUMNAS_CUBO = DIMENSIONES_CUBO + ['Usuario_key', 'origen_lat', 'origen_lon']
+
+# Tamaño mínimo de las dimensiones numéricas (se indexan por su valor)
+TAMANOS_MINIMOS = {'mes': 13, 'dia_semana': 7, 'hora_salida': 24}
+
+# Versión del formato en disco
+VERSION_CUBO = 1
+
+
+def path_cubo(csv_path):
+    """Ruta del cubo generado a partir del CSV"""
+    return os.path.splitext(csv_path)[0] + ".cubo.npz"
+
+
+def _codigos(serie, categorias):
+    """Códigos enteros de una serie según una lista de categorías"""
+    return pd.Categorical(serie, categories=categorias).codes.astype(np.int64)
+
+
+def _valores(serie):
+    """Serie con los valores de una categórica (los códigos no son comparables entre bloques)"""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    categorias = serie.cat.categories
+    if serie.hasnans and not pd.api.types.is_string_dtype(categorias.dtype):
+        return serie.astype(object)
+    return serie.astype(categorias.dtype)
+
+
+def _sumar(acumulado, parcial):
+    """Suma alineada por índice de dos agregados parciales (Series o DataFrame)"""
+    return parcial if acumulado is None else acumulado.add(parcial, fill_value=0)
+
+
+class AgregadorPorGrupo:
+    """groupby(claves).agg(operaciones) incremental, bloque a bloque.
+
+    Cada bloque se reduce a agregados parciales por grupo (groupby de pandas) que se
+    combinan con los anteriores: conteos, sumas y sumas de cuadrados se suman,
+    'first' se queda con el primer valor no nulo, los conjuntos de valores distintos
+    se unen y las frecuencias de cada valor (para la moda) se suman. La memoria
+    depende de la cantidad de grupos, no de la cantidad de filas.
+
+    Operaciones: 'first', 'sum', 'count', 'mean', 'var', 'std', 'nunique' y 'mode'
+    (el valor más frecuente, el menor si hay empate, como Series.mode()[0]).
+    'first', 'count', 'nunique' y 'mode' coinciden exactamente con pandas sobre el
+    dataset en memoria. 'sum' y 'mean' suman las sumas parciales de cada bloque y
+    pueden diferir en el último ulp; 'var'/'std' salen de la suma de cuadrados
+    (pandas usa Welford) y pueden diferir en los últimos decimales.
+    Los bloques se deben pasar en el orden del dataset.
+    """
+
+    OPERACIONES = ('first', 'sum', 'count', 'mean', 'var', 'std', 'nunique', 'mode')
+
+    def __init__(self, claves, operaciones=None):
+        self.claves = list(claves)
+        self.operaciones = dict(operaciones or {})
+        desconocidas = {op for op in self.operaciones.values() if op not in self.OPERACIONES}
+        if desconocidas:
+            raise ValueError(f"Operaciones no soportadas: {sorted(desconocidas)}")
+        self._columnas = {op: [c for c, o in self.operaciones.items() if o == op] for op in self.OPERACIONES}
+        self._numericas = [c for c, op in self.operaciones.items() if op in ('sum', 'count', 'mean', 'var', 'std')]
+        self._cuadrados = [c for c, op in self.operaciones.items() if op in ('var', 'std')]
+        self.tamanos = None
+        self.n_filas = 0
+        self._tipos_primeros = {}
+        self._primeros = None
+        self._sumas = None
+        self._cuentas = None
+        self._cuadrados_acumulados = None
+        self._distintos = {}
+        self._frecuencias = {}
+
+    def agregar(self, bloque):
+        """Combina un bloque (DataFrame con las claves y las columnas de las operaciones)"""
+        bloque = pd.DataFrame({c: _valores(bloque[c]) for c in dict.fromkeys(self.claves + list(self.operaciones))})
+        self.n_filas += len(bloque)
+        grupos = bloque.groupby(self.claves, sort=False, observed=True, dropna=True)
+        self.tamanos = _sumar(self.tamanos, grupos.size())
+
+        primeros = self._columnas['first']
+        if primeros:
+            parcial = grupos[primeros].first()
+            if self._primeros is None:
+                self._tipos_primeros = parcial.dtypes.to_dict()
+                self._primeros = parcial
+            else:
+                self._primeros = self._primeros.combine_first(parcial)
+
+        if self._numericas:
+            numericas = grupos[self._numericas]
+            # min_count=1: un grupo sin valores queda NaN y no pisa las sumas de otros bloques
+            self._sumas = _sumar(self._sumas, numericas.sum(min_count=1).astype(np.float64))
+            self._cuentas = _sumar(self._cuentas, numericas.count()).astype(np.int64)
+            if self._cuadrados:
+                cuadrados = bloque[self._cuadrados].astype(np.float64) ** 2
+                por_grupo = cuadrados.groupby([bloque[c] for c in self.claves], sort=False, observed=True, dropna=True)
+                self._cuadrados_acumulados = _sumar(self._cuadrados_acumulados, por_grupo.sum(min_count=1))
+
+        for columna in self._columnas['nunique']:
+            parcial = bloque[self.claves + [columna]].dropna().drop_duplicates()
+            if columna in self._distintos:
+                parcial = pd.concat([self._distintos[columna], parcial], ignore_index=True).drop_duplicates()
+            self._distintos[columna] = parcial.reset_index(drop=True)
+
+        for columna in self._columnas['mode']:
+            self._frecuencias[columna] = _sumar(self._frecuencias.get(columna), grupos[columna].value_counts())
+
+    def distintos(self, columna):
+        """DataFrame (claves..., columna) con los pares distintos vistos (operación 'nunique')"""
+        if columna not in self._distintos:
+            return pd.DataFrame(columns=self.claves + [columna])
+        return self._distintos[columna]
+
+    def _moda(self, columna):
+        frecuencias = self._frecuencias[columna].rename('_frecuencia').reset_index()
+        frecuencias = frecuencias.sort_values(self.claves + ['_frecuencia', columna],
+                                              ascending=[True] * len(self.claves) + [False, True], kind='stable')
+        return frecuencias.drop_duplicates(self.claves).set_index(self.claves)[columna]
+
+    def resultado(self):
+        """DataFrame indexado por las claves (ordenadas), con una columna por operación"""
+        if self.tamanos is None:
+            return pd.DataFrame(columns=list(self.operaciones))
+        indice = self.tamanos.sort_index().index
+        columnas = {}
+        for columna, op in self.operaciones.items():
+            if op == 'first':
+                valores = self._primeros[columna].reindex(indice)
+                tipo = self._tipos_primeros[columna]
+                if not valores.hasnans and valores.dtype != tipo:
+                    valores = valores.astype(tipo)
+            elif op == 'nunique':
+                valores = self.distintos(columna).groupby(self.claves).size().reindex(indice, fill_value=0)
+            elif op == 'mode':
+                valores = self._moda(columna).reindex(indice)
+            else:
+                suma = self._sumas[columna].reindex(indice)
+                n = self._cuentas[columna].reindex(indice)
+                if op == 'sum':
+                    valores = suma.fillna(0)
+                elif op == 'count':
+                    valores = n
+                elif op == 'mean':
+                    valores = suma / n.where(n > 0)
+                else:
+                    cuadrados = self._cuadrados_acumulados[columna].reindex(indice)
+                    valores = ((cuadrados - suma ** 2 / n.where(n > 0)) / (n - 1).where(n > 1)).clip(lower=0)
+                    if op == 'std':
+                        valores = np.sqrt(valores)
+            columnas[columna] = valores.to_numpy()
+        return pd.DataFrame(columnas, index=indice)
+
+
+class CuboViajes:
+    """Conteo de viajes por (mes, semana, dia_semana, hora_salida, origen, destino).
+
+    Guarda solo las celdas con viajes (códigos por dimensión + conteo). Las
+    consultas usan marginales densas con el mes como primer eje, calculadas una
+    vez por combinación de dimensiones: filtrar por meses es sumar filas.
+    Origen y destino comparten el vocabulario `estaciones` (ordenado).
+    """
+
+    def __init__(self, celdas, conteos, estaciones, semanas, usuarios_por_mes=None,
+                 lat_origen=None, lon_origen=None):
+        self.celdas = celdas
+        self.conteos = conteos
+        self.estaciones = estaciones
+        self.semanas = semanas
+        self.usuarios_por_mes = usuarios_por_mes
+        self.lat_origen = lat_origen
+        self.lon_origen = lon_origen
+        self.tamanos = {
+            'mes': max(TAMANOS_MINIMOS['mes'], int(celdas['mes'].max(initial=0)) + 1),
+            'semana': max(len(semanas), 1),
+            'dia_semana': max(TAMANOS_MINIMOS['dia_semana'], int(celdas['dia_semana'].max(initial=0)) + 1),
+            'hora_salida': max(TAMANOS_MINIMOS['hora_salida'], int(celdas['hora_salida'].max(initial=0)) + 1),
+            'origen': len(estaciones),
+            'destino': len(estaciones)
+        }
+        self.n_viajes = int(conteos.sum())
+        self._marginales = {}
+
+    @property
+    def tiene_semana(self):
+        return len(self.semanas) > 0
+
+    @property
+    def tiene_usuarios(self):
+        return self.usuarios_por_mes is not None
+
+    @property
+    def tiene_coordenadas(self):
+        return self.lat_origen is not None
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        """Construye el cubo a partir del dataset completo en memoria"""
+        return cls.desde_bloques([df])
+
+    @classmethod
+    def desde_bloques(cls, bloques):
+        """Construye el cubo recorriendo el dataset por bloques (iterable de DataFrames).
+
+        Por bloque se agregan los conteos por celda, los pares (mes, usuario) distintos
+        y la primera coordenada de cada origen; al final se traducen a códigos. El
+        resultado es el mismo sin importar cómo se partió el dataset.
+        """
+        dimensiones = celdas = usuarios = coordenadas = None
+        estaciones, semanas = set(), set()
+        for bloque in bloques:
+            if dimensiones is None:
+                faltantes = [c for c in DIMENSIONES_CUBO if c != 'semana' and c not in bloque.columns]
+                if faltantes:
+                    raise ValueError(f"El dataset no contiene las columnas necesarias para el cubo: {faltantes}")
+                dimensiones = [dim for dim in DIMENSIONES_CUBO if dim in bloque.columns]
+                celdas = AgregadorPorGrupo(dimensiones)
+                if 'Usuario_key' in bloque.columns:
+                    usuarios = AgregadorPorGrupo(['mes'], {'Usuario_key': 'nunique'})
+                if 'origen_lat' in bloque.columns and 'origen_lon' in bloque.columns:
+                    # Mismo criterio que groupby('origen').agg('first'): primer valor no nulo de cada origen
+                    coordenadas = AgregadorPorGrupo(['origen'], {'origen_lat': 'first', 'origen_lon': 'first'})
+
+            origen = bloque['origen'].astype(str).where(bloque['origen'].notna())
+            destino = bloque['destino'].astype(str).where(bloque['destino'].notna())
+            bloque = bloque.assign(origen=origen, destino=destino)
+            estaciones.update(origen.dropna().unique().tolist())
+            estaciones.update(destino.dropna().unique().tolist())
+            if 'semana' in dimensiones:
+                semanas.update(_valores(bloque['semana']).dropna().unique().tolist())
+
+            celdas.agregar(bloque)
+            # Viajes con alguna dimensión faltante no entran al cubo (tampoco cuentan en value_counts)
+            if usuarios is not None:
+                usuarios.agregar(bloque[bloque[dimensiones].notna().all(axis=1)])
+            if coordenadas is not None:
+                coordenadas.agregar(bloque)
+
+        if dimensiones is None:
+            raise ValueError("El dataset no tiene filas para construir el cubo")
+
+        estaciones = np.array(sorted(estaciones), dtype=object)
+        semanas = np.array(sorted(semanas), dtype=object)
+        conteos_celda = celdas.tamanos
+        niveles = {dim: conteos_celda.index.get_level_values(dim) for dim in dimensiones}
+        codigos = {
+            'mes': np.asarray(niveles['mes'], dtype=np.int64),
+            'semana': _codigos(niveles['semana'], semanas) if 'semana' in niveles else np.zeros(len(conteos_celda), dtype=np.int64),
+            'dia_semana': np.asarray(niveles['dia_semana'], dtype=np.int64),
+            'hora_salida': np.asarray(niveles['hora_salida'], dtype=np.int64),
+            'origen': _codigos(niveles['origen'], estaciones),
+            'destino': _codigos(niveles['destino'], estaciones)
+        }
+
+        tamanos = [int(codigos[dim].max(initial=0)) + 1 for dim in DIMENSIONES_CUBO]
+        orden = np.argsort(np.ravel_multi_index([codigos[dim] for dim in DIMENSIONES_CUBO], tamanos), kind='stable')
+        celdas_cubo = {
+            dim: codigo[orden].astype(np.int32 if dim in ('origen', 'destino', 'semana') else np.int8)
+            for dim, codigo in codigos.items()
+        }
+        conteos = conteos_celda.to_numpy()[orden].astype(np.int32)
+
+        usuarios_por_mes = None
+        if usuarios is not None:
+            pares = usuarios.distintos('Usuario_key')
+            mes = pares['mes'].to_numpy(np.int64)
+            usuario = pd.Categorical(pares['Usuario_key']).codes.astype(np.int64)
+            n_usuarios = int(usuario.max(initial=-1)) + 1
+            usuarios_por_mes = np.zeros((max(TAMANOS_MINIMOS['mes'], tamanos[0]), n_usuarios), dtype=bool)
+            usuarios_por_mes[mes, usuario] = True
+
+        lat_origen = lon_origen = None
+        if coordenadas is not None:
+            primeras = coordenadas.resultado().reindex(estaciones)
+            lat_origen = primeras['origen_lat'].to_numpy(np.float64)
+            lon_origen = primeras['origen_lon'].to_numpy(np.float64)
+
+        return cls(celdas_cubo, conteos, estaciones, semanas, usuarios_por_mes, lat_origen, lon_origen)
+
+    def guardar(self, path):
+        arrays = {f"celda_{dim}": codigo for dim, codigo in self.celdas.items()}
+        arrays['conteos'] = self.conteos
+        arrays['estaciones'] = self.estaciones.astype(str)
+        arrays['semanas'] = self.semanas.astype(str)
+        arrays['semanas_numericas'] = np.array(
+            bool(len(self.semanas)) and all(isinstance(s, (int, np.integer)) for s in self.semanas))
+        arrays['version'] = np.array(VERSION_CUBO)
+        if self.tiene_usuarios:
+            arrays['usuarios_por_mes'] = np.packbits(self.usuarios_por_mes, axis=1)
+            arrays['n_usuarios'] = np.array(self.usuarios_por_mes.shape[1])
+        if self.tiene_coordenadas:
+            arrays['lat_origen'] = self.lat_origen
+            arrays['lon_origen'] = self.lon_origen
+
+        # Escribir a un temporal y renombrar (igual que el Parquet)
+        temporal = path + ".tmp.npz"
+        np.savez_compressed(temporal, **arrays)
+        os.replace(temporal, path)
+
+    @classmethod
+    def cargar(cls, path):
+        """Carga el cubo; None si el archivo es de otra versión del formato"""
+        with np.load(path, allow_pickle=False) as datos:
+            if 'version' not in datos or int(datos['version']) != VERSION_CUBO:
+                return None
+            celdas = {dim: datos[f"celda_{dim}"] for dim in DIMENSIONES_CUBO}
+            semanas = datos['semanas'].astype(object)
+            if bool(datos['semanas_numericas']):
+                semanas = np.array([int(s) for s in semanas], dtype=object)
+            usuarios_por_mes = None
+            if 'usuarios_por_mes' in datos:
+                n_usuarios = int(datos['n_usuarios'])
+                usuarios_por_mes = np.unpackbits(datos['usuarios_por_mes'], axis=1, count=n_usuarios).astype(bool)
+            lat_origen = datos['lat_origen'] if 'lat_origen' in datos else None
+            lon_origen = datos['lon_origen'] if 'lon_origen' in datos else None
+            return cls(celdas, datos['conteos'], datos['estaciones'].astype(object), semanas,
+                       usuarios_por_mes, lat_origen, lon_origen)
+
+    def marginal(self, dimensiones):
+        """Array denso (mes, *dimensiones) con la cantidad de viajes; se calcula una vez"""
+        dimensiones = tuple(dimensiones)
+        if dimensiones not in self._marginales:
+            ejes = ('mes',) + dimensiones
+            forma = tuple(self.tamanos[dim] for dim in ejes)
+            indice = np.ravel_multi_index([self.celdas[dim].astype(np.int64) for dim in ejes], forma)
+            conteo = np.bincount(indice, weights=self.conteos, minlength=int(np.prod(forma)))
+            self._marginales[dimensiones] = conteo.astype(np.int64).reshape(forma)
+        return self._marginales[dimensiones]
+
+    def contar(self, dimensiones=(), meses=None):
+        """Viajes por las dimensiones pedidas, sumando solo los meses indicados (None = todos)"""
+        marginal = self.marginal(dimensiones)
+        if meses is None:
+            return marginal.sum(axis=0)
+        return marginal[np.asarray(list(meses), dtype=np.int64)].sum(axis=0)
+
+    def meses_disponibles(self):
+        return [int(m) for m in np.flatnonzero(self.contar(('mes',)))]
+
+    def usuarios_unicos(self, meses=None):
+        """Usuarios distintos con algún viaje en los meses indicados (None si no hay Usuario_key)"""
+        if not self.tiene_usuarios:
+            return None
+        filas = self.usuarios_por_mes if meses is None else self.usuarios_por_mes[np.asarray(list(meses), dtype=np.int64)]
+        return int(np.any(filas, axis=0).sum())
+
+    def serie_estaciones(self, dimension, meses=None):
+        """Serie estación -> viajes (solo estaciones con viajes), como value_counts sin ordenar"""
+        conteo = self.contar((dimension,), meses)
+        presentes = np.flatnonzero(conteo)
+        return pd.Series(conteo[presentes], index=pd.Index(self.estaciones[presentes], name=dimension))
+
+    def top_estaciones(self, dimension, n=15, meses=None):
+        """Las n estaciones con más viajes (desempate por nombre, como value_counts)"""
+        serie = self.serie_estaciones(dimension, meses)
+        orden = np.argsort(-serie.to_numpy(), kind='stable')[:n]
+        return serie.iloc[orden]
+
+
+class SubmatrizOD:
+    """Corte de la matriz OD: conteos enteros con los códigos de estación de filas y columnas"""
+
+    def __init__(self, conteos, filas, columnas, estaciones):
+        self.conteos = conteos
+        self.filas = filas
+        self.columnas = columnas
+        self.estaciones = estaciones
+
+    @property
+    def vacia(self):
+        return self.conteos.size == 0
+
+    @property
+    def total(self):
+        return int(self.conteos.sum())
+
+    @property
+    def nombres_filas(self):
+        return self.estaciones[self.filas].tolist()
+
+    @property
+    def nombres_columnas(self):
+        return self.estaciones[self.columnas].tolist()
+
+    def _reindexar(self, filas, columnas):
+        """Submatriz con las posiciones pedidas de filas y columnas"""
+        return SubmatrizOD(self.conteos[np.ix_(filas, columnas)], self.filas[filas],
+                           self.columnas[columnas], self.estaciones)
+
+    def ordenada(self):
+        """Filas y columnas ordenadas por total de viajes (descendente, desempate estable)"""
+        return self._reindexar(np.argsort(-self.conteos.sum(axis=1), kind='stable'),
+                               np.argsort(-self.conteos.sum(axis=0), kind='stable'))
+
+    def sincronizada(self):
+        """Matriz cuadrada con el mismo orden en ambos ejes: el de las columnas, limitado a
+        las estaciones que también son filas. Sin estaciones en común se devuelve igual."""
+        posicion_fila = {codigo: i for i, codigo in enumerate(self.filas)}
+        comunes = [(posicion_fila[codigo], j) for j, codigo in enumerate(self.columnas) if codigo in posicion_fila]
+        if not comunes:
+            return self
+        filas, columnas = (np.array(posiciones, dtype=np.int64) for posiciones in zip(*comunes))
+        return self._reindexar(filas, columnas)
+
+    def normalizada_por_fila(self):
+        """Probabilidad de destino dado origen (filas sin viajes quedan en 0)"""
+        totales = self.conteos.sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(totales > 0, self.conteos / np.maximum(totales, 1), 0.0)
+
+    def a_dataframe(self, valores=None):
+        return pd.DataFrame(self.conteos if valores is None else valores,
+                            index=pd.Index(self.nombres_filas, name='origen'),
+                            columns=pd.Index(self.nombres_columnas, name='destino'))
+
+
+class MatrizOD:
+    """Matriz origen x destino de conteos enteros indexada por código de estación.
+
+    `conteos` tiene forma (meses, horas, estaciones, estaciones); los ejes de mes
+    y hora tienen tamaño 1 cuando la matriz no se separa por ellos. Las
+    selecciones son indexaciones de arrays: no vuelven a recorrer los viajes.
+    """
+
+    def __init__(self, conteos, estaciones):
+        self.conteos = conteos
+        self.estaciones = estaciones
+        self.codigo = {nombre: i for i, nombre in enumerate(estaciones)}
+        self.total_por_celda = conteos.sum(axis=(0, 1), dtype=np.int64)
+        self.totales_origen = self.total_por_celda.sum(axis=1)
+        self.totales_destino = self.total_por_celda.sum(axis=0)
+
+    @property
+    def por_mes(self):
+        return self.conteos.shape[0] > 1
+
+    @property
+    def por_hora(self):
+        return self.conteos.shape[1] > 1
+
+    @classmethod
+    def desde_cubo(cls, cubo, por_mes=False, por_hora=False):
+        """Matriz OD a partir del cubo, opcionalmente separada por mes y/o por hora"""
+        n = len(cubo.estaciones)
+        n_meses = cubo.tamanos['mes'] if por_mes else 1
+        n_horas = cubo.tamanos['hora_salida'] if por_hora else 1
+        mes = cubo.celdas['mes'].astype(np.int64) if por_mes else 0
+        hora = cubo.celdas['hora_salida'].astype(np.int64) if por_hora else 0
+        indice = ((mes * n_horas + hora) * n + cubo.celdas['origen'].astype(np.int64)) * n \
+            + cubo.celdas['destino'].astype(np.int64)
+        conteos = np.bincount(indice, weights=cubo.conteos, minlength=n_meses * n_horas * n * n)
+        return cls(conteos.astype(np.int32).reshape(n_meses, n_horas, n, n), cubo.estaciones)
+
+    def matriz(self, meses=None, horas=None):
+        """Conteos (estaciones x estaciones) de los meses/horas pedidos (None = todos)"""
+        if meses is None and horas is None:
+            return self.total_por_celda
+        if (meses is not None and not self.por_mes) or (horas is not None and not self.por_hora):
+            raise ValueError("La matriz OD no está separada por la dimensión pedida")
+        conteos = self.conteos
+        if meses is not None:
+            conteos = conteos[np.asarray(list(meses), dtype=np.int64)]
+        if horas is not None:
+            conteos = conteos[:, np.asarray(list(horas), dtype=np.int64)]
+        return conteos.sum(axis=(0, 1), dtype=np.int64)
+
+    def codigos(self, nombres):
+        """Códigos de las estaciones conocidas, ordenados (se ignoran nombres desconocidos)"""
+        return np.array(sorted({self.codigo[nombre] for nombre in nombres if nombre in self.codigo}), dtype=np.int64)
+
+    def origenes(self):
+        """Nombres de las estaciones que aparecen como origen (orden alfabético)"""
+        return self.estaciones[np.flatnonzero(self.totales_origen)].tolist()
+
+    def destinos(self):
+        return self.estaciones[np.flatnonzero(self.totales_destino)].tolist()
+
+    def top_origenes(self, n=15):
+        """Las n estaciones con más viajes como origen (desempate por nombre)"""
+        orden = np.argsort(-self.totales_origen, kind='stable')[:n]
+        return self.estaciones[orden[self.totales_origen[orden] > 0]].tolist()
+
+    def top_destinos(self, n=15):
+        orden = np.argsort(-self.totales_destino, kind='stable')[:n]
+        return self.estaciones[orden[self.totales_destino[orden] > 0]].tolist()
+
+    def submatriz(self, origenes, destinos, meses=None, horas=None):
+        """Conteos de los orígenes x destinos pedidos, como pd.crosstab(...).loc[origenes, destinos].
+
+        Solo entran estaciones con viajes como origen (filas) o destino (columnas)
+        en los meses/horas pedidos; el orden es el de los códigos (alfabético).
+        """
+        matriz = self.matriz(meses, horas)
+        filas = self.codigos(origenes)
+        columnas = self.codigos(destinos)
+        filas = filas[matriz[filas].sum(axis=1) > 0]
+        columnas = columnas[matriz[:, columnas].sum(axis=0) > 0]
+        return SubmatrizOD(matriz[np.ix_(filas, columnas)], filas, columnas, self.estaciones)
+
+    def cobertura(self, submatriz, meses=None, horas=None):
+        """Porcentaje de los viajes (de los meses/horas pedidos) que cubre la submatriz"""
+        total = int(self.matriz(meses, horas).sum())
+        return submatriz.total / total * 100 if total > 0 else 0.0
+
+
+def construir_cubo(csv_path, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Cubo del CSV recorriendo el dataset por bloques (memoria acotada)"""
+    bloques, _ = iterar_dataset(COLUMNAS_CUBO, [csv_path], filas_por_bloque)
+    return CuboViajes.desde_bloques(bloques)
+
+
+def cubo_actualizado(csv_path):
+    """Cubo del CSV, regenerándolo si no existe, es de otra versión o es más viejo que el CSV"""
+    path = path_cubo(csv_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path):
+        cubo = CuboViajes.cargar(path)
+        if cubo is not None:
+            return cubo
+
+    cubo = construir_cubo(csv_path)
+    try:
+        cubo.guardar(path)
+    except OSError:
+        pass  # Directorio de solo lectura: se usa el cubo en memoria
+    return cubo
+
+
+def huella_dataset(csv_path):
+    """Huella del CSV (ruta, tamaño, mtime) para claves de cache"""
+    stat = os.stat(csv_path)
+    return (os.path.abspath(csv_path), stat.st_size, stat.st_mtime_ns)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_cubo_cacheado(csv_path, huella):
+    return cubo_actualizado(csv_path)
+
+
+def load_cubo(paths=None):
+    """Cubo del dataset para la app (uno por proceso). Devuelve (cubo, csv_path) o (None, None)"""
+    csv_path = buscar_dataset(paths)
+    if csv_path is None:
+        return None, None
+    return _load_cubo_cacheado(csv_path, huella_dataset(csv_path)), csv_path
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_matriz_od_cacheada(csv_path, huella, por_mes, por_hora):
+    return MatrizOD.desde_cubo(_load_cubo_cacheado(csv_path, huella), por_mes=por_mes, por_hora=por_hora)
+
+
+def load_matriz_od(paths=None, por_mes=False, por_hora=False):
+    """Matriz OD del dataset para la app (una por proceso y separación), o None sin dataset"""
+    csv_path = buscar_dataset(paths)
+    if csv_path is None:
+        return None
+    return _load_matriz_od_cacheada(csv_path, huella_dataset(csv_path), por_mes, por_hora)
+
+
+def main():
+    print("=" * 70)
+    print("CUBO DE VIAJES")
+    print("=" * 70)
+
+    csv_path = buscar_dataset(DATASET_PATHS)
+    if csv_path is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        return
+
+    t0 = time.time()
+    cubo = construir_cubo(csv_path)
+    cubo.guardar(path_cubo(csv_path))
+    print(f"[OK] Cubo guardado en: {path_cubo(csv_path)} ({time.time() - t0:.1f} s)")
+    print(f"     Viajes: {cubo.n_viajes:,} en {len(cubo.conteos):,} celdas")
+    print(f"     Estaciones: {len(cubo.estaciones)} | Semanas: {len(cubo.semanas)} | "
+          f"Usuarios: {cubo.usuarios_por_mes.shape[1] if cubo.tiene_usuarios else 'N/A'}")
+    print(f"     Tamaño: {os.path.getsize(path_cubo(csv_path)) / 1024:,.1f} KB")
+
+    print("\n" + "=" * 70)
+    print("[OK] PROCESO COMPLETADO")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
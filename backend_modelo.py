@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backends de modelo para la predicción de destinos
+- Interfaz común (BackendModelo): crear el estimador con sus hiperparámetros, describir el
+  entrenamiento, importancias de features y serialización
+- random_forest: RandomForestClassifier (el modelo de siempre; compatible con motor_forest,
+  el registro mmap, el formato compacto y el entrenamiento incremental)
+- hist_gradient_boosting: HistGradientBoostingClassifier (árboles sobre histogramas con
+  early stopping; el artefacto entra en 100 MB sin recortar el modelo)
+
+Los modelos que crean los backends siguen la API de clasificadores de sklearn (fit,
+predict_proba, classes_, feature_names_in_, feature_importances_), que es lo que usan la
+app, predecir_lote.py, la tabla top-k y el servicio de predicción: el .pkl puede ser de
+cualquier backend.
+"""
+
+from abc import ABC, abstractmethod
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.utils.validation import check_is_fitted
+
+# Backend de los scripts de entrenamiento si no se indica otro
+BACKEND_DEFAULT = 'random_forest'
+
+
+class HistGradientBoostingDestinos(HistGradientBoostingClassifier):
+    """HistGradientBoostingClassifier con `feature_importances_` como los demás modelos de árboles.
+
+    La importancia de cada feature es la ganancia total de los splits que la usan
+    (en todas las iteraciones y clases), normalizada para sumar 1.
+    """
+
+    @property
+    def feature_importances_(self):
+        check_is_fitted(self)
+        ganancias = np.zeros(self.n_features_in_)
+        for predictores in self._predictors:
+            for predictor in predictores:
+                nodos = predictor.nodes
+                internos = ~nodos['is_leaf'].astype(bool)
+                np.add.at(ganancias, nodos['feature_idx'][internos], nodos['gain'][internos])
+        total = ganancias.sum()
+        return ganancias / total if total > 0 else ganancias
+
+
+class BackendModelo(ABC):
+    """Cómo se crea, describe y guarda un modelo de destinos.
+
+    Subclases: definir `nombre`, `titulo`, `HIPERPARAMETROS` (ajustables, por
+    defecto), `crear`, `resumen_entrenamiento` y `es_del_backend`.
+    """
+
+    nombre = None
+    titulo = None
+    HIPERPARAMETROS = {}
+
+    @abstractmethod
+    def crear(self, hiperparametros=None, random_state=None):
+        """Estimador sin entrenar con HIPERPARAMETROS actualizados con `hiperparametros`"""
+
+    @abstractmethod
+    def resumen_entrenamiento(self, modelo):
+        """Líneas que describen el modelo entrenado (OOB, iteraciones, ...)"""
+
+    @abstractmethod
+    def es_del_backend(self, modelo):
+        """True si `modelo` es un estimador de este backend"""
+
+    def importancias(self, modelo, features=None):
+        """Importancia de cada feature como Series (ordenada como las features del modelo)"""
+        index = features if features is not None else getattr(modelo, 'feature_names_in_', None)
+        return pd.Series(modelo.feature_importances_, index=index)
+
+    def guardar(self, modelo, path):
+        """Serializa con joblib comprimido (compress=3, como los scripts de entrenamiento)"""
+        joblib.dump(modelo, path, compress=3)
+
+    def cargar(self, path):
+        modelo = joblib.load(path)
+        if not self.es_del_backend(modelo):
+            raise ValueError(f"{path} no es un modelo {self.nombre}")
+        return modelo
+
+    def _hiperparametros(self, hiperparametros):
+        combinados = dict(self.HIPERPARAMETROS)
+        combinados.update(hiperparametros or {})
+        return combinados
+
+
+class BackendRandomForest(BackendModelo):
+    nombre = 'random_forest'
+    titulo = 'RANDOM FOREST'
+    HIPERPARAMETROS = {
+        'n_estimators': 95,
+        'max_depth': 15,
+        'min_samples_split': 15,
+        'min_samples_leaf': 5,
+        'max_features': 0.5
+    }
+
+    def crear(self, hiperparametros=None, random_state=None):
+        return RandomForestClassifier(
+            **self._hiperparametros(hiperparametros),
+            bootstrap=True,
+            oob_score=True,
+            class_weight=None,
+            random_state=random_state,
+            n_jobs=-1
+        )
+
+    def resumen_entrenamiento(self, modelo):
+        if hasattr(modelo, 'oob_score_'):
+            return [f"OOB score: {modelo.oob_score_*100:.2f}%"]
+        return [f"Árboles: {len(modelo.estimators_)}"]
+
+    def es_del_backend(self, modelo):
+        return isinstance(modelo, RandomForestClassifier)
+
+
+class BackendHistGradientBoosting(BackendModelo):
+    nombre = 'hist_gradient_boosting'
+    titulo = 'HIST GRADIENT BOOSTING'
+    HIPERPARAMETROS = {
+        'max_iter': 200,
+        'learning_rate': 0.1,
+        'max_leaf_nodes': 31,
+        'min_samples_leaf': 20,
+        'l2_regularization': 0.0,
+        'early_stopping': True,
+        'validation_fraction': 0.1,
+        'n_iter_no_change': 10
+    }
+
+    def crear(self, hiperparametros=None, random_state=None):
+        return HistGradientBoostingDestinos(**self._hiperparametros(hiperparametros), random_state=random_state)
+
+    def resumen_entrenamiento(self, modelo):
+        lineas = [f"Iteraciones: {modelo.n_iter_} "
+                  f"({modelo.n_iter_ * len(modelo.classes_):,} árboles, uno por clase e iteración)"]
+        if getattr(modelo, 'validation_score_', None) is not None and len(modelo.validation_score_):
+            lineas.append(f"Score de validación (early stopping): {modelo.validation_score_[-1]:.4f}")
+        return lineas
+
+    def es_del_backend(self, modelo):
+        return isinstance(modelo, HistGradientBoostingClassifier)
+
+
+BACKENDS = {
+    backend.nombre: backend
+    for backend in (BackendRandomForest(), BackendHistGradientBoosting())
+}
+
+
+def backend_de(modelo):
+    """Backend al que pertenece un modelo entrenado (None si no es de ninguno)"""
+    return next((backend for backend in BACKENDS.values() if backend.es_del_backend(modelo)), None)
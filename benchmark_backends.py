@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para comparar los backends de modelo (backend_modelo.py)
+- Mismo dataset, filtro y split que el script de entrenamiento elegido
+- Por backend: tiempo de entrenamiento, tamaño del artefacto (joblib compress=3),
+  latencia de predecir un viaje como lo hace la app (p50/p99) y accuracy top-1/top-3/top-5
+- El Random Forest se mide compilado con motor_forest (como lo usa la app); los demás
+  backends se usan tal cual
+
+Uso:
+    python benchmark_backends.py
+    python benchmark_backends.py --modelo ligero --muestras 200000
+"""
+
+import argparse
+import time
+import warnings
+warnings.filterwarnings("ignore")
+
+import numpy as np
+
+from backend_modelo import BACKEND_DEFAULT, BACKENDS
+from busqueda_hiperparametros import MODELOS, preparar_busqueda, tamano_comprimido
+from lib import accuracy_top_k, predict_top_k
+from motor_forest import compilar_modelo
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de modelo")
+    parser.add_argument("--modelo", choices=sorted(MODELOS), default='destino_favorito',
+                        help="Script de entrenamiento cuyos datos e hiperparámetros se usan")
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS),
+                        help="Backends a comparar")
+    parser.add_argument("--muestras", type=int, default=None,
+                        help="Viajes de entrenamiento (por defecto, todo el split de entrenamiento)")
+    parser.add_argument("--muestras-prueba", type=int, default=20000,
+                        help="Viajes del conjunto de prueba usados para medir accuracy")
+    parser.add_argument("--repeticiones", type=int, default=200,
+                        help="Viajes individuales para medir la latencia")
+    return parser.parse_args()
+
+
+def medir_latencia_viaje(modelo, X, repeticiones):
+    """(mediana, p99) en milisegundos de predecir el top-5 de un viaje, fila por fila"""
+    filas = np.asarray(X, dtype=np.float64)
+    predict_top_k(modelo, filas[:1], k=5)  # calentamiento
+    tiempos = []
+    for i in range(repeticiones):
+        fila = filas[i % len(filas):i % len(filas) + 1]
+        t0 = time.perf_counter()
+        predict_top_k(modelo, fila, k=5)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return np.median(tiempos), np.percentile(tiempos, 99)
+
+
+def medir_backend(backend, hiperparametros, datos, random_state, repeticiones):
+    """Entrena el backend y devuelve sus métricas"""
+    modelo = backend.crear(hiperparametros, random_state=random_state)
+    t0 = time.perf_counter()
+    modelo.fit(datos['X_train'], datos['y_train'])
+    tiempo_entrenamiento = time.perf_counter() - t0
+
+    tamano = tamano_comprimido(modelo)
+    modelo_app = compilar_modelo(modelo)
+    top_classes, _ = predict_top_k(modelo_app, datos['X_test'], k=5)
+    latencia_p50, latencia_p99 = medir_latencia_viaje(modelo_app, datos['X_test'], repeticiones)
+
+    return {
+        'modelo': modelo,
+        'entrenamiento_s': tiempo_entrenamiento,
+        'tamano_mb': tamano / 1024 / 1024,
+        'latencia_p50_ms': latencia_p50,
+        'latencia_p99_ms': latencia_p99,
+        'top1': accuracy_top_k(top_classes, datos['y_test'], 1),
+        'top3': accuracy_top_k(top_classes, datos['y_test'], 3),
+        'top5': accuracy_top_k(top_classes, datos['y_test'], 5)
+    }
+
+
+def main():
+    args = parse_args()
+    modulo = MODELOS[args.modelo]
+
+    print("=" * 70)
+    print("BENCHMARK DE BACKENDS DE MODELO")
+    print("=" * 70)
+
+    datos = preparar_busqueda(modulo, args.muestras_prueba, modulo.RANDOM_SEED)
+    if datos is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        return
+    if args.muestras is not None and args.muestras < len(datos['X_train']):
+        indices = datos['orden'][:args.muestras]
+        datos['X_train'] = datos['X_train'].iloc[indices].reset_index(drop=True)
+        datos['y_train'] = datos['y_train'][indices]
+    print(f"\n[OK] Entrenamiento: {len(datos['X_train']):,} viajes | prueba: {len(datos['X_test']):,} viajes")
+
+    resultados = {}
+    for nombre in args.backends:
+        backend = BACKENDS[nombre]
+        hiperparametros = modulo.HIPERPARAMETROS if nombre == BACKEND_DEFAULT else backend.HIPERPARAMETROS
+        print("\n" + "=" * 70)
+        print(f"BACKEND: {nombre}")
+        print("=" * 70)
+        for parametro, valor in hiperparametros.items():
+            print(f"  - {parametro}: {valor}")
+        resultado = medir_backend(backend, hiperparametros, datos, modulo.RANDOM_SEED, args.repeticiones)
+        resultados[nombre] = resultado
+        print(f"[OK] Entrenado en {resultado['entrenamiento_s']:.1f} s")
+        for linea in backend.resumen_entrenamiento(resultado['modelo']):
+            print(f"     {linea}")
+
+    print("\n" + "=" * 70)
+    print("COMPARACIÓN")
+    print("=" * 70)
+    print(f"{'Backend':<24} {'Entren. (s)':>11} {'Tamaño (MB)':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'Top-1':>7} {'Top-3':>7} {'Top-5':>7}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<24} {r['entrenamiento_s']:>11.1f} {r['tamano_mb']:>11.2f} "
+              f"{r['latencia_p50_ms']:>9.3f} {r['latencia_p99_ms']:>9.3f} "
+              f"{r['top1']*100:>6.2f}% {r['top3']*100:>6.2f}% {r['top5']*100:>6.2f}%")
+
+    print("\n" + "=" * 70)
+    print("[OK] BENCHMARK COMPLETADO")
+    print("=" * 70)
+    print("Para entrenar con otro backend: "
+          f"python {modulo.__name__}.py --backend {BACKENDS['hist_gradient_boosting'].nombre}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
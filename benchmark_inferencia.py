@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para medir latencia y throughput de inferencia del modelo de destinos
+- Compara RandomForestClassifier.predict_proba contra el motor aplanado (motor_forest)
+- Verifica que las probabilidades sean idénticas
+- Compara el Pipeline de preprocesamiento contra el camino rápido (VectorizadorRapido)
+- Simula tráfico repetido para medir el efecto del cache de predicciones
+- Si no hay modelo disponible, entrena uno sintético con la misma forma (--sintetico)
+"""
+
+import argparse
+import time
+import warnings
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+
+from lib import (load_model, load_stations, load_usuarios, create_preprocessor, process_input,
+                 predict_top_k, predict_top_k_cacheado, VectorizadorRapido, CachePredicciones,
+                 FEATURES_BASE, FEATURES_DESTINO_FAVORITO)
+from motor_forest import ForestCompilado
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de inferencia del modelo de destinos")
+    parser.add_argument("--sintetico", action="store_true",
+                        help="Usar un modelo sintético (95 árboles, profundidad 15) en lugar del entrenado")
+    parser.add_argument("--repeticiones", type=int, default=200,
+                        help="Repeticiones para medir la latencia de un viaje")
+    parser.add_argument("--lote", type=int, default=10000,
+                        help="Tamaño del lote para medir throughput")
+    return parser.parse_args()
+
+
+def modelo_sintetico(n_clases=89, n_muestras=60000, random_state=42):
+    """Entrena un Random Forest con la forma del modelo de destino favorito sobre datos aleatorios"""
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(random_state)
+    columnas = FEATURES_BASE + FEATURES_DESTINO_FAVORITO
+    X = pd.DataFrame(rng.normal(size=(n_muestras, len(columnas))), columns=columnas)
+    # Clases dependientes de algunas features para obtener árboles realistas
+    y = (np.abs(X.iloc[:, :3].sum(axis=1) * 15).astype(int) + rng.integers(0, 5, n_muestras)) % n_clases
+    modelo = RandomForestClassifier(
+        n_estimators=95, max_depth=15, min_samples_split=15, min_samples_leaf=5,
+        max_features=0.5, random_state=random_state, n_jobs=-1
+    )
+    modelo.fit(X, y.astype(str))
+    return modelo
+
+
+def datos_de_prueba(modelo, n_filas, random_state=0):
+    """Genera filas de prueba con el mismo esquema de features que el modelo"""
+    rng = np.random.default_rng(random_state)
+    columnas = list(modelo.feature_names_in_)
+    return pd.DataFrame(rng.normal(size=(n_filas, len(columnas))), columns=columnas)
+
+
+def medir_latencia(funcion, X, repeticiones):
+    """Devuelve (mediana, p99) en milisegundos de llamar funcion(X)"""
+    funcion(X)  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion(X)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return np.median(tiempos), np.percentile(tiempos, 99)
+
+
+def medir_throughput(funcion, X):
+    """Devuelve filas por segundo de llamar funcion(X) sobre un lote"""
+    t0 = time.perf_counter()
+    funcion(X)
+    return len(X) / (time.perf_counter() - t0)
+
+
+def benchmark_motor(modelo, args):
+    """Compara sklearn contra ForestCompilado en latencia, throughput y paridad"""
+    print("\n" + "=" * 70)
+    print("MOTOR APLANADO vs SKLEARN")
+    print("=" * 70)
+
+    t0 = time.perf_counter()
+    compilado = ForestCompilado.desde_sklearn(modelo)
+    print(f"[OK] Modelo compilado en {time.perf_counter() - t0:.2f} s "
+          f"({len(compilado.feature):,} nodos, {compilado.proba_hojas.shape[0]:,} hojas)")
+
+    X_lote = datos_de_prueba(modelo, args.lote)
+    X_fila = X_lote.iloc[[0]]
+
+    # Paridad
+    proba_sklearn = modelo.predict_proba(X_lote)
+    proba_motor = compilado.predict_proba(X_lote)
+    identicas = np.array_equal(proba_sklearn, proba_motor)
+    print(f"Probabilidades idénticas: {'SÍ' if identicas else 'NO'} "
+          f"(máx. diferencia {np.abs(proba_sklearn - proba_motor).max():.2e})")
+
+    # Latencia de un viaje
+    med_sk, p99_sk = medir_latencia(modelo.predict_proba, X_fila, args.repeticiones)
+    med_mo, p99_mo = medir_latencia(compilado.predict_proba, X_fila, args.repeticiones)
+    print(f"\n[LATENCIA 1 VIAJE]")
+    print(f"  sklearn: mediana {med_sk:.3f} ms | p99 {p99_sk:.3f} ms")
+    print(f"  motor:   mediana {med_mo:.3f} ms | p99 {p99_mo:.3f} ms")
+    print(f"  Mejora:  {med_sk / med_mo:.1f}x")
+
+    # Throughput
+    tp_sk = medir_throughput(modelo.predict_proba, X_lote)
+    tp_mo = medir_throughput(compilado.predict_proba, X_lote)
+    print(f"\n[THROUGHPUT LOTE DE {len(X_lote):,}]")
+    print(f"  sklearn: {tp_sk:,.0f} viajes/s")
+    print(f"  motor:   {tp_mo:,.0f} viajes/s")
+    print(f"  Mejora:  {tp_mo / tp_sk:.1f}x")
+
+    return compilado
+
+
+def inputs_formulario(n, random_state=0):
+    """Genera n entradas como las que arma el formulario de la página Modelo"""
+    rng = np.random.default_rng(random_state)
+    estaciones = list(load_stations().values()) or [{'lat': -32.89, 'lon': -68.84}]
+    usuarios = list(load_usuarios().values())
+
+    entradas = []
+    for i in range(n):
+        estacion = estaciones[rng.integers(len(estaciones))]
+        entrada = {
+            'origen_lat': estacion['lat'],
+            'origen_lon': estacion['lon'],
+            'hora_salida': int(rng.integers(0, 24)),
+            'dia_semana': int(rng.integers(0, 7)),
+            'mes': int(rng.integers(1, 13))
+        }
+        if i % 10 == 0:
+            # Coordenadas manuales que no coinciden con ninguna estación
+            entrada['origen_lat'] += float(rng.normal(scale=0.01))
+            entrada['origen_lon'] += float(rng.normal(scale=0.01))
+        if usuarios and i % 3 != 0:
+            usuario = usuarios[rng.integers(len(usuarios))]
+            entrada.update({k: v for k, v in usuario.items() if k != 'nombre'})
+            entrada['viajes_por_semana'] = entrada['viajes_totales'] / entrada['semanas_activas']
+        entradas.append(entrada)
+    return entradas
+
+
+def preprocessors_de_prueba(modelo):
+    """Preprocessor de la app y una variante con la tabla de estaciones cargada"""
+    preprocessors = {'sin estaciones': create_preprocessor(modelo=modelo)}
+
+    estaciones = load_stations()
+    if estaciones:
+        from lib import FeatureEngineeringGeografica
+        estaciones_data = pd.DataFrame([
+            {'station_lat': d['lat'], 'station_lon': d['lon'], 'station_capacity': d.get('capacidad', 15)}
+            for d in estaciones.values()
+        ])
+        con_estaciones = create_preprocessor(modelo=modelo)
+        con_estaciones.set_params(geografica=FeatureEngineeringGeografica(estaciones_data=estaciones_data))
+        con_estaciones.fit(pd.DataFrame({'origen_lat': [-32.89], 'origen_lon': [-68.84],
+                                         'hora_salida': [8], 'dia_semana': [0], 'mes': [3]}))
+        preprocessors['con estaciones'] = con_estaciones
+
+    return preprocessors
+
+
+def benchmark_vectorizador(modelo, compilado, args):
+    """Paridad y micro-benchmark del camino rápido frente al Pipeline"""
+    print("\n" + "=" * 70)
+    print("CAMINO RÁPIDO (VectorizadorRapido) vs PIPELINE")
+    print("=" * 70)
+
+    entradas = inputs_formulario(500)
+    for nombre, preprocessor in preprocessors_de_prueba(modelo).items():
+        vectorizador = VectorizadorRapido(preprocessor)
+
+        # Paridad: misma fila de features y mismo top-5
+        filas_distintas = 0
+        top_distintos = 0
+        for entrada in entradas:
+            fila_pipeline = process_input(entrada, preprocessor).to_numpy(dtype=np.float32)
+            fila_rapida = vectorizador.transform(entrada)
+            if not np.array_equal(fila_pipeline, fila_rapida, equal_nan=True):
+                filas_distintas += 1
+            top_pipeline, _ = predict_top_k(compilado, fila_pipeline)
+            top_rapido, _ = predict_top_k(compilado, fila_rapida)
+            if not np.array_equal(top_pipeline, top_rapido):
+                top_distintos += 1
+        estado = "OK" if filas_distintas == 0 and top_distintos == 0 else "ERROR"
+        print(f"[{estado}] Paridad ({nombre}): {len(entradas) - filas_distintas}/{len(entradas)} filas "
+              f"idénticas, {len(entradas) - top_distintos}/{len(entradas)} top-5 idénticos")
+
+    # Micro-benchmark sobre el preprocessor de la app
+    preprocessor = create_preprocessor(modelo=modelo)
+    vectorizador = VectorizadorRapido(preprocessor)
+    entrada = entradas[1]
+    med_pi, p99_pi = medir_latencia(lambda d: process_input(d, preprocessor), entrada, args.repeticiones)
+    med_ra, p99_ra = medir_latencia(vectorizador.transform, entrada, args.repeticiones)
+    print(f"\n[PREPROCESAMIENTO 1 VIAJE]")
+    print(f"  Pipeline:      mediana {med_pi:.3f} ms | p99 {p99_pi:.3f} ms")
+    print(f"  Camino rápido: mediana {med_ra:.3f} ms | p99 {p99_ra:.3f} ms")
+    print(f"  Mejora:        {med_pi / med_ra:.1f}x")
+
+    # Extremo a extremo: formulario -> top-5
+    med_antes, _ = medir_latencia(
+        lambda d: predict_top_k(modelo, process_input(d, preprocessor)), entrada, args.repeticiones)
+    med_despues, p99_despues = medir_latencia(
+        lambda d: predict_top_k(compilado, vectorizador.transform(d)), entrada, args.repeticiones)
+    print(f"\n[EXTREMO A EXTREMO 1 VIAJE]")
+    print(f"  Pipeline + sklearn:     mediana {med_antes:.3f} ms")
+    print(f"  Camino rápido + motor:  mediana {med_despues:.3f} ms | p99 {p99_despues:.3f} ms")
+    print(f"  Mejora:                 {med_antes / med_despues:.1f}x")
+
+
+def benchmark_cache(modelo, compilado, args):
+    """Tráfico simulado (pocas entradas distintas muy repetidas) con y sin cache"""
+    print("\n" + "=" * 70)
+    print("CACHE DE PREDICCIONES")
+    print("=" * 70)
+
+    vectorizador = VectorizadorRapido(create_preprocessor(modelo=modelo))
+    distintas = inputs_formulario(200, random_state=1)
+    # Popularidad tipo Zipf: pocas combinaciones concentran la mayoría de las consultas
+    rng = np.random.default_rng(2)
+    pesos = 1 / np.arange(1, len(distintas) + 1)
+    trafico = rng.choice(len(distintas), size=2000, p=pesos / pesos.sum())
+
+    t0 = time.perf_counter()
+    for i in trafico:
+        predict_top_k(compilado, vectorizador.transform(distintas[i]))
+    tiempo_sin_cache = time.perf_counter() - t0
+
+    cache = CachePredicciones(max_entradas=128)
+    t0 = time.perf_counter()
+    for i in trafico:
+        predict_top_k_cacheado(compilado, vectorizador.transform(distintas[i]), cache)
+    tiempo_con_cache = time.perf_counter() - t0
+
+    stats = cache.estadisticas()
+    print(f"Consultas: {len(trafico):,} ({len(distintas)} entradas distintas, cache de {stats['max_entradas']})")
+    print(f"  Aciertos: {stats['aciertos']:,} | Fallos: {stats['fallos']:,} | Tasa: {stats['tasa_aciertos']:.1%}")
+    print(f"  Sin cache: {tiempo_sin_cache / len(trafico) * 1000:.3f} ms/consulta")
+    print(f"  Con cache: {tiempo_con_cache / len(trafico) * 1000:.3f} ms/consulta")
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("BENCHMARK DE INFERENCIA")
+    print("=" * 70)
+
+    modelo = None if args.sintetico else load_model()
+    if modelo is not None and not hasattr(modelo, 'estimators_'):
+        print(f"[INFO] El modelo entrenado es {type(modelo).__name__}: el benchmark del motor usa un Random Forest")
+        modelo = None
+    if modelo is None:
+        print("\nEntrenando modelo sintético (95 árboles, profundidad 15)...")
+        modelo = modelo_sintetico()
+    print(f"[OK] Modelo: {len(modelo.estimators_)} árboles, {len(modelo.classes_)} clases")
+
+    compilado = benchmark_motor(modelo, args)
+    benchmark_vectorizador(modelo, compilado, args)
+    benchmark_cache(modelo, compilado, args)
+
+    print("\n" + "=" * 70)
+    print("[OK] BENCHMARK COMPLETADO")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de hiperparámetros del Random Forest de destinos
+- Configuraciones candidatas: las actuales del script de entrenamiento más una muestra
+  aleatoria del espacio de búsqueda
+- Successive halving: todas las configuraciones se entrenan con una submuestra chica del
+  conjunto de entrenamiento; solo la mejor fracción (1/eta) pasa a la ronda siguiente,
+  con eta veces más datos, hasta entrenar con el conjunto completo
+- Las pruebas de cada ronda se entrenan en un pool de procesos; la latencia se mide
+  después, de a un modelo y sin entrenamientos en paralelo que compitan por la CPU
+- Cada prueba se guarda en un archivo JSONL: accuracy, top-3/top-5, OOB, tamaño del
+  pickle comprimido y latencia de predicción de un viaje (motor_forest)
+- Reanudable: las pruebas ya guardadas (misma configuración, tamaño y dataset) no se
+  vuelven a entrenar, y los modelos entrenados que no llegaron a medirse se miden sin
+  reentrenarlos
+- La mejor configuración se escribe como JSON para `--hiperparametros` de los scripts de entrenamiento
+
+Uso:
+    python busqueda_hiperparametros.py --configuraciones 27 --procesos 4
+    python busqueda_hiperparametros.py --modelo ligero
+    python modelo_con_destino_favorito.py --hiperparametros modelos/hiperparametros_destino_favorito.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+import entrenar_modelo_ligero
+import modelo_con_destino_favorito
+from agregados import huella_dataset
+from lib import accuracy_top_k, predict_top_k
+from motor_forest import compilar_modelo
+
+# Scripts de entrenamiento cuyos datos e hiperparámetros se pueden buscar
+MODELOS = {
+    'destino_favorito': modelo_con_destino_favorito,
+    'ligero': entrenar_modelo_ligero
+}
+
+# Valores posibles de cada hiperparámetro
+ESPACIO_BUSQUEDA = {
+    'n_estimators': [50, 75, 95, 100, 150, 200],
+    'max_depth': [10, 12, 15, 20, 25, None],
+    'min_samples_split': [2, 5, 10, 15, 30],
+    'min_samples_leaf': [1, 2, 5, 10, 20],
+    'max_features': ['sqrt', 0.3, 0.5, 0.7]
+}
+
+# Métricas por las que se pueden ordenar las configuraciones (mayor es mejor)
+METRICAS = ('accuracy', 'top3', 'top5', 'oob')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros con successive halving")
+    parser.add_argument("--modelo", choices=sorted(MODELOS), default='destino_favorito',
+                        help="Script de entrenamiento cuyos datos se usan")
+    parser.add_argument("--configuraciones", type=int, default=27,
+                        help="Configuraciones de la primera ronda (incluye la actual del script)")
+    parser.add_argument("--eta", type=int, default=3,
+                        help="Factor de reducción: pasa 1/eta de las configuraciones con eta veces más datos")
+    parser.add_argument("--muestras-iniciales", type=int, default=20000,
+                        help="Viajes de entrenamiento en la primera ronda")
+    parser.add_argument("--muestras-prueba", type=int, default=20000,
+                        help="Viajes del conjunto de prueba usados para evaluar cada configuración")
+    parser.add_argument("--metrica", choices=METRICAS, default='accuracy',
+                        help="Métrica para elegir qué configuraciones pasan de ronda")
+    parser.add_argument("--repeticiones", type=int, default=200,
+                        help="Viajes individuales para medir la latencia de predicción")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="Procesos que entrenan configuraciones en paralelo")
+    parser.add_argument("--semilla", type=int, default=42,
+                        help="Semilla para muestrear configuraciones y submuestras")
+    parser.add_argument("--resultados", default=None,
+                        help="Archivo JSONL de resultados (por defecto modelos/busqueda_<modelo>.jsonl)")
+    parser.add_argument("--mejor", default=None,
+                        help="JSON con la mejor configuración (por defecto modelos/hiperparametros_<modelo>.json)")
+    return parser.parse_args()
+
+
+class ResultadosBusqueda:
+    """Resultados de pruebas en un archivo JSONL (una línea por prueba, indexadas por clave).
+
+    Cada prueba se agrega y se sincroniza a disco en cuanto termina, así una
+    búsqueda interrumpida conserva todo lo ya entrenado. Una línea incompleta al
+    final del archivo (corte durante la escritura) se ignora.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pruebas = {}
+        self._falta_salto = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    self._falta_salto = not linea.endswith("\n")
+                    try:
+                        prueba = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue
+                    self._pruebas[prueba['clave']] = prueba
+
+    def __len__(self):
+        return len(self._pruebas)
+
+    def __contains__(self, clave):
+        return clave in self._pruebas
+
+    def obtener(self, clave):
+        return self._pruebas.get(clave)
+
+    def guardar(self, prueba):
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if self._falta_salto:
+                f.write("\n")
+                self._falta_salto = False
+            f.write(json.dumps(prueba, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._pruebas[prueba['clave']] = prueba
+
+
+class ModelosPendientes:
+    """Modelos entrenados cuya latencia todavía no se midió (un .pkl por prueba).
+
+    Los procesos del pool guardan aquí cada modelo con sus métricas; el proceso
+    principal los mide de a uno cuando termina la ronda y los borra. Si la
+    búsqueda se interrumpe, los que quedaron se miden al reanudar.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+
+    def _path(self, clave):
+        return os.path.join(self.directorio, f"{clave}.pkl")
+
+    def __contains__(self, clave):
+        return os.path.exists(self._path(clave))
+
+    def guardar(self, clave, modelo, metricas):
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = f"{self._path(clave)}.{os.getpid()}.tmp"
+        joblib.dump({'modelo': modelo, 'metricas': metricas}, temporal)
+        os.replace(temporal, self._path(clave))
+
+    def cargar(self, clave):
+        """(modelo, métricas) guardados para la prueba"""
+        datos = joblib.load(self._path(clave))
+        return datos['modelo'], datos['metricas']
+
+    def eliminar(self, clave):
+        os.remove(self._path(clave))
+        try:
+            os.rmdir(self.directorio)  # solo si quedó vacío
+        except OSError:
+            pass
+
+
+def clave_prueba(modelo, configuracion, n_entrenamiento, huella, semilla):
+    """Identificador de una prueba: mismo script, configuración, tamaño, dataset y semilla"""
+    contenido = json.dumps([modelo, configuracion, n_entrenamiento, list(huella), semilla], sort_keys=True)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+def muestrear_configuraciones(actual, n, semilla):
+    """La configuración actual más n-1 configuraciones distintas del espacio de búsqueda"""
+    rng = np.random.default_rng(semilla)
+    configuraciones = [dict(actual)]
+    vistas = {json.dumps(actual, sort_keys=True)}
+    total_espacio = math.prod(len(valores) for valores in ESPACIO_BUSQUEDA.values())
+    while len(configuraciones) < min(n, total_espacio):
+        configuracion = {nombre: valores[rng.integers(len(valores))]
+                         for nombre, valores in ESPACIO_BUSQUEDA.items()}
+        clave = json.dumps(configuracion, sort_keys=True)
+        if clave not in vistas:
+            vistas.add(clave)
+            configuraciones.append(configuracion)
+    return configuraciones
+
+
+def tamanos_rondas(n_inicial, eta, n_total):
+    """Viajes de entrenamiento de cada ronda: n_inicial, n_inicial*eta, ... y la última con todos"""
+    tamanos = []
+    n = max(1, n_inicial)
+    while n < n_total:
+        tamanos.append(n)
+        n *= eta
+    tamanos.append(n_total)
+    return tamanos
+
+
+def ordenar_pruebas(pruebas, metrica):
+    """Mejor primero; ante empates, el modelo más chico"""
+    return sorted(pruebas, key=lambda p: (-p[metrica], p['tamano_bytes']))
+
+
+# Datos compartidos por las pruebas de cada proceso del pool (se envían una vez por proceso)
+_DATOS = {}
+
+
+def _inicializar_proceso(X_train, y_train, X_test, y_test, orden):
+    import warnings
+    warnings.filterwarnings("ignore")
+    _DATOS.update(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, orden=orden)
+
+
+def tamano_comprimido(modelo):
+    """Bytes del pickle de joblib con compress=3 (como lo guardan los scripts de entrenamiento)"""
+    buffer = io.BytesIO()
+    joblib.dump(modelo, buffer, compress=3)
+    return buffer.getbuffer().nbytes
+
+
+def latencia_un_viaje(modelo, X, repeticiones):
+    """(mediana, p99) en milisegundos de predecir un viaje con el motor de la app"""
+    compilado = compilar_modelo(modelo)
+    filas = np.ascontiguousarray(X, dtype=np.float32)
+    compilado.predict_proba(filas[:1])  # calentamiento
+    tiempos = []
+    for i in range(repeticiones):
+        fila = filas[i % len(filas):i % len(filas) + 1]
+        t0 = time.perf_counter()
+        compilado.predict_proba(fila)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(tiempos)), float(np.percentile(tiempos, 99))
+
+
+def medir_calidad(modelo, X_test, y_test):
+    """Accuracy top-1/top-3/top-5, tamaño comprimido y nodos de un Random Forest"""
+    # Top-k sobre las clases del modelo: con submuestras chicas pueden faltar destinos raros
+    top_classes, _ = predict_top_k(modelo, X_test, k=5)
+
+    return {
+        'accuracy': accuracy_top_k(top_classes, y_test, 1),
+        'top3': accuracy_top_k(top_classes, y_test, 3),
+        'top5': accuracy_top_k(top_classes, y_test, 5),
+        'tamano_bytes': tamano_comprimido(modelo),
+        'nodos': int(sum(arbol.tree_.node_count for arbol in modelo.estimators_))
+    }
+
+
+def entrenar_configuracion(clave, configuracion, n_entrenamiento, semilla, directorio_pendientes):
+    """Se ejecuta en un proceso del pool: entrena con los primeros n_entrenamiento viajes de la
+    submuestra, mide calidad y tamaño y deja el modelo en ModelosPendientes para medir su latencia"""
+    indices = _DATOS['orden'][:n_entrenamiento]
+    X_train = _DATOS['X_train'].iloc[indices]
+    y_train = _DATOS['y_train'][indices]
+    X_test, y_test = _DATOS['X_test'], _DATOS['y_test']
+
+    modelo = RandomForestClassifier(
+        **configuracion,
+        bootstrap=True,
+        oob_score=True,
+        class_weight=None,
+        random_state=semilla,
+        n_jobs=1
+    )
+    t0 = time.perf_counter()
+    modelo.fit(X_train, y_train)
+    tiempo_entrenamiento = time.perf_counter() - t0
+
+    metricas = {
+        **medir_calidad(modelo, X_test, y_test),
+        'oob': float(modelo.oob_score_),
+        'tiempo_entrenamiento_s': tiempo_entrenamiento
+    }
+    ModelosPendientes(directorio_pendientes).guardar(clave, modelo, metricas)
+    return metricas
+
+
+def preparar_busqueda(modulo, muestras_prueba, semilla, min_registros=None):
+    """Split del script de entrenamiento, prueba acotada y orden de submuestreo del entrenamiento.
+
+    Con `min_registros` se cambia el umbral de registros por destino del script.
+    """
+    dataset_path = modulo.buscar_dataset_entrenamiento()
+    if dataset_path is None:
+        return None
+
+    opciones = {} if min_registros is None else {'min_registros': min_registros}
+    X, y, _ = modulo.preparar_datos(dataset_path, **opciones)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=modulo.RANDOM_SEED, stratify=y
+    )
+    if len(X_test) > muestras_prueba:
+        X_test = X_test.sample(muestras_prueba, random_state=modulo.RANDOM_SEED)
+        y_test = y_test.loc[X_test.index]
+
+    # Submuestras anidadas: cada ronda usa un prefijo de la misma permutación
+    orden = np.random.default_rng(semilla).permutation(len(X_train))
+    return {
+        'dataset_path': dataset_path,
+        'X_train': X_train.reset_index(drop=True),
+        'y_train': y_train.to_numpy(copy=True),
+        'X_test': X_test.reset_index(drop=True),
+        'y_test': y_test.to_numpy(copy=True),
+        'orden': orden,
+        'registros_destino': y.value_counts().to_dict()
+    }
+
+
+def ejecutar_ronda(executor, pendientes, args, resultados, modelos, base, X_test):
+    """Entrena en el pool las pruebas pendientes y después mide la latencia de cada modelo, de a
+    uno y sin entrenamientos en paralelo (con procesos entrenando, el p99 mide la contención).
+    Cada prueba se guarda en cuanto se mide."""
+    a_entrenar = [(clave, configuracion, n) for clave, configuracion, n in pendientes if clave not in modelos]
+    if len(a_entrenar) < len(pendientes):
+        print(f"  {len(pendientes) - len(a_entrenar)} modelos ya entrenados en una ejecución anterior")
+    futuros = {
+        executor.submit(entrenar_configuracion, clave, configuracion, n, args.semilla, modelos.directorio):
+            (clave, configuracion, n)
+        for clave, configuracion, n in a_entrenar
+    }
+    for i, futuro in enumerate(as_completed(futuros), 1):
+        clave, configuracion, n = futuros[futuro]
+        metricas = futuro.result()
+        print(f"  [{i}/{len(a_entrenar)}] accuracy {metricas['accuracy']*100:.2f}% "
+              f"| top-5 {metricas['top5']*100:.2f}% | {metricas['tamano_bytes'] / 1024 / 1024:.1f} MB "
+              f"| {json.dumps(configuracion)}")
+
+    print("  Latencia de un viaje (de a un modelo, sin entrenamientos en paralelo):")
+    for clave, configuracion, n in pendientes:
+        modelo, metricas = modelos.cargar(clave)
+        latencia_p50, latencia_p99 = latencia_un_viaje(modelo, X_test, args.repeticiones)
+        resultados.guardar({
+            'clave': clave,
+            **base,
+            'configuracion': configuracion,
+            'n_entrenamiento': n,
+            **metricas,
+            'latencia_p50_ms': latencia_p50,
+            'latencia_p99_ms': latencia_p99,
+            'fecha': datetime.now().isoformat(timespec='seconds')
+        })
+        modelos.eliminar(clave)
+        print(f"    p50 {latencia_p50:.3f} ms | p99 {latencia_p99:.3f} ms | {json.dumps(configuracion)}")
+
+
+def main():
+    args = parse_args()
+    modulo = MODELOS[args.modelo]
+    resultados_path = args.resultados or os.path.join("modelos", f"busqueda_{args.modelo}.jsonl")
+    mejor_path = args.mejor or os.path.join("modelos", f"hiperparametros_{args.modelo}.json")
+
+    print("=" * 70)
+    print("BÚSQUEDA DE HIPERPARÁMETROS (SUCCESSIVE HALVING)")
+    print("=" * 70)
+    print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    datos = preparar_busqueda(modulo, args.muestras_prueba, args.semilla)
+    if datos is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        return
+
+    huella = huella_dataset(datos['dataset_path'])
+    n_total = len(datos['X_train'])
+    configuraciones = muestrear_configuraciones(modulo.HIPERPARAMETROS, args.configuraciones, args.semilla)
+    tamanos = tamanos_rondas(args.muestras_iniciales, args.eta, n_total)
+    resultados = ResultadosBusqueda(resultados_path)
+    modelos = ModelosPendientes(os.path.splitext(resultados_path)[0] + ".pendientes")
+    base = {'modelo': args.modelo, 'semilla': args.semilla}
+
+    print(f"\n[OK] Entrenamiento: {n_total:,} viajes | prueba: {len(datos['X_test']):,} viajes")
+    print(f"[OK] Configuraciones: {len(configuraciones)} | rondas: {len(tamanos)} "
+          f"({', '.join(f'{n:,}' for n in tamanos)} viajes)")
+    print(f"[OK] Resultados: {resultados_path} ({len(resultados)} pruebas guardadas)")
+
+    contexto = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(
+        max_workers=max(1, args.procesos), mp_context=contexto, initializer=_inicializar_proceso,
+        initargs=(datos['X_train'], datos['y_train'], datos['X_test'], datos['y_test'], datos['orden'])
+    )
+    candidatas = configuraciones
+    try:
+        for ronda, n in enumerate(tamanos, 1):
+            claves = [clave_prueba(args.modelo, c, n, huella, args.semilla) for c in candidatas]
+            pendientes = [(clave, c, n) for clave, c in zip(claves, candidatas) if clave not in resultados]
+
+            print("\n" + "=" * 70)
+            print(f"RONDA {ronda}/{len(tamanos)}: {len(candidatas)} configuraciones con {n:,} viajes "
+                  f"({len(candidatas) - len(pendientes)} ya evaluadas)")
+            print("=" * 70)
+            t0 = time.time()
+            if pendientes:
+                ejecutar_ronda(executor, pendientes, args, resultados, modelos, base, datos['X_test'])
+            print(f"[OK] Ronda completada en {time.time() - t0:.1f} segundos")
+
+            pruebas = ordenar_pruebas([resultados.obtener(clave) for clave in claves], args.metrica)
+            if ronda < len(tamanos):
+                pasan = max(1, math.ceil(len(pruebas) / args.eta))
+                candidatas = [prueba['configuracion'] for prueba in pruebas[:pasan]]
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print(f"\n[INFO] Búsqueda interrumpida: {len(resultados)} pruebas guardadas en {resultados_path}")
+        print("       Volver a ejecutar con los mismos argumentos para reanudar")
+        return
+    executor.shutdown()
+
+    print("\n" + "=" * 70)
+    print(f"RANKING FINAL ({args.metrica}, {n_total:,} viajes)")
+    print("=" * 70)
+    for i, prueba in enumerate(pruebas, 1):
+        print(f"{i:2d}. accuracy {prueba['accuracy']*100:.2f}% | top-3 {prueba['top3']*100:.2f}% "
+              f"| top-5 {prueba['top5']*100:.2f}% | OOB {prueba['oob']*100:.2f}% "
+              f"| {prueba['tamano_bytes'] / 1024 / 1024:.1f} MB | p99 {prueba['latencia_p99_ms']:.2f} ms")
+        print(f"    {json.dumps(prueba['configuracion'])}")
+
+    mejor = pruebas[0]['configuracion']
+    directorio = os.path.dirname(mejor_path)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(mejor_path, 'w', encoding='utf-8') as f:
+        json.dump(mejor, f, indent=2)
+
+    print("\n" + "=" * 70)
+    print("[OK] PROCESO COMPLETADO")
+    print("=" * 70)
+    print(f"Mejor configuración: {json.dumps(mejor)}")
+    print(f"Guardada en: {mejor_path}")
+    print(f"Para entrenar con ella: python {modulo.__name__}.py --hiperparametros {mejor_path}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,468 @@
+"""
+Carga del dataset de viajes (dataset_modelo_final.csv) con tipos compactos
+- Convierte el CSV una sola vez a Parquet comprimido (zstd) junto al CSV, particionado
+  por mes (mes=1/, mes=2/, ...): un filtro de meses lee solo esas particiones
+- Columnas de texto como category, enteros reducidos (int8 para hora/día/mes)
+- Proyección de columnas: cada consumidor lee solo lo que necesita
+- Lectura por bloques (iterar_dataset) para agregar logs que no entran en memoria;
+  la conversión también se hace por bloques, con memoria acotada
+- Cache por proceso para la app de Streamlit
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Rutas posibles del CSV (cada consumidor puede pasar su propio orden de prioridad)
+DATASET_PATHS = [
+    "dataset_modelo_final.csv",
+    "prediccion/dataset_modelo_final.csv",
+    "../prediccion/dataset_modelo_final.csv",
+    "../../prediccion/dataset_modelo_final.csv"
+]
+
+# Columnas que siempre se guardan como category (aunque el CSV las traiga numéricas)
+COLUMNAS_CATEGORICAS = ['origen', 'destino', 'Usuario_key', 'semana']
+
+# Filas por bloque al convertir o recorrer el dataset por partes
+FILAS_POR_BLOQUE = 250_000
+
+# Partición del dataset columnar: un directorio Hive (mes=N) por mes
+COLUMNA_PARTICION = 'mes'
+PARTICION_SIN_VALOR = '__HIVE_DEFAULT_PARTITION__'
+ARCHIVO_PARTICION = 'parte-0.parquet'
+MANIFIESTO_PARTICIONES = '_particiones.json'
+
+# Número de fila en el CSV: permite leer varias particiones en el orden original
+COLUMNA_FILA = '_fila'
+
+
+def buscar_dataset(paths=None):
+    """Primera ruta existente del CSV (o None)"""
+    for path in paths or DATASET_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def path_columnar(csv_path):
+    """Directorio del dataset columnar (particionado por mes) generado a partir del CSV"""
+    return os.path.splitext(csv_path)[0] + ".particiones"
+
+
+def _nombre_particion(valor):
+    """Directorio Hive de una partición (mes=3); los meses faltantes van a la partición por defecto"""
+    return f"{COLUMNA_PARTICION}={PARTICION_SIN_VALOR if pd.isna(valor) else int(valor)}"
+
+
+def optimizar_tipos(df):
+    """Reduce los tipos de un DataFrame del dataset sin perder información.
+
+    - Texto -> category
+    - Enteros -> el entero más chico que los contiene (int8 para hora/día/mes)
+    - Los float se mantienen en float64 para que el entrenamiento no cambie
+    """
+    columnas = {}
+    for columna in df.columns:
+        serie = df[columna]
+        if columna in COLUMNAS_CATEGORICAS or pd.api.types.is_string_dtype(serie) or serie.dtype == object:
+            columnas[columna] = serie.astype('category')
+        elif pd.api.types.is_integer_dtype(serie):
+            columnas[columna] = pd.to_numeric(serie, downcast='integer')
+        else:
+            columnas[columna] = serie
+    return pd.DataFrame(columnas, index=df.index)
+
+
+def _pyarrow_disponible():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _es_texto(columna, serie):
+    return columna in COLUMNAS_CATEGORICAS or pd.api.types.is_string_dtype(serie) or serie.dtype == object
+
+
+def _tipos_por_bloques(csv_path, filas_por_bloque):
+    """Primera pasada de la conversión: el tipo final de cada columna, igual al que
+    daría optimizar_tipos sobre el CSV completo.
+
+    Devuelve {columna: ('category', categorías ordenadas) | ('int', dtype) | ('float', None) | (None, None)}.
+    Solo se guardan los valores distintos de las columnas de texto y el mínimo/máximo de las enteras.
+    """
+    resumen = {}
+    tardias = set()
+    for bloque in pd.read_csv(csv_path, chunksize=filas_por_bloque):
+        for columna in bloque.columns:
+            serie = bloque[columna]
+            info = resumen.setdefault(columna, {'tipo': None, 'valores': set(), 'minimo': None, 'maximo': None})
+            if _es_texto(columna, serie):
+                if info['tipo'] not in (None, 'category'):
+                    tardias.add(columna)
+                info['tipo'] = 'category'
+                info['valores'].update(serie.dropna().unique().tolist())
+            elif info['tipo'] == 'category':
+                info['valores'].update(serie.dropna().astype(str).unique().tolist())
+            elif pd.api.types.is_integer_dtype(serie):
+                if len(serie):
+                    minimo, maximo = int(serie.min()), int(serie.max())
+                    info['minimo'] = minimo if info['minimo'] is None else min(info['minimo'], minimo)
+                    info['maximo'] = maximo if info['maximo'] is None else max(info['maximo'], maximo)
+                info['tipo'] = info['tipo'] or 'int'
+            elif pd.api.types.is_float_dtype(serie):
+                info['tipo'] = 'float'
+
+    # Columnas numéricas al principio y texto más adelante: faltan los valores de los primeros bloques
+    if tardias:
+        for bloque in pd.read_csv(csv_path, usecols=sorted(tardias), chunksize=filas_por_bloque):
+            for columna in tardias:
+                serie = bloque[columna]
+                if not _es_texto(columna, serie):
+                    resumen[columna]['valores'].update(serie.dropna().astype(str).unique().tolist())
+
+    tipos = {}
+    for columna, info in resumen.items():
+        if info['tipo'] == 'category':
+            try:
+                categorias = pd.Index(sorted(info['valores']))
+            except TypeError:
+                categorias = pd.Index(sorted(str(v) for v in info['valores']))
+            tipos[columna] = ('category', categorias)
+        elif info['tipo'] == 'int':
+            extremos = pd.Series([info['minimo'] or 0, info['maximo'] or 0], dtype='int64')
+            tipos[columna] = ('int', pd.to_numeric(extremos, downcast='integer').dtype)
+        elif info['tipo'] == 'float':
+            tipos[columna] = ('float', None)
+        else:
+            tipos[columna] = (None, None)
+    return tipos
+
+
+def _aplicar_tipos(bloque, tipos):
+    """Convierte un bloque del CSV a los tipos finales calculados por _tipos_por_bloques"""
+    columnas = {}
+    for columna in bloque.columns:
+        serie = bloque[columna]
+        tipo, detalle = tipos[columna]
+        if tipo == 'category':
+            # Bloque numérico de una columna que en otros bloques es texto
+            if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_numeric_dtype(detalle.dtype):
+                serie = serie.astype(str).where(serie.notna())
+            columnas[columna] = pd.Categorical(serie, categories=detalle)
+        elif tipo == 'int':
+            columnas[columna] = serie.astype(detalle)
+        elif tipo == 'float':
+            columnas[columna] = serie.astype('float64')
+        else:
+            columnas[columna] = serie
+    return pd.DataFrame(columnas, index=bloque.index)
+
+
+def convertir_dataset(csv_path, directorio=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Convierte el CSV a Parquet particionado por mes; devuelve el directorio.
+
+    Se hace en dos pasadas por bloques (tipos y categorías, luego escritura de un
+    row group por bloque y mes) para no cargar el CSV completo. Todas las
+    particiones comparten el esquema y las categorías ordenadas, así que leerlas
+    da los mismos tipos que optimizar_tipos sobre el CSV entero. Cada fila guarda
+    su posición en el CSV (COLUMNA_FILA) para recomponer el orden original.
+    """
+    directorio = directorio or path_columnar(csv_path)
+    tipos = _tipos_por_bloques(csv_path, filas_por_bloque)
+
+    # Escribir a un temporal propio y renombrar: otro proceso nunca lee particiones a medias
+    # y dos conversiones simultáneas (sesiones o procesos) no pisan sus archivos
+    padre = os.path.dirname(os.path.abspath(directorio))
+    temporal = tempfile.mkdtemp(prefix=os.path.basename(directorio) + ".tmp.", dir=padre)
+    try:
+        os.chmod(temporal, 0o755)  # mkdtemp lo crea solo legible por el dueño
+        _escribir_particiones(csv_path, temporal, tipos, filas_por_bloque)
+        _publicar(temporal, directorio)
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    # Formato anterior (un único .parquet junto al CSV): ya no se usa
+    anterior = os.path.splitext(csv_path)[0] + ".parquet"
+    try:
+        os.remove(anterior)
+    except FileNotFoundError:
+        pass
+    return directorio
+
+
+def _publicar(temporal, directorio):
+    """Reemplaza directorio por temporal. Si otra conversión lo publica en el medio, se
+    descarta temporal (las dos salen del mismo CSV)."""
+    shutil.rmtree(directorio, ignore_errors=True)
+    try:
+        os.replace(temporal, directorio)
+    except OSError:
+        if not os.path.exists(os.path.join(directorio, MANIFIESTO_PARTICIONES)):
+            raise
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def _escribir_particiones(csv_path, temporal, tipos, filas_por_bloque):
+    """Escribe las particiones y el manifiesto del CSV en el directorio temporal"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritores = {}
+    filas_por_particion = {}
+    esquema = None
+    inicio = 0
+    try:
+        for bloque in pd.read_csv(csv_path, chunksize=filas_por_bloque):
+            bloque = _aplicar_tipos(bloque, tipos)
+            bloque[COLUMNA_FILA] = np.arange(inicio, inicio + len(bloque), dtype=np.int64)
+            inicio += len(bloque)
+            if esquema is None:
+                esquema = pa.Table.from_pandas(bloque.iloc[:0], preserve_index=False).schema
+
+            if COLUMNA_PARTICION in bloque.columns:
+                particiones = bloque[COLUMNA_PARTICION].map(_nombre_particion)
+            else:
+                particiones = pd.Series(_nombre_particion(None), index=bloque.index)
+            for nombre, parte in bloque.groupby(particiones.to_numpy(), sort=True):
+                if nombre not in escritores:
+                    os.makedirs(os.path.join(temporal, nombre))
+                    # Números de fila crecientes dentro de cada partición: delta encoding en lugar de diccionario
+                    escritores[nombre] = pq.ParquetWriter(
+                        os.path.join(temporal, nombre, ARCHIVO_PARTICION), esquema, compression='zstd',
+                        use_dictionary=[c for c in esquema.names if c != COLUMNA_FILA],
+                        column_encoding={COLUMNA_FILA: 'DELTA_BINARY_PACKED'})
+                escritores[nombre].write_table(pa.Table.from_pandas(parte, schema=esquema, preserve_index=False))
+                filas_por_particion[nombre] = filas_por_particion.get(nombre, 0) + len(parte)
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+
+    if not escritores:
+        # CSV sin filas: una partición vacía para fijar el esquema
+        vacio = optimizar_tipos(pd.read_csv(csv_path))
+        vacio[COLUMNA_FILA] = np.zeros(0, dtype=np.int64)
+        nombre = _nombre_particion(None)
+        os.makedirs(os.path.join(temporal, nombre))
+        vacio.to_parquet(os.path.join(temporal, nombre, ARCHIVO_PARTICION), index=False, compression='zstd')
+        filas_por_particion[nombre] = 0
+        columnas = list(vacio.columns)
+    else:
+        columnas = list(esquema.names)
+
+    with open(os.path.join(temporal, MANIFIESTO_PARTICIONES), 'w', encoding='utf-8') as f:
+        json.dump({
+            'columnas': [c for c in columnas if c != COLUMNA_FILA],
+            'filas': filas_por_particion
+        }, f, ensure_ascii=False, indent=2)
+
+
+def columnar_actualizado(csv_path):
+    """Directorio particionado, regenerándolo si no existe o es más viejo que el CSV"""
+    directorio = path_columnar(csv_path)
+    manifiesto = os.path.join(directorio, MANIFIESTO_PARTICIONES)
+    if not os.path.exists(manifiesto) or os.path.getmtime(manifiesto) < os.path.getmtime(csv_path):
+        convertir_dataset(csv_path, directorio)
+    return directorio
+
+
+def leer_manifiesto(directorio):
+    """Columnas y filas por partición del dataset particionado"""
+    with open(os.path.join(directorio, MANIFIESTO_PARTICIONES), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _orden_particion(nombre):
+    """Orden numérico de las particiones (mes=2 antes que mes=10; la partición por defecto al final)"""
+    valor = nombre.split('=', 1)[1]
+    return (0, int(valor)) if valor.isdigit() else (1, 0)
+
+
+def particiones_dataset(directorio, meses=None):
+    """Archivos de las particiones que necesita el filtro de meses (todas si meses es None).
+
+    Es la poda de particiones: los meses que no están en el filtro no se abren.
+    """
+    nombres = sorted(leer_manifiesto(directorio)['filas'], key=_orden_particion)
+    if meses is not None:
+        pedidas = {_nombre_particion(mes) for mes in meses}
+        nombres = [nombre for nombre in nombres if nombre in pedidas]
+    return [os.path.join(directorio, nombre, ARCHIVO_PARTICION) for nombre in nombres]
+
+
+def _columnas_pedidas(directorio, columnas):
+    """Columnas pedidas que existen en el dataset (todas si columnas es None)"""
+    disponibles = leer_manifiesto(directorio)['columnas']
+    if columnas is None:
+        return disponibles
+    return [c for c in columnas if c in set(disponibles)]
+
+
+def _filtrar_meses(df, meses):
+    """Filtro de meses sobre un DataFrame leído del CSV (sin pyarrow no hay particiones).
+
+    Igual que con particiones, las filas sin mes no entran en ningún filtro.
+    """
+    if meses is None:
+        return df
+    if COLUMNA_PARTICION not in df.columns:
+        return df.iloc[:0]
+    return df[df[COLUMNA_PARTICION].isin(list(meses))].reset_index(drop=True)
+
+
+def leer_dataset(columnas=None, paths=None, meses=None):
+    """Lee el dataset con tipos optimizados y solo las columnas pedidas.
+
+    Con meses (lista de números de mes) solo se leen esas particiones. Las filas
+    mantienen el orden del CSV. Las columnas pedidas que no existen en el dataset
+    se ignoran (los consumidores ya verifican `'columna' in df.columns`). Sin
+    pyarrow se lee el CSV directamente.
+    Devuelve (df, csv_path) o (None, None) si no se encontró el dataset.
+    """
+    csv_path = buscar_dataset(paths)
+    if csv_path is None:
+        return None, None
+
+    if not _pyarrow_disponible():
+        usecols = None
+        if columnas is not None:
+            necesarias = set(columnas) | ({COLUMNA_PARTICION} if meses is not None else set())
+            usecols = lambda c: c in necesarias
+        df = _filtrar_meses(optimizar_tipos(pd.read_csv(csv_path, usecols=usecols)), meses)
+        return (df if columnas is None else df[[c for c in df.columns if c in set(columnas)]]), csv_path
+
+    directorio = columnar_actualizado(csv_path)
+    columnas = _columnas_pedidas(directorio, columnas)
+    archivos = particiones_dataset(directorio, meses)
+    if not archivos:
+        # Ningún mes del filtro tiene viajes: DataFrame vacío con los tipos del dataset
+        archivo = particiones_dataset(directorio)[0]
+        return pd.read_parquet(archivo, columns=columnas).iloc[:0], csv_path
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tabla = pa.concat_tables([pq.read_table(archivo, columns=columnas + [COLUMNA_FILA]) for archivo in archivos])
+    filas = tabla.column(COLUMNA_FILA).to_numpy()
+    # Con los viajes ordenados por fecha las particiones ya quedan en orden; si no, se reordena
+    if np.any(filas[1:] < filas[:-1]):
+        tabla = tabla.take(np.argsort(filas, kind='stable'))
+    return tabla.drop_columns([COLUMNA_FILA]).to_pandas(), csv_path
+
+
+def _bloques_en_orden(archivos, columnas, filas_por_bloque):
+    """Mezcla las particiones (cada una ordenada por COLUMNA_FILA) en el orden original del CSV.
+
+    Se lee un lote por partición a la vez: todas las filas hasta la menor última
+    fila leída ya están disponibles, se ordenan y se entregan en bloques completos
+    (lo que no llega a un bloque espera a la siguiente ronda). La mezcla se hace
+    sobre tablas de Arrow (cortes sin copia) y cada bloque se convierte a pandas una vez.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    lote_particion = max(1, filas_por_bloque // len(archivos))
+    lectores = [pq.ParquetFile(archivo).iter_batches(batch_size=lote_particion, columns=columnas + [COLUMNA_FILA])
+                for archivo in archivos]
+    pendientes = [None] * len(lectores)
+    listas = None
+    while True:
+        for i, lector in enumerate(lectores):
+            if lector is not None and (pendientes[i] is None or pendientes[i].num_rows == 0):
+                lote = next(lector, None)
+                if lote is None:
+                    lectores[i] = pendientes[i] = None
+                else:
+                    pendientes[i] = pa.Table.from_batches([lote])
+        activos = [i for i, pendiente in enumerate(pendientes) if pendiente is not None]
+        if not activos:
+            if listas is not None and listas.num_rows:
+                yield listas.drop_columns([COLUMNA_FILA]).to_pandas()
+            return
+
+        filas = [pendientes[i].column(COLUMNA_FILA).to_numpy() for i in activos]
+        corte = min(f[-1] for f in filas)
+        partes = []
+        for i, f in zip(activos, filas):
+            hasta = int(np.searchsorted(f, corte, side='right'))
+            partes.append(pendientes[i].slice(0, hasta))
+            pendientes[i] = pendientes[i].slice(hasta)
+        # Las filas de esta ronda son todas posteriores a las que ya esperaban: solo se ordenan las nuevas
+        nuevas = pa.concat_tables(partes)
+        nuevas = nuevas.take(np.argsort(nuevas.column(COLUMNA_FILA).to_numpy(), kind='stable'))
+        listas = pa.concat_tables([listas, nuevas]) if listas is not None else nuevas
+        while listas.num_rows >= filas_por_bloque:
+            yield listas.slice(0, filas_por_bloque).drop_columns([COLUMNA_FILA]).to_pandas()
+            listas = listas.slice(filas_por_bloque)
+
+
+def iterar_dataset(columnas=None, paths=None, filas_por_bloque=FILAS_POR_BLOQUE, meses=None):
+    """Como leer_dataset pero por bloques: devuelve (generador de DataFrames, csv_path).
+
+    Cada bloque tiene a lo sumo filas_por_bloque filas, con los tipos optimizados y
+    solo las columnas pedidas; la memoria usada no depende del tamaño del dataset.
+    Con meses solo se recorren esas particiones; los bloques siguen el orden del CSV.
+    Las categorías pueden variar entre bloques si se lee el CSV (sin pyarrow):
+    quien agrega debe comparar valores, no códigos.
+    Devuelve (None, None) si no se encontró el dataset.
+    """
+    csv_path = buscar_dataset(paths)
+    if csv_path is None:
+        return None, None
+
+    if not _pyarrow_disponible():
+        usecols = None
+        if columnas is not None:
+            necesarias = set(columnas) | ({COLUMNA_PARTICION} if meses is not None else set())
+            usecols = lambda c: c in necesarias
+
+        def bloques_csv():
+            for bloque in pd.read_csv(csv_path, usecols=usecols, chunksize=filas_por_bloque):
+                bloque = _filtrar_meses(optimizar_tipos(bloque), meses)
+                yield bloque if columnas is None else bloque[[c for c in bloque.columns if c in set(columnas)]]
+        return bloques_csv(), csv_path
+
+    import pyarrow.parquet as pq
+
+    directorio = columnar_actualizado(csv_path)
+    columnas = _columnas_pedidas(directorio, columnas)
+    archivos = particiones_dataset(directorio, meses)
+
+    def bloques_parquet():
+        if len(archivos) == 1:
+            archivo = pq.ParquetFile(archivos[0])
+            for lote in archivo.iter_batches(batch_size=filas_por_bloque, columns=columnas):
+                yield lote.to_pandas()
+        elif archivos:
+            yield from _bloques_en_orden(archivos, columnas, filas_por_bloque)
+    return bloques_parquet(), csv_path
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _load_dataset_cacheado(columnas, paths, huella, meses):
+    return leer_dataset(list(columnas) if columnas is not None else None, list(paths),
+                        list(meses) if meses is not None else None)
+
+
+def load_dataset(columnas=None, paths=None, meses=None):
+    """Versión cacheada de leer_dataset para la app (un DataFrame por proceso y filtro de meses).
+
+    El DataFrame es compartido entre sesiones: no modificarlo en el lugar
+    (filtrar o usar .copy() antes de agregar columnas).
+    """
+    paths = tuple(paths or DATASET_PATHS)
+    csv_path = buscar_dataset(paths)
+    if csv_path is None:
+        return None, None
+    stat = os.stat(csv_path)
+    huella = (os.path.abspath(csv_path), stat.st_size, stat.st_mtime_ns)
+    return _load_dataset_cacheado(tuple(columnas) if columnas is not None else None, paths, huella,
+                                  tuple(sorted(meses)) if meses is not None else None)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Entrenamiento incremental del Random Forest de destinos (warm_start)
+- Carga el modelo guardado y le agrega árboles entrenados solo con los viajes nuevos:
+  los meses indicados (leídos con poda de particiones) o los últimos N viajes
+- Opcionalmente retira los árboles más antiguos para mantener fijo el tamaño del forest
+- Los árboles nuevos usan las clases del modelo: los viajes a destinos que el modelo no
+  conoce se descartan (agregar destinos requiere reentrenar completo)
+- Compara accuracy top-1/top-5 antes y después sobre viajes nuevos reservados
+
+Lo usan los scripts de entrenamiento con --incremental:
+    python modelo_con_destino_favorito.py --incremental --meses 11 12 --arboles-nuevos 20 --retirar
+    python entrenar_modelo_ligero.py --incremental --ultimos 200000 --arboles-nuevos 10
+"""
+
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from lib import accuracy_top_k, predict_top_k
+
+# Árboles que se agregan por defecto en cada actualización
+ARBOLES_NUEVOS_DEFAULT = 10
+
+
+def agregar_argumentos(parser):
+    """Argumentos del modo incremental (comunes a los scripts de entrenamiento)"""
+    grupo = parser.add_argument_group("entrenamiento incremental")
+    grupo.add_argument("--incremental", action="store_true",
+                       help="Agregar árboles al modelo guardado en lugar de reentrenar completo")
+    grupo.add_argument("--meses", type=int, nargs="+", default=None,
+                       help="Meses con los viajes nuevos (solo se leen esas particiones)")
+    grupo.add_argument("--ultimos", type=int, default=None,
+                       help="Usar solo los últimos N viajes del dataset (ventana deslizante)")
+    grupo.add_argument("--arboles-nuevos", type=int, default=ARBOLES_NUEVOS_DEFAULT,
+                       help="Árboles que se entrenan con los viajes nuevos")
+    grupo.add_argument("--retirar", action="store_true",
+                       help="Retirar la misma cantidad de árboles más antiguos (tamaño fijo)")
+    grupo.add_argument("--fraccion-prueba", type=float, default=0.2,
+                       help="Fracción de los viajes nuevos reservada para comparar antes/después")
+
+
+def completar_clases(X, y, clases):
+    """Agrega una fila con peso cero por cada clase de `clases` ausente en y.
+
+    sklearn recalcula `classes_` en cada fit (también con warm_start); con las
+    filas de relleno los árboles nuevos tienen las mismas clases, en el mismo
+    orden, que los existentes. El peso cero hace que no influyan en los árboles.
+    Devuelve (X, y, pesos).
+    """
+    faltantes = np.setdiff1d(np.asarray(clases), np.unique(y))
+    pesos = np.ones(len(X) + len(faltantes))
+    pesos[len(X):] = 0.0
+    if len(faltantes) == 0:
+        return X, y, pesos
+
+    # El relleno repite la primera fila: no agrega umbrales nuevos a los splits
+    relleno = X.iloc[[0] * len(faltantes)]
+    X = pd.concat([X, relleno], ignore_index=True)
+    y = np.concatenate([np.asarray(y, dtype=object), faltantes.astype(object)])
+    return X, y, pesos
+
+
+def crecer_forest(modelo, X, y, arboles_nuevos, retirar=False):
+    """Agrega `arboles_nuevos` árboles entrenados con (X, y) al Random Forest (warm_start).
+
+    Con `retirar`, quita la misma cantidad de árboles más antiguos. El OOB del
+    modelo deja de calcularse: describía el forest original. Devuelve la
+    cantidad de árboles retirados.
+    """
+    if not hasattr(modelo, 'estimators_'):
+        raise ValueError("El modelo guardado no es un Random Forest de sklearn entrenado")
+    clases = np.asarray(modelo.classes_)
+    X_fit, y_fit, pesos = completar_clases(X, y, clases)
+
+    modelo.set_params(warm_start=True, oob_score=False,
+                      n_estimators=len(modelo.estimators_) + arboles_nuevos)
+    for atributo in ('oob_score_', 'oob_decision_function_'):
+        if hasattr(modelo, atributo):
+            delattr(modelo, atributo)
+    modelo.fit(X_fit, y_fit, sample_weight=pesos)
+    modelo.set_params(warm_start=False)
+
+    if not np.array_equal(np.asarray(modelo.classes_), clases):
+        raise ValueError("Las clases del modelo cambiaron durante el entrenamiento incremental")
+
+    retirados = 0
+    if retirar:
+        retirados = min(arboles_nuevos, len(modelo.estimators_) - arboles_nuevos)
+        modelo.estimators_ = modelo.estimators_[retirados:]
+        modelo.set_params(n_estimators=len(modelo.estimators_))
+    return retirados
+
+
+def medir_top_k(modelo, X, y):
+    """(top-1, top-5) de accuracy del modelo sobre X, y"""
+    top_classes, _ = predict_top_k(modelo, X, k=5)
+    return accuracy_top_k(top_classes, y, 1), accuracy_top_k(top_classes, y, 5)
+
+
+def entrenar_incremental(args, model_file, buscar_dataset, preparar_datos, random_seed):
+    """Modo --incremental de los scripts de entrenamiento: carga, crece y guarda el modelo"""
+    print("=" * 70)
+    print("ENTRENAMIENTO INCREMENTAL (WARM START)")
+    print("=" * 70)
+
+    if args.meses is None and args.ultimos is None:
+        print("[ERROR] Indicar los viajes nuevos con --meses o --ultimos")
+        return
+    if args.arboles_nuevos < 1:
+        print("[ERROR] --arboles-nuevos debe ser al menos 1")
+        return
+    if not os.path.exists(model_file):
+        print(f"[ERROR] No se encontró el modelo a actualizar: {model_file}")
+        return
+    dataset_path = buscar_dataset()
+    if dataset_path is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        return
+
+    t0 = time.time()
+    modelo = joblib.load(model_file)
+    if not hasattr(modelo, 'estimators_'):
+        print(f"[ERROR] El entrenamiento incremental solo admite Random Forest (el modelo es {type(modelo).__name__})")
+        return
+    arboles_antes = len(modelo.estimators_)
+    print(f"[OK] Modelo cargado: {model_file} ({arboles_antes} árboles, "
+          f"{len(modelo.classes_)} destinos) en {time.time() - t0:.2f} segundos")
+
+    X, y, _ = preparar_datos(dataset_path, meses=args.meses, clases=modelo.classes_)
+    if args.ultimos is not None:
+        X = X.tail(args.ultimos).reset_index(drop=True)
+        y = y.tail(args.ultimos).reset_index(drop=True)
+    descripcion = []
+    if args.meses is not None:
+        descripcion.append(f"meses {', '.join(str(mes) for mes in args.meses)}")
+    if args.ultimos is not None:
+        descripcion.append(f"últimos {args.ultimos:,} viajes")
+    print(f"[OK] Viajes nuevos ({' | '.join(descripcion)}): {len(X):,}")
+    if len(X) < 2:
+        print("[ERROR] No hay suficientes viajes nuevos para entrenar")
+        return
+
+    X_nuevo, X_prueba, y_nuevo, y_prueba = train_test_split(
+        X, y, test_size=args.fraccion_prueba, random_state=random_seed
+    )
+    top1_antes, top5_antes = medir_top_k(modelo, X_prueba, y_prueba)
+
+    print("\n" + "=" * 70)
+    print(f"AGREGANDO {args.arboles_nuevos} ÁRBOLES ({len(X_nuevo):,} viajes)")
+    print("=" * 70)
+    t0 = time.time()
+    retirados = crecer_forest(modelo, X_nuevo, y_nuevo.to_numpy(), args.arboles_nuevos, retirar=args.retirar)
+    tiempo_entrenamiento = time.time() - t0
+    print(f"[OK] Árboles nuevos entrenados en {tiempo_entrenamiento:.2f} segundos")
+    if retirados:
+        print(f"[OK] Árboles más antiguos retirados: {retirados}")
+
+    top1_despues, top5_despues = medir_top_k(modelo, X_prueba, y_prueba)
+    print(f"\n[RESULTADOS EN VIAJES NUEVOS RESERVADOS ({len(X_prueba):,})]")
+    print(f"Accuracy: {top1_antes*100:.2f}% -> {top1_despues*100:.2f}%")
+    print(f"Top-5 accuracy: {top5_antes*100:.2f}% -> {top5_despues*100:.2f}%")
+
+    t0 = time.time()
+    joblib.dump(modelo, model_file, compress=3)
+    file_size = os.path.getsize(model_file) / (1024 * 1024)
+    print(f"\n[OK] Modelo guardado en: {model_file} ({file_size:.2f} MB, {time.time() - t0:.2f} segundos)")
+
+    print("\n" + "=" * 70)
+    print("[OK] PROCESO COMPLETADO")
+    print("=" * 70)
+    print(f"  - Árboles: {arboles_antes} -> {len(modelo.estimators_)}")
+    print(f"  - Tiempo entrenamiento: {tiempo_entrenamiento:.2f} segundos")
+    print("  - El registro mmap y la tabla top-k se ignoran hasta regenerarlos "
+          "(registrar_modelo.py, materializar_topk.py)")
@@ -5,64 +5,148 @@ Script para entrenar una versión más ligera del modelo Random Forest
 Optimizado para reducir el tamaño del archivo manteniendo buen rendimiento
 - Hiperparámetros reducidos: n_estimators=200, max_depth=20
 - Compresión de joblib para reducir tamaño del archivo
+- Modo incremental (--incremental): agrega árboles con los viajes nuevos (entrenamiento_incremental.py)
 """
 
-import pandas as pd
 import numpy as np
 import time
 import os
+import json
+import argparse
 from datetime import datetime
-import joblib
 import warnings
 warnings.filterwarnings("ignore")
 
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, f1_score, top_k_accuracy_score
 
+from backend_modelo import BACKEND_DEFAULT, BACKENDS
+from datos import leer_dataset
+from entrenamiento_incremental import agregar_argumentos, entrenar_incremental
+
+RANDOM_SEED = 42
+
+# Modelo que genera el script (y que actualiza el modo incremental)
+MODEL_FILE = "static/modelo_random_forest_final_tunado.pkl"
+
+# Rutas posibles del dataset (en orden de prioridad)
+DATASET_PATHS = [
+    "dataset_modelo_final.csv",
+    "../prediccion/dataset_modelo_final.csv"
+]
+
+# Features (27 características en el orden correcto)
+FEATURES_ORIGINALES = [
+    'origen_lat','origen_lon',
+    'hora_salida','dia_semana','mes',
+    'viajes_totales','semanas_activas','viajes_por_semana','duracion_promedio_min'
+]
+FEATURES_MEJORADAS = [
+    'periodo_dia_numerico','es_fin_semana','es_hora_pico','zona_origen',
+    'capacidad_origen','estaciones_cercanas_origen','variedad_destinos','variedad_origenes',
+    'consistencia_horaria','distancia_promedio_usuario','dia_favorito',
+    'frecuencia_lunes','frecuencia_martes','frecuencia_miercoles',
+    'frecuencia_jueves','frecuencia_viernes','frecuencia_sabado','frecuencia_domingo'
+]
+FEATURES = FEATURES_ORIGINALES + FEATURES_MEJORADAS
+
+# Mínimo de registros por destino (None: se usan todos los destinos)
+MIN_REGISTROS_DESTINO = None
+
+# Hiperparámetros del modelo ultra ligero (reducidos para <100MB)
+HIPERPARAMETROS = {
+    'n_estimators': 100,        # Reducido de 200 a 100 (reduce tamaño ~2x)
+    'max_depth': 15,            # Reducido de 20 a 15 (reduce profundidad)
+    'min_samples_split': 15,    # Aumentado de 10 a 15 (árboles más pequeños)
+    'min_samples_leaf': 5,      # Aumentado de 3 a 5 (árboles más compactos)
+    'max_features': 0.5         # Mantener igual
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Entrenamiento del modelo ligero para Streamlit")
+    parser.add_argument("--hiperparametros", default=None,
+                        help="JSON con hiperparámetros (por ejemplo, el mejor de busqueda_hiperparametros.py)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND_DEFAULT,
+                        help="Tipo de modelo a entrenar")
+    agregar_argumentos(parser)
+    return parser.parse_args()
+
+
+def cargar_hiperparametros(path, backend=BACKEND_DEFAULT):
+    """Hiperparámetros por defecto del backend actualizados con los del JSON (si se indica).
+
+    Los del Random Forest son los de este script (HIPERPARAMETROS).
+    """
+    hiperparametros = dict(HIPERPARAMETROS if backend == BACKEND_DEFAULT else BACKENDS[backend].HIPERPARAMETROS)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            hiperparametros.update(json.load(f))
+    return hiperparametros
+
+
+def buscar_dataset_entrenamiento():
+    """Primera ruta existente de DATASET_PATHS (o None)"""
+    return next((path for path in DATASET_PATHS if os.path.exists(path)), None)
+
+
+def preparar_datos(dataset_path, meses=None, clases=None, min_registros=MIN_REGISTROS_DESTINO):
+    """Carga el dataset y arma X, y para el entrenamiento. Devuelve (X, y, features).
+
+    Con `meses` lee solo esas particiones; con `clases` descarta los destinos que
+    no conoce el modelo (entrenamiento incremental); con `min_registros` descarta
+    los destinos con menos registros.
+    """
+    # Cargar datos
+    print("\nCargando dataset final...")
+    df, _ = leer_dataset(FEATURES + ['destino'], [dataset_path], meses=meses)
+    print(f"[OK] Dataset cargado: {len(df):,} registros")
+    
+    X = df[FEATURES].fillna(0)
+    y = df['destino'].astype(str)
+    
+    print(f"\nFeatures: {len(FEATURES)}")
+    print(f"Destinos únicos: {y.nunique()}")
+    
+    if clases is not None:
+        mask_validos = y.isin(clases)
+        X = X[mask_validos].reset_index(drop=True)
+        y = y[mask_validos].reset_index(drop=True)
+        print(f"Registros con destinos que conoce el modelo: {len(X):,}")
+    elif min_registros is not None:
+        destino_counts = y.value_counts()
+        mask_validos = y.isin(destino_counts[destino_counts >= min_registros].index)
+        X = X[mask_validos].reset_index(drop=True)
+        y = y[mask_validos].reset_index(drop=True)
+        print(f"Registros con destinos con >= {min_registros} registros: {len(X):,} "
+              f"({y.nunique()} destinos)")
+    
+    return X, y, FEATURES
+
+
 def main():
+    args = parse_args()
+    if args.incremental:
+        entrenar_incremental(args, MODEL_FILE, buscar_dataset_entrenamiento, preparar_datos, RANDOM_SEED)
+        return
+    
     print("=" * 70)
     print("ENTRENAMIENTO DE MODELO LIGERO PARA STREAMLIT")
     print("=" * 70)
     print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    RANDOM_SEED = 42
-    
     # Verificar que existe el dataset
-    dataset_path = "dataset_modelo_final.csv"
-    if not os.path.exists(dataset_path):
-        # Intentar desde el directorio padre
-        dataset_path = "../prediccion/dataset_modelo_final.csv"
-        if not os.path.exists(dataset_path):
-            print("[ERROR] No se encontró dataset_modelo_final.csv")
-            print("Por favor, asegúrate de que el dataset esté disponible")
-            return
+    dataset_path = buscar_dataset_entrenamiento()
+    if dataset_path is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        print("Por favor, asegúrate de que el dataset esté disponible")
+        return
     
-    # Cargar datos
-    print("\nCargando dataset final...")
-    df = pd.read_csv(dataset_path)
-    print(f"[OK] Dataset cargado: {len(df):,} registros")
-    
-    # Features (27 características en el orden correcto)
-    features_originales = [
-        'origen_lat','origen_lon',
-        'hora_salida','dia_semana','mes',
-        'viajes_totales','semanas_activas','viajes_por_semana','duracion_promedio_min'
-    ]
-    features_mejoradas = [
-        'periodo_dia_numerico','es_fin_semana','es_hora_pico','zona_origen',
-        'capacidad_origen','estaciones_cercanas_origen','variedad_destinos','variedad_origenes',
-        'consistencia_horaria','distancia_promedio_usuario','dia_favorito',
-        'frecuencia_lunes','frecuencia_martes','frecuencia_miercoles',
-        'frecuencia_jueves','frecuencia_viernes','frecuencia_sabado','frecuencia_domingo'
-    ]
-    features = features_originales + features_mejoradas
-    
-    X = df[features].fillna(0)
-    y = df['destino'].astype(str)
-    
-    print(f"\nFeatures: {len(features)}")
-    print(f"Destinos únicos: {y.nunique()}")
+    backend = BACKENDS[args.backend]
+    hiperparametros = cargar_hiperparametros(args.hiperparametros, backend.nombre)
+    # El umbral de destinos no es del modelo: lo puede fijar el JSON (optimizador_presupuesto.py)
+    min_registros = hiperparametros.pop('min_registros_destino', MIN_REGISTROS_DESTINO)
+    X, y, features = preparar_datos(dataset_path, min_registros=min_registros)
     
     # Split
     print("\nDividiendo datos...")
@@ -74,28 +158,26 @@ def main():
     
     # Modelo RF ULTRA LIGERO (hiperparámetros reducidos para <100MB)
     print("\n" + "=" * 70)
-    print("CONFIGURACIÓN DEL MODELO ULTRA LIGERO")
+    print("CONFIGURACIÓN DEL MODELO ULTRA LIGERO" if backend.nombre == BACKEND_DEFAULT
+          else f"CONFIGURACIÓN DEL MODELO {backend.titulo}")
     print("=" * 70)
-    print("Hiperparámetros (reducidos para <100MB y Git normal):")
-    print("  - n_estimators: 100 (vs 600 original)")
-    print("  - max_depth: 15 (vs 32 original)")
-    print("  - min_samples_split: 15 (vs 10 original)")
-    print("  - min_samples_leaf: 5 (vs 1 original)")
-    print("  - max_features: 0.5 (igual)")
+    if hiperparametros == HIPERPARAMETROS:
+        print("Hiperparámetros (reducidos para <100MB y Git normal):")
+        print("  - n_estimators: 100 (vs 600 original)")
+        print("  - max_depth: 15 (vs 32 original)")
+        print("  - min_samples_split: 15 (vs 10 original)")
+        print("  - min_samples_leaf: 5 (vs 1 original)")
+        print("  - max_features: 0.5 (igual)")
+    else:
+        origen = f", desde {args.hiperparametros}" if args.hiperparametros else ""
+        print(f"Hiperparámetros ({backend.nombre}{origen}):")
+        for nombre, valor in hiperparametros.items():
+            print(f"  - {nombre}: {valor}")
+    if min_registros is not None:
+        print(f"  - Filtro: destinos con >= {min_registros} registros")
     print("=" * 70)
     
-    modelo = RandomForestClassifier(
-        n_estimators=100,        # Reducido de 200 a 100 (reduce tamaño ~2x)
-        max_depth=15,            # Reducido de 20 a 15 (reduce profundidad)
-        min_samples_split=15,    # Aumentado de 10 a 15 (árboles más pequeños)
-        min_samples_leaf=5,      # Aumentado de 3 a 5 (árboles más compactos)
-        max_features=0.5,        # Mantener igual
-        bootstrap=True,
-        oob_score=True,
-        class_weight=None,
-        random_state=RANDOM_SEED,
-        n_jobs=-1
-    )
+    modelo = backend.crear(hiperparametros, random_state=RANDOM_SEED)
     
     # Entrenamiento
     print("\nEntrenando modelo ligero...")
@@ -103,7 +185,8 @@ def main():
     modelo.fit(X_train, y_train)
     tiempo_entrenamiento = time.time() - t0
     print(f"[OK] Entrenamiento completado en {tiempo_entrenamiento:.2f} segundos")
-    print(f"OOB score: {modelo.oob_score_*100:.2f}%")
+    for linea in backend.resumen_entrenamiento(modelo):
+        print(linea)
     
     # Evaluación
     print("\nEvaluando modelo...")
@@ -124,10 +207,10 @@ def main():
         print(f"Top-5 accuracy: {top5*100:.2f}%")
     
     # Importancias
-    importances = pd.Series(modelo.feature_importances_, index=features).sort_values(ascending=False)
+    importances = backend.importancias(modelo, features).sort_values(ascending=False)
     print(f"\n[TOP 10 FEATURES IMPORTANTES]")
     for i, (feature, importance) in enumerate(importances.head(10).items(), 1):
-        tag = "[NUEVA]" if feature in features_mejoradas else "[ORIGINAL]"
+        tag = "[NUEVA]" if feature in FEATURES_MEJORADAS else "[ORIGINAL]"
         print(f"{i:2d}. {tag} {feature}: {importance:.4f}")
     
     # Guardar modelo CON COMPRESIÓN
@@ -140,14 +223,14 @@ def main():
         os.makedirs("static")
         print("[OK] Carpeta static creada")
     
-    model_file = "static/modelo_random_forest_final_tunado.pkl"
+    model_file = MODEL_FILE
     
     # Guardar con compresión (reduce tamaño significativamente)
     print(f"\nGuardando modelo en: {model_file}")
     print("Usando compresión de joblib para reducir tamaño...")
     
     t0 = time.time()
-    joblib.dump(modelo, model_file, compress=3)  # compress=3 es un buen balance
+    backend.guardar(modelo, model_file)  # compress=3 es un buen balance
     tiempo_guardado = time.time() - t0
     
     # Verificar tamaño del archivo
@@ -184,7 +267,8 @@ def main():
     # Resumen final
     print(f"\n[RESUMEN]")
     print(f"  - Accuracy: {acc*100:.2f}%")
-    print(f"  - OOB score: {modelo.oob_score_*100:.2f}%")
+    for linea in backend.resumen_entrenamiento(modelo):
+        print(f"  - {linea}")
     if file_size_gb >= 1:
         print(f"  - Tamaño: {file_size_gb:.2f} GB")
     else:
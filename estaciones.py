@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dimensión de estaciones con ID entero denso
+- Una fila por estación: nombre, coordenadas, capacidad y atributos precalculados
+  (zona, estaciones cercanas, clave de coordenadas redondeadas)
+- Une el catálogo (estaciones.json o station_data_enriched) con las estaciones del dataset
+- Búsquedas por nombre, por coordenadas y por cercanía como operaciones sobre arrays:
+  un join es indexar una columna con un array de IDs
+- Cercanía, conteos por radio y ajuste a estación con el índice espacial (haversine)
+  de las estaciones del catálogo
+
+Uso:
+    python estaciones.py           # muestra la dimensión construida
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from agregados import huella_dataset, load_cubo, cubo_actualizado
+from datos import DATASET_PATHS, buscar_dataset
+from indice_espacial import SIN_ESTACION, TOLERANCIA_AJUSTE_M, IndiceEspacial
+from lib import (ESTACIONES_CSV_PATHS, ESTACIONES_JSON_PATHS, _clave_coordenadas, clasificar_zona,
+                 contar_estaciones_cercanas, load_stations)
+
+# ID que devuelven las búsquedas para estaciones desconocidas
+ID_DESCONOCIDO = -1
+
+# Capacidad asumida cuando el catálogo no la informa (igual que el preprocessor)
+CAPACIDAD_DEFAULT = 15
+
+
+def _capacidad(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return CAPACIDAD_DEFAULT
+
+
+class DimensionEstaciones:
+    """Tabla de estaciones indexada por ID: el ID es la posición del nombre en orden alfabético.
+
+    Cada atributo es un array con una posición por ID (`lat[ids]`, `capacidad[ids]`).
+    `en_catalogo` marca las estaciones del catálogo, que son las que ofrece el
+    formulario del Modelo; las que solo aparecen en el dataset toman las
+    coordenadas de su primer viaje como origen (NaN si nunca fueron origen).
+    """
+
+    def __init__(self, nombres, lat, lon, capacidad, en_catalogo, orden_catalogo):
+        self.nombres = np.asarray(nombres, dtype=object)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.capacidad = np.asarray(capacidad, dtype=np.int32)
+        self.en_catalogo = np.asarray(en_catalogo, dtype=bool)
+        self.orden_catalogo = np.asarray(orden_catalogo, dtype=np.int64)
+
+        # Atributos precalculados
+        self.zona = np.asarray(clasificar_zona(self.lat, self.lon), dtype=np.int8).reshape(-1)
+        self.clave_coordenadas = _clave_coordenadas(self.lat, self.lon)
+        self.estaciones_cercanas = np.zeros(len(self.nombres), dtype=np.int32)
+        con_coordenadas = self.clave_coordenadas >= 0
+        if con_coordenadas.any():
+            self.estaciones_cercanas[con_coordenadas] = contar_estaciones_cercanas(
+                self.lat[con_coordenadas], self.lon[con_coordenadas])
+
+        # Índice espacial del catálogo; ante coordenadas repetidas gana la primera del catálogo
+        catalogo = self.ids_catalogo()
+        self._ids_indice = catalogo[np.argsort(self.orden_catalogo[catalogo], kind='stable')]
+        self.indice = IndiceEspacial(self.lat[self._ids_indice], self.lon[self._ids_indice])
+
+        self._indice = pd.Index(self.nombres)
+        self._orden_claves = np.argsort(self.clave_coordenadas, kind='stable')
+        self._claves_ordenadas = self.clave_coordenadas[self._orden_claves]
+
+    def __len__(self):
+        return len(self.nombres)
+
+    @classmethod
+    def construir(cls, catalogo=None, nombres_dataset=(), lat_dataset=None, lon_dataset=None):
+        """Dimensión a partir del catálogo {nombre: {'lat', 'lon', 'capacidad'}} y las estaciones
+        del dataset (con las coordenadas de su primer viaje, si se conocen)"""
+        filas = {}
+        for posicion, (nombre, datos) in enumerate((catalogo or {}).items()):
+            datos = datos if isinstance(datos, dict) else {}
+            filas[str(nombre)] = (
+                float(datos.get('lat', np.nan)), float(datos.get('lon', np.nan)),
+                _capacidad(datos.get('capacidad')), True, posicion
+            )
+        for i, nombre in enumerate(nombres_dataset):
+            nombre = str(nombre)
+            if nombre not in filas:
+                lat = lat_dataset[i] if lat_dataset is not None else np.nan
+                lon = lon_dataset[i] if lon_dataset is not None else np.nan
+                filas[nombre] = (float(lat), float(lon), CAPACIDAD_DEFAULT, False, ID_DESCONOCIDO)
+
+        nombres = sorted(filas)
+        columnas = list(zip(*(filas[nombre] for nombre in nombres))) or [()] * 5
+        return cls(nombres, *columnas)
+
+    @classmethod
+    def desde_cubo(cls, catalogo, cubo=None):
+        """Catálogo más las estaciones del cubo de viajes (con sus primeras coordenadas de origen)"""
+        if cubo is None:
+            return cls.construir(catalogo)
+        return cls.construir(catalogo, cubo.estaciones, cubo.lat_origen, cubo.lon_origen)
+
+    def ids(self, nombres):
+        """IDs de un array de nombres (ID_DESCONOCIDO para los que no existen)"""
+        return self._indice.get_indexer(np.asarray(nombres, dtype=object)).astype(np.int64)
+
+    def id(self, nombre):
+        return int(self.ids([nombre])[0])
+
+    def ids_por_coordenadas(self, lat, lon):
+        """IDs de las estaciones con exactamente esas coordenadas (redondeadas a 5 decimales)"""
+        claves = _clave_coordenadas(lat, lon)
+        posiciones = np.minimum(np.searchsorted(self._claves_ordenadas, claves), max(len(self) - 1, 0))
+        if len(self) == 0:
+            return np.full(claves.shape, ID_DESCONOCIDO, dtype=np.int64)
+        encontradas = (self._claves_ordenadas[posiciones] == claves) & (claves >= 0)
+        return np.where(encontradas, self._orden_claves[posiciones], ID_DESCONOCIDO).astype(np.int64)
+
+    def ids_catalogo(self):
+        """IDs de las estaciones del catálogo (en orden alfabético)"""
+        return np.flatnonzero(self.en_catalogo)
+
+    def nombres_catalogo(self):
+        return self.nombres[self.en_catalogo].tolist()
+
+    def _ids_de_indice(self, posiciones):
+        """Posiciones del índice espacial -> IDs de la dimensión"""
+        return np.where(posiciones != SIN_ESTACION, self._ids_indice[np.maximum(posiciones, 0)], ID_DESCONOCIDO)
+
+    def mas_cercanas(self, lat, lon):
+        """ID de la estación del catálogo más cercana (haversine) a cada punto, o ID_DESCONOCIDO"""
+        posiciones, _ = self.indice.mas_cercanas(lat, lon)
+        return self._ids_de_indice(posiciones[:, 0])
+
+    def mas_cercana(self, lat, lon):
+        return int(self.mas_cercanas([lat], [lon])[0])
+
+    def ajustar(self, lat, lon, tolerancia_m=TOLERANCIA_AJUSTE_M):
+        """ID de la estación del catálogo a menos de tolerancia_m metros de cada punto, o ID_DESCONOCIDO"""
+        return self._ids_de_indice(self.indice.ajustar(lat, lon, tolerancia_m))
+
+    def contar_en_radio(self, lat, lon, radio_m):
+        """Cantidad de estaciones del catálogo a menos de radio_m metros de cada punto"""
+        return self.indice.contar_en_radio(lat, lon, radio_m)
+
+    def a_dataframe(self):
+        """La dimensión como DataFrame indexado por ID"""
+        return pd.DataFrame({
+            'nombre': self.nombres,
+            'lat': self.lat,
+            'lon': self.lon,
+            'capacidad': self.capacidad,
+            'zona': self.zona,
+            'estaciones_cercanas': self.estaciones_cercanas,
+            'en_catalogo': self.en_catalogo
+        }, index=pd.RangeIndex(len(self), name='id'))
+
+
+def huella_catalogo():
+    """Ruta, tamaño y mtime del archivo de catálogo que usaría load_stations (o None)"""
+    for path in ESTACIONES_JSON_PATHS + ESTACIONES_CSV_PATHS:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    return None
+
+
+def construir_dimension(paths=None):
+    """Dimensión de estaciones con el catálogo y el dataset (si se encuentra), sin cache"""
+    csv_path = buscar_dataset(paths)
+    cubo = cubo_actualizado(csv_path) if csv_path is not None else None
+    return DimensionEstaciones.desde_cubo(load_stations(), cubo)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_dimension_cacheada(huella_catalogo, paths, huella):
+    cubo, _ = load_cubo(list(paths)) if huella is not None else (None, None)
+    return DimensionEstaciones.desde_cubo(load_stations(), cubo)
+
+
+def load_dimension_estaciones(paths=None):
+    """Dimensión de estaciones para la app (una por proceso; se rehace si cambian el catálogo o el dataset)"""
+    paths = tuple(paths or DATASET_PATHS)
+    csv_path = buscar_dataset(paths)
+    huella = huella_dataset(csv_path) if csv_path is not None else None
+    return _load_dimension_cacheada(huella_catalogo(), paths, huella)
+
+
+def main():
+    print("=" * 70)
+    print("DIMENSIÓN DE ESTACIONES")
+    print("=" * 70)
+
+    dimension = construir_dimension()
+    if len(dimension) == 0:
+        print("[ERROR] No se encontraron estaciones (ni catálogo ni dataset)")
+        return
+
+    tabla = dimension.a_dataframe()
+    print(f"[OK] Estaciones: {len(dimension)} "
+          f"(catálogo: {int(dimension.en_catalogo.sum())}, solo dataset: {int((~dimension.en_catalogo).sum())})")
+    print(f"     Sin coordenadas: {int(np.isnan(dimension.lat).sum())}")
+    print("\n[EJEMPLO] Primeras 5 estaciones:")
+    print(tabla.head().to_string())
+
+    print("\n" + "=" * 70)
+    print("[OK] PROCESO COMPLETADO")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para exportar el modelo al formato compacto de motor_forest
+- Umbrales float32, índices int16 y hojas cuantizadas y deduplicadas
+- Compara tamaño, tiempo de carga y accuracy top-k contra el pickle de joblib
+- Permite entrenar forests más grandes dentro del límite de 100 MB
+
+Uso:
+    python exportar_modelo_compacto.py --bits 8
+    python exportar_modelo_compacto.py --bits 16 --muestras 50000
+"""
+
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+from lib import MODEL_PATHS, MODELO_COMPACTO_PATHS, accuracy_top_k, predict_top_k
+from motor_forest import ForestCompilado
+
+RANDOM_SEED = 42
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Exportación del modelo a formato compacto")
+    parser.add_argument("-o", "--salida", default=MODELO_COMPACTO_PATHS[0],
+                        help="Archivo .npz de salida")
+    parser.add_argument("--bits", type=int, choices=[8, 16], default=8,
+                        help="Bits por probabilidad de hoja")
+    parser.add_argument("--muestras", type=int, default=20000,
+                        help="Viajes del conjunto de prueba usados para medir accuracy")
+    return parser.parse_args()
+
+
+def conjunto_de_prueba(modelo, n_muestras):
+    """Conjunto de prueba de modelo_con_destino_favorito.py (mismo preprocesamiento y split), o None sin dataset.
+
+    Se conservan los destinos que conoce el modelo: son los que dejó el filtro por
+    cantidad de registros al entrenarlo (con cualquier umbral), así el split
+    estratificado es el mismo del entrenamiento.
+    """
+    from sklearn.model_selection import train_test_split
+    import modelo_con_destino_favorito
+
+    dataset_path = modelo_con_destino_favorito.buscar_dataset_entrenamiento()
+    if dataset_path is None:
+        return None
+
+    X, y, _ = modelo_con_destino_favorito.preparar_datos(dataset_path, clases=modelo.classes_)
+    X = X[list(modelo.feature_names_in_)]
+    _, X_test, _, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=modelo_con_destino_favorito.RANDOM_SEED, stratify=y
+    )
+    if len(X_test) > n_muestras:
+        X_test = X_test.sample(n_muestras, random_state=RANDOM_SEED)
+        y_test = y_test.loc[X_test.index]
+    return X_test, y_test.to_numpy()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("EXPORTACIÓN A FORMATO COMPACTO")
+    print("=" * 70)
+
+    model_path = next((path for path in MODEL_PATHS if os.path.exists(path) and os.path.getsize(path) > 0), None)
+    if model_path is None:
+        print("[ERROR] No se encontró el modelo")
+        return
+
+    t0 = time.perf_counter()
+    modelo = joblib.load(model_path)
+    tiempo_joblib = time.perf_counter() - t0
+    if not hasattr(modelo, 'estimators_'):
+        print(f"[ERROR] El formato compacto solo admite Random Forest (el modelo es {type(modelo).__name__})")
+        return
+    print(f"[OK] Modelo cargado: {model_path} ({modelo.n_estimators} árboles, {len(modelo.classes_)} clases)")
+
+    forest = ForestCompilado.desde_sklearn(modelo)
+    directorio = os.path.dirname(args.salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    t0 = time.perf_counter()
+    forest.guardar_compacto(args.salida, bits=args.bits)
+    print(f"[OK] Modelo compacto guardado en: {args.salida} ({time.perf_counter() - t0:.1f} s)")
+
+    t0 = time.perf_counter()
+    compacto = ForestCompilado.cargar_compacto(args.salida)
+    tiempo_compacto = time.perf_counter() - t0
+
+    tamano_pickle = os.path.getsize(model_path) / 1024 / 1024
+    tamano_compacto = os.path.getsize(args.salida) / 1024 / 1024
+    n_hojas = int((forest.indice_hoja >= 0).sum())
+
+    print("\n[TAMAÑO]")
+    print(f"  Pickle (joblib):  {tamano_pickle:10.2f} MB")
+    print(f"  Compacto ({args.bits:2d} b): {tamano_compacto:10.2f} MB ({tamano_pickle / tamano_compacto:.1f}x más chico)")
+    print(f"  Hojas: {n_hojas:,} -> {compacto.proba_hojas.shape[0]:,} distribuciones únicas")
+
+    print("\n[TIEMPO DE CARGA]")
+    print(f"  joblib.load:      {tiempo_joblib * 1000:10.1f} ms")
+    print(f"  cargar_compacto:  {tiempo_compacto * 1000:10.1f} ms")
+
+    prueba = conjunto_de_prueba(modelo, args.muestras) if hasattr(modelo, 'feature_names_in_') else None
+    if prueba is None:
+        # Sin dataset solo se puede medir cuánto coincide con el modelo original
+        print("\n[ADVERTENCIA] No se encontró dataset_modelo_final.csv; se mide solo la coincidencia con el pickle")
+        rng = np.random.default_rng(RANDOM_SEED)
+        X_test = rng.normal(size=(args.muestras, forest.n_features_in_)).astype(np.float32)
+        y_test = None
+    else:
+        X_test, y_test = prueba
+
+    top_pickle, proba_pickle = predict_top_k(modelo, X_test, k=5)
+    top_compacto, proba_compacto = predict_top_k(compacto, X_test, k=5)
+
+    print(f"\n[ACCURACY TOP-K] ({len(X_test):,} viajes)")
+    if y_test is not None:
+        for k in (1, 3, 5):
+            acc_pickle = accuracy_top_k(top_pickle, y_test, k)
+            acc_compacto = accuracy_top_k(top_compacto, y_test, k)
+            print(f"  Top-{k}: pickle {acc_pickle * 100:6.2f}% | compacto {acc_compacto * 100:6.2f}% "
+                  f"({(acc_compacto - acc_pickle) * 100:+.2f} pp)")
+    print(f"  Mismo top-1 que el pickle: {np.mean(top_pickle[:, 0] == top_compacto[:, 0]) * 100:.2f}%")
+    print(f"  Máx. diferencia de probabilidad top-1: {np.abs(proba_pickle[:, 0] - proba_compacto[:, 0]).max():.2e}")
+
+    print("\n" + "=" * 70)
+    print("[OK] EXPORTACIÓN COMPLETADA")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
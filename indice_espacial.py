@@ -0,0 +1,91 @@
+"""
+Índice espacial de estaciones (BallTree con distancia haversine)
+- Se construye una vez a partir de las coordenadas de las estaciones
+- Consultas por lotes: estación más cercana, estaciones dentro de un radio y
+  ajuste de coordenadas a la estación más cercana (con tolerancia)
+- Distancias en metros; las posiciones devueltas son las de los arrays de entrada
+"""
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+# Radio medio de la Tierra (metros)
+RADIO_TIERRA_M = 6_371_000.0
+
+# Distancia máxima para considerar que unas coordenadas corresponden a una estación
+TOLERANCIA_AJUSTE_M = 50.0
+
+# Posición que devuelven las consultas sin resultado (coordenadas faltantes o índice vacío)
+SIN_ESTACION = -1
+
+
+def _radianes(lat, lon):
+    """Matriz (n, 2) de [lat, lon] en radianes, como la espera la métrica haversine"""
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+    return np.radians(np.column_stack([lat, lon]))
+
+
+class IndiceEspacial:
+    """BallTree haversine sobre las coordenadas de un conjunto de estaciones.
+
+    Las estaciones sin coordenadas quedan fuera del árbol. Si varias estaciones
+    comparten coordenadas, el árbol guarda un solo punto y las consultas de
+    cercanía devuelven la primera en el orden de entrada; los conteos por radio
+    cuentan todas.
+    """
+
+    def __init__(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.n_estaciones = len(lat)
+
+        validas = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        puntos = np.column_stack([lat[validas], lon[validas]])
+        _, primeras, inversa = np.unique(puntos, axis=0, return_index=True, return_inverse=True)
+        orden = np.argsort(primeras, kind='stable')
+
+        # Un punto por coordenada distinta (en orden de primera aparición) y cuántas estaciones tiene
+        self._posiciones = validas[primeras[orden]]
+        self._multiplicidad = np.bincount(np.argsort(orden)[inversa.reshape(-1)],
+                                          minlength=len(orden)).astype(np.int64)
+        self._arbol = None
+        if len(self._posiciones):
+            self._arbol = BallTree(_radianes(lat[self._posiciones], lon[self._posiciones]), metric='haversine')
+
+    def __len__(self):
+        return self.n_estaciones
+
+    def _consultables(self, lat, lon):
+        """Coordenadas en radianes y máscara de las filas que se pueden consultar"""
+        coords = _radianes(lat, lon)
+        return coords, ~np.isnan(coords).any(axis=1) & (self._arbol is not None)
+
+    def mas_cercanas(self, lat, lon, k=1):
+        """Las k estaciones más cercanas a cada punto: (posiciones (n, k), distancias en metros (n, k)).
+
+        Sin resultado: posición SIN_ESTACION y distancia infinita.
+        """
+        coords, validas = self._consultables(lat, lon)
+        posiciones = np.full((len(coords), k), SIN_ESTACION, dtype=np.int64)
+        distancias = np.full((len(coords), k), np.inf)
+        if validas.any():
+            k_real = min(k, len(self._posiciones))
+            distancia, vecinos = self._arbol.query(coords[validas], k=k_real)
+            posiciones[validas, :k_real] = self._posiciones[vecinos]
+            distancias[validas, :k_real] = distancia * RADIO_TIERRA_M
+        return posiciones, distancias
+
+    def contar_en_radio(self, lat, lon, radio_m):
+        """Cantidad de estaciones a menos de radio_m metros de cada punto (0 sin coordenadas)"""
+        coords, validas = self._consultables(lat, lon)
+        conteos = np.zeros(len(coords), dtype=np.int64)
+        if validas.any():
+            vecinos = self._arbol.query_radius(coords[validas], r=radio_m / RADIO_TIERRA_M)
+            conteos[validas] = [int(self._multiplicidad[v].sum()) for v in vecinos]
+        return conteos
+
+    def ajustar(self, lat, lon, tolerancia_m=TOLERANCIA_AJUSTE_M):
+        """Posición de la estación más cercana a cada punto si está a menos de tolerancia_m metros"""
+        posiciones, distancias = self.mas_cercanas(lat, lon)
+        return np.where(distancias[:, 0] <= tolerancia_m, posiciones[:, 0], SIN_ESTACION)
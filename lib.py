@@ -11,9 +11,13 @@ import numpy as np
 import joblib
 import json
 import os
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.neighbors import NearestNeighbors
+from indice_espacial import IndiceEspacial
 import streamlit as st
 import altair as alt
 
@@ -21,10 +25,67 @@ import altair as alt
 CENTRO_LAT = -32.89
 CENTRO_LON = -68.84
 
+# Features base (27 características originales)
+FEATURES_BASE = [
+    'origen_lat', 'origen_lon',
+    'hora_salida', 'dia_semana', 'mes',
+    'viajes_totales', 'semanas_activas', 'viajes_por_semana', 'duracion_promedio_min',
+    'periodo_dia_numerico', 'es_fin_semana', 'es_hora_pico', 'zona_origen',
+    'capacidad_origen', 'estaciones_cercanas_origen', 'variedad_destinos', 'variedad_origenes',
+    'consistencia_horaria', 'distancia_promedio_usuario', 'dia_favorito',
+    'frecuencia_lunes', 'frecuencia_martes', 'frecuencia_miercoles',
+    'frecuencia_jueves', 'frecuencia_viernes', 'frecuencia_sabado', 'frecuencia_domingo'
+]
+
+# Coordenadas del destino favorito (modelo con 29 features)
+FEATURES_DESTINO_FAVORITO = ['lat_destino_favorito', 'lon_destino_favorito']
+
+# Valores por defecto del formulario del Modelo cuando no se selecciona usuario
+USUARIO_FORMULARIO_DEFAULT = {
+    'viajes_totales': 25,
+    'semanas_activas': 10,
+    'duracion_promedio_min': 20.0,
+    'distancia_promedio_usuario': 0.025,
+    'variedad_destinos': 8,
+    'variedad_origenes': 5,
+    'consistencia_horaria': 3.0,
+    'dia_favorito': 0,
+    'lat_destino_favorito': 0.0,
+    'lon_destino_favorito': 0.0,
+    'frecuencia_lunes': 5,
+    'frecuencia_martes': 4,
+    'frecuencia_miercoles': 4,
+    'frecuencia_jueves': 4,
+    'frecuencia_viernes': 5,
+    'frecuencia_sabado': 3,
+    'frecuencia_domingo': 2
+}
+
 # ============================================================================
 # TRANSFORMERS PERSONALIZADOS
 # ============================================================================
 
+def _features_temporales(hora, dia):
+    """Calcula periodo_dia_numerico, es_fin_semana y es_hora_pico de forma vectorizada"""
+    hora = np.asarray(hora, dtype=float)
+    dia = np.asarray(dia, dtype=float)
+    
+    # Clasificar período del día
+    periodo = np.select(
+        [(hora >= 6) & (hora < 12), (hora >= 12) & (hora < 18), (hora >= 18) & (hora < 24)],
+        [1, 2, 3],    # mañana, tarde, noche
+        default=0     # madrugada
+    )
+    es_fin_semana = np.isin(dia, [5, 6]).astype(int)
+    es_hora_pico = np.isin(hora, [7, 8, 9, 17, 18, 19]).astype(int)
+    
+    return np.stack([periodo, es_fin_semana, es_hora_pico], axis=-1)
+
+
+# Tabla 24x7 con todas las features temporales derivadas, indexada por (hora_salida, dia_semana)
+TABLA_TEMPORAL = _features_temporales(*np.meshgrid(np.arange(24), np.arange(7), indexing='ij'))
+
+
 class FeatureEngineeringTemporal(BaseEstimator, TransformerMixin):
     """Calcula features temporales derivadas"""
     
@@ -32,20 +93,24 @@ class FeatureEngineeringTemporal(BaseEstimator, TransformerMixin):
         return self
     
     def transform(self, X):
-        X = X.copy()
+        hora = pd.to_numeric(X['hora_salida'], errors='coerce').to_numpy(dtype=float)
+        dia = pd.to_numeric(X['dia_semana'], errors='coerce').to_numpy(dtype=float)
         
-        # Clasificar período del día
-        def clasificar_periodo(hora):
-            if 6 <= hora < 12: return 1    # mañana
-            elif 12 <= hora < 18: return 2 # tarde
-            elif 18 <= hora < 24: return 3 # noche
-            else: return 0                # madrugada
-        
-        X['periodo_dia_numerico'] = X['hora_salida'].apply(clasificar_periodo)
-        X['es_fin_semana'] = X['dia_semana'].isin([5, 6]).astype(int)
-        X['es_hora_pico'] = X['hora_salida'].isin([7, 8, 9, 17, 18, 19]).astype(int)
+        dentro_tabla = (
+            (hora >= 0) & (hora < 24) & (hora == np.floor(hora)) &
+            (dia >= 0) & (dia < 7) & (dia == np.floor(dia))
+        )
+        if dentro_tabla.all():
+            derivadas = TABLA_TEMPORAL[hora.astype(np.intp), dia.astype(np.intp)]
+        else:
+            # Horas o días fuera de rango (o no enteros): cálculo directo
+            derivadas = _features_temporales(hora, dia)
         
-        return X
+        return X.assign(
+            periodo_dia_numerico=derivadas[:, 0],
+            es_fin_semana=derivadas[:, 1],
+            es_hora_pico=derivadas[:, 2]
+        )
 
 
 class FeatureEngineeringGeografica(BaseEstimator, TransformerMixin):
@@ -53,96 +118,164 @@ class FeatureEngineeringGeografica(BaseEstimator, TransformerMixin):
     
     def __init__(self, estaciones_data=None):
         self.estaciones_data = estaciones_data
-        self.estaciones_dict = None
-        self.estaciones_cercanas_dict = None
+        self.tabla_estaciones = None
     
     def fit(self, X, y=None):
-        if self.estaciones_data is not None:
-            # Crear diccionario de estaciones por coordenadas
-            self.estaciones_dict = {}
-            for _, row in self.estaciones_data.iterrows():
-                lat = row.get('station_lat', row.get('lat', None))
-                lon = row.get('station_lon', row.get('lon', None))
-                if pd.notna(lat) and pd.notna(lon):
-                    key = (round(lat, 5), round(lon, 5))
-                    self.estaciones_dict[key] = {
-                        'capacidad': row.get('station_capacity', row.get('capacity', 0)),
-                        'zona': self._clasificar_zona(lat, lon)
-                    }
+        self.tabla_estaciones = None
+        self._indice_estaciones = None
+        if self.estaciones_data is not None and len(self.estaciones_data) > 0:
+            datos = self.estaciones_data
+            lat = _columna_numerica(datos, ['station_lat', 'lat'])
+            lon = _columna_numerica(datos, ['station_lon', 'lon'])
+            capacidad = _columna_numerica(datos, ['station_capacity', 'capacity'], default=0)
             
-            # Calcular estaciones cercanas
-            if len(self.estaciones_data) > 0:
-                coords = self.estaciones_data[['station_lat', 'station_lon']].values
-                if len(coords) > 0:
-                    nbrs = NearestNeighbors(n_neighbors=min(10, len(coords)), algorithm='ball_tree')
-                    nbrs.fit(coords)
-                    self.estaciones_cercanas_dict = {}
-                    for idx, row in self.estaciones_data.iterrows():
-                        lat = row.get('station_lat', row.get('lat', None))
-                        lon = row.get('station_lon', row.get('lon', None))
-                        if pd.notna(lat) and pd.notna(lon):
-                            coords_point = [[lat, lon]]
-                            distances, indices = nbrs.kneighbors(coords_point)
-                            cercanas = (distances[0] <= 0.01).sum() - 1
-                            key = (round(lat, 5), round(lon, 5))
-                            self.estaciones_cercanas_dict[key] = max(0, cercanas)
+            validas = ~(np.isnan(lat) | np.isnan(lon))
+            lat, lon, capacidad = lat[validas], lon[validas], capacidad[validas]
+            if len(lat) == 0:
+                return self
+            
+            cercanas = contar_estaciones_cercanas(lat, lon)
+            
+            # Tabla por estación indexada por coordenadas redondeadas
+            # (ante coordenadas repetidas se conserva la última estación)
+            tabla = pd.DataFrame({
+                'capacidad': capacidad,
+                'zona': self._clasificar_zona(lat, lon),
+                'estaciones_cercanas': cercanas
+            }, index=_clave_coordenadas(lat, lon))
+            self.tabla_estaciones = tabla[~tabla.index.duplicated(keep='last')]
         
         return self
-    
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if 'tabla_estaciones' not in self.__dict__:
+            # Preprocessors guardados antes de tabla_estaciones: se arma desde sus diccionarios
+            self.tabla_estaciones = self._tabla_desde_diccionarios(
+                state.get('estaciones_dict'), state.get('estaciones_cercanas_dict')
+            )
+
+    @staticmethod
+    def _tabla_desde_diccionarios(estaciones_dict, estaciones_cercanas_dict):
+        """tabla_estaciones a partir de los diccionarios por (lat, lon) de la versión anterior"""
+        if not estaciones_dict:
+            return None
+        claves = list(estaciones_dict)
+        cercanas = estaciones_cercanas_dict or {}
+        lat = np.array([clave[0] for clave in claves], dtype=float)
+        lon = np.array([clave[1] for clave in claves], dtype=float)
+        tabla = pd.DataFrame({
+            'capacidad': [estaciones_dict[clave]['capacidad'] for clave in claves],
+            'zona': [estaciones_dict[clave]['zona'] for clave in claves],
+            'estaciones_cercanas': [cercanas.get(clave, 5) for clave in claves]
+        }, index=_clave_coordenadas(lat, lon))
+        return tabla[~tabla.index.duplicated(keep='last')]
+
     def _clasificar_zona(self, lat, lon):
-        """Clasifica zona geográfica"""
-        if pd.isna(lat) or pd.isna(lon):
-            return 0
-        dist_lat = abs(lat - CENTRO_LAT)
-        dist_lon = abs(lon - CENTRO_LON)
-        if dist_lat < 0.02 and dist_lon < 0.02:
-            return 1    # Centro
-        elif dist_lat < 0.05 and dist_lon < 0.05:
-            return 2    # Cerca del centro
-        elif dist_lat < 0.1 and dist_lon < 0.1:
-            return 3    # Periferia
-        else:
-            return 4    # Lejos
+        """Clasifica zona geográfica (acepta escalares o arrays)"""
+        return clasificar_zona(lat, lon)
+    
+    def _indice(self):
+        """Índice espacial de tabla_estaciones (se arma al primer uso, también en preprocessors ya guardados)"""
+        if getattr(self, '_indice_estaciones', None) is None:
+            self._indice_estaciones = IndiceEspacial(*_coordenadas_de_clave(self.tabla_estaciones.index.to_numpy()))
+        return self._indice_estaciones
+    
+    def posiciones_estaciones(self, lat, lon):
+        """Fila de tabla_estaciones para cada punto (-1 si no corresponde a ninguna estación).
+        
+        Primero por coordenadas exactas (5 decimales); las que no coinciden se ajustan
+        a la estación más cercana si está a menos de TOLERANCIA_AJUSTE_M metros.
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        posiciones = self.tabla_estaciones.index.get_indexer(_clave_coordenadas(lat, lon))
+        faltan = np.flatnonzero(posiciones < 0)
+        if len(faltan):
+            posiciones[faltan] = self._indice().ajustar(lat[faltan], lon[faltan])
+        return posiciones
     
     def transform(self, X):
-        X = X.copy()
+        lat = _columna_numerica(X, ['origen_lat'])
+        lon = _columna_numerica(X, ['origen_lon'])
         
-        # Calcular zona_origen
-        X['zona_origen'] = X.apply(
-            lambda row: self._clasificar_zona(row.get('origen_lat', 0), row.get('origen_lon', 0)),
-            axis=1
-        )
+        nuevas = {'zona_origen': self._clasificar_zona(lat, lon)}
         
         # Buscar capacidad y estaciones cercanas si tenemos datos
-        if self.estaciones_dict is not None:
-            X['capacidad_origen'] = X.apply(
-                lambda row: self._get_capacidad(row.get('origen_lat', 0), row.get('origen_lon', 0)),
-                axis=1
+        if self.tabla_estaciones is not None:
+            posiciones = self.posiciones_estaciones(lat, lon)
+            encontradas = posiciones >= 0
+            nuevas['capacidad_origen'] = np.where(
+                encontradas, self.tabla_estaciones['capacidad'].to_numpy()[posiciones], 15
             )
-            X['estaciones_cercanas_origen'] = X.apply(
-                lambda row: self._get_estaciones_cercanas(row.get('origen_lat', 0), row.get('origen_lon', 0)),
-                axis=1
+            nuevas['estaciones_cercanas_origen'] = np.where(
+                encontradas, self.tabla_estaciones['estaciones_cercanas'].to_numpy()[posiciones], 5
             )
         else:
             # Valores por defecto si no hay datos de estaciones
-            X['capacidad_origen'] = 15  # Valor promedio
-            X['estaciones_cercanas_origen'] = 5  # Valor promedio
+            nuevas['capacidad_origen'] = 15  # Valor promedio
+            nuevas['estaciones_cercanas_origen'] = 5  # Valor promedio
         
-        return X
-    
-    def _get_capacidad(self, lat, lon):
-        """Obtiene capacidad de estación más cercana"""
-        if self.estaciones_dict is None:
-            return 15
-        key = (round(lat, 5), round(lon, 5))
-        return self.estaciones_dict.get(key, {}).get('capacidad', 15)
-    
-    def _get_estaciones_cercanas(self, lat, lon):
-        """Obtiene número de estaciones cercanas"""
-        if self.estaciones_cercanas_dict is None:
-            return 5
-        key = (round(lat, 5), round(lon, 5))
-        return self.estaciones_cercanas_dict.get(key, 5)
+        return X.assign(**nuevas)
+
+
+def clasificar_zona(lat, lon):
+    """Zona geográfica respecto del centro de Mendoza (acepta escalares o arrays)"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    dist_lat = np.abs(lat - CENTRO_LAT)
+    dist_lon = np.abs(lon - CENTRO_LON)
+    zona = np.select(
+        [
+            np.isnan(lat) | np.isnan(lon),
+            (dist_lat < 0.02) & (dist_lon < 0.02),    # Centro
+            (dist_lat < 0.05) & (dist_lon < 0.05),    # Cerca del centro
+            (dist_lat < 0.1) & (dist_lon < 0.1)       # Periferia
+        ],
+        [0, 1, 2, 3],
+        default=4                                     # Lejos
+    )
+    return zona if zona.ndim else int(zona)
+
+
+def contar_estaciones_cercanas(lat, lon):
+    """Cantidad de otras estaciones a menos de 0.01 grados (entre las 10 más cercanas).
+
+    Una sola consulta kneighbors para todas las estaciones; lat/lon sin NaN.
+    """
+    coords = np.column_stack([np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)])
+    if len(coords) == 0:
+        return np.zeros(0, dtype=np.int64)
+    nbrs = NearestNeighbors(n_neighbors=min(10, len(coords)), algorithm='ball_tree')
+    nbrs.fit(coords)
+    distances, _ = nbrs.kneighbors(coords)
+    return np.maximum(0, (distances <= 0.01).sum(axis=1) - 1)
+
+
+def _columna_numerica(df, nombres, default=0):
+    """Devuelve la primera columna existente como array float (o un valor por defecto)"""
+    for nombre in nombres:
+        if nombre in df.columns:
+            return pd.to_numeric(df[nombre], errors='coerce').to_numpy(dtype=float)
+    return np.full(len(df), default, dtype=float)
+
+
+def _clave_coordenadas(lat, lon):
+    """Clave entera de coordenadas redondeadas a 5 decimales (-1 si faltan)"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    validas = ~(np.isnan(lat) | np.isnan(lon))
+    lat_i = np.rint(np.where(validas, lat, 0) * 1e5).astype(np.int64) + 9_000_000
+    lon_i = np.rint(np.where(validas, lon, 0) * 1e5).astype(np.int64) + 18_000_000
+    return np.where(validas, lat_i * 36_000_001 + lon_i, -1)
+
+
+def _coordenadas_de_clave(claves):
+    """Inversa de _clave_coordenadas: (lat, lon) redondeadas a 5 decimales"""
+    claves = np.asarray(claves, dtype=np.int64)
+    lat = (claves // 36_000_001 - 9_000_000) / 1e5
+    lon = (claves % 36_000_001 - 18_000_000) / 1e5
+    return lat, lon
 
 
 class FeatureEngineeringUsuario(BaseEstimator, TransformerMixin):
@@ -207,7 +340,11 @@ class FeatureSelector(BaseEstimator, TransformerMixin):
     
     def fit(self, X, y=None):
         return self
-    
+
+    def __sklearn_is_fitted__(self):
+        # Sin estado: sklearn >= 1.6 valida el Pipeline por su último paso
+        return True
+
     def transform(self, X):
         # Asegurar que todas las features existan
         missing_features = [f for f in self.features if f not in X.columns]
@@ -224,18 +361,24 @@ class FeatureSelector(BaseEstimator, TransformerMixin):
 # FUNCIONES DE CARGA Y PROCESAMIENTO
 # ============================================================================
 
+# Catálogo de estaciones: JSON procesado (procesar_estaciones.py) o CSV original como respaldo
+ESTACIONES_JSON_PATHS = [
+    "static/estaciones.json",
+    "estaciones.json",
+    "../prediccion/estaciones.json"
+]
+ESTACIONES_CSV_PATHS = [
+    "../prediccion/station_data_enriched (1).csv",
+    "prediccion/station_data_enriched (1).csv",
+    "station_data_enriched (1).csv"
+]
+
 def load_stations():
     """Carga las estaciones con sus nombres y coordenadas desde JSON"""
     import json
     
-    json_paths = [
-        "static/estaciones.json",
-        "estaciones.json",
-        "../prediccion/estaciones.json"
-    ]
-    
     # Primero intentar cargar desde JSON (formato procesado)
-    for json_path in json_paths:
+    for json_path in ESTACIONES_JSON_PATHS:
         try:
             if os.path.exists(json_path):
                 with open(json_path, 'r', encoding='utf-8') as f:
@@ -245,13 +388,7 @@ def load_stations():
             continue
     
     # Si no se encuentra JSON, intentar cargar desde CSV (fallback)
-    estaciones_paths = [
-        "../prediccion/station_data_enriched (1).csv",
-        "prediccion/station_data_enriched (1).csv",
-        "station_data_enriched (1).csv"
-    ]
-    
-    for estaciones_path in estaciones_paths:
+    for estaciones_path in ESTACIONES_CSV_PATHS:
         try:
             if os.path.exists(estaciones_path):
                 df_estaciones = pd.read_csv(estaciones_path)
@@ -300,6 +437,31 @@ def load_stations():
     # Si no se encuentra, retornar diccionario vacío
     return {}
 
+def valores_formulario_usuario(usuario_data=None, estaciones=None):
+    """Datos de usuario tal como los envía el formulario del Modelo sin editarlos.
+    
+    estaciones es la dimensión de estaciones (estaciones.DimensionEstaciones) o None.
+    """
+    datos = usuario_data or USUARIO_FORMULARIO_DEFAULT
+    valores = {campo: datos[campo] for campo in USUARIO_FORMULARIO_DEFAULT
+               if campo not in ('lat_destino_favorito', 'lon_destino_favorito')}
+    valores['viajes_por_semana'] = (
+        valores['viajes_totales'] / valores['semanas_activas'] if valores['semanas_activas'] > 0 else 0
+    )
+    
+    # El selector de destino favorito usa la estación más cercana a las coordenadas del usuario
+    lat = datos.get('lat_destino_favorito', 0.0)
+    lon = datos.get('lon_destino_favorito', 0.0)
+    if estaciones is not None and lat != 0.0 and lon != 0.0:
+        id_cercana = estaciones.mas_cercana(lat, lon)
+        if id_cercana >= 0:
+            lat = float(estaciones.lat[id_cercana])
+            lon = float(estaciones.lon[id_cercana])
+    valores['lat_destino_favorito'] = lat
+    valores['lon_destino_favorito'] = lon
+    
+    return valores
+
 def load_usuarios():
     """Carga los usuarios con sus métricas desde JSON"""
     import json
@@ -323,16 +485,16 @@ def load_usuarios():
     # Si no se encuentra, retornar diccionario vacío
     return {}
 
+# Rutas posibles del modelo (priorizar modelo con destino favorito en static/)
+MODEL_PATHS = [
+    "static/modelo_con_destino_favorito.pkl",
+    "modelos/modelo_con_destino_favorito.pkl",
+    "../modelos/modelo_con_destino_favorito.pkl"
+]
+
 def load_model():
-    """Carga el modelo Random Forest entrenado (con destino favorito)"""
-    # Intentar diferentes rutas posibles (priorizar modelo con destino favorito en static/)
-    model_paths = [
-        "static/modelo_con_destino_favorito.pkl",
-        "modelos/modelo_con_destino_favorito.pkl",
-        "../modelos/modelo_con_destino_favorito.pkl"
-    ]
-    
-    for model_path in model_paths:
+    """Carga el modelo entrenado (con destino favorito), de cualquier backend de backend_modelo.py"""
+    for model_path in MODEL_PATHS:
         try:
             if os.path.exists(model_path):
                 # Verificar que el archivo no esté vacío
@@ -355,6 +517,69 @@ def load_model():
     # (la advertencia se mostrará en las páginas que lo usen)
     return None
 
+# Modelo exportado en formato compacto (exportar_modelo_compacto.py)
+MODELO_COMPACTO_PATHS = [
+    "static/modelo_compacto.npz",
+    "modelos/modelo_compacto.npz"
+]
+
+def load_modelo_compacto():
+    """Carga el modelo en formato compacto (ForestCompilado) si existe"""
+    from motor_forest import ForestCompilado
+    
+    for model_path in MODELO_COMPACTO_PATHS:
+        try:
+            if os.path.exists(model_path) and os.path.getsize(model_path) > 0:
+                return ForestCompilado.cargar_compacto(model_path)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            continue
+    return None
+
+def huella_modelo():
+    """Identifica el artefacto del modelo en disco (ruta, tamaño, fecha de modificación)"""
+    for model_path in MODEL_PATHS + MODELO_COMPACTO_PATHS:
+        if os.path.exists(model_path) and os.path.getsize(model_path) > 0:
+            stat = os.stat(model_path)
+            return (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+    return None
+
+def hash_contenido_modelo(model_path):
+    """SHA-256 del artefacto del modelo (identifica el modelo entre máquinas)"""
+    sha = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_modelo_compilado(huella=None):
+    """Carga el modelo y lo aplana en tablas de nodos para inferencia de baja latencia.
+    
+    La huella del artefacto forma parte de la clave del cache: si el archivo cambia
+    se vuelve a cargar. Si el modelo está en el registro (registrar_modelo.py) se
+    mapea en memoria sin deserializar el pickle; si no hay pickle se usa el formato
+    compacto.
+    """
+    from motor_forest import compilar_modelo
+    from registro_modelos import RegistroModelos
+    
+    if huella is not None:
+        try:
+            registro = RegistroModelos()
+            nombre = registro.buscar(huella, sha256=lambda: hash_contenido_modelo(huella[0]))
+            if nombre is not None:
+                return registro.cargar(nombre)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+    
+    modelo = load_model()
+    if modelo is None:
+        return load_modelo_compacto()
+    return compilar_modelo(modelo)
+
 def load_label_encoder():
     """Carga el LabelEncoder para destino favorito"""
     # Intentar diferentes rutas posibles (priorizar static/)
@@ -401,18 +626,6 @@ def create_preprocessor(modelo=None):
     """Crea un preprocessor con todos los transformers"""
     from sklearn.pipeline import Pipeline
     
-    # Features base (27 características originales)
-    features_base = [
-        'origen_lat', 'origen_lon',
-        'hora_salida', 'dia_semana', 'mes',
-        'viajes_totales', 'semanas_activas', 'viajes_por_semana', 'duracion_promedio_min',
-        'periodo_dia_numerico', 'es_fin_semana', 'es_hora_pico', 'zona_origen',
-        'capacidad_origen', 'estaciones_cercanas_origen', 'variedad_destinos', 'variedad_origenes',
-        'consistencia_horaria', 'distancia_promedio_usuario', 'dia_favorito',
-        'frecuencia_lunes', 'frecuencia_martes', 'frecuencia_miercoles',
-        'frecuencia_jueves', 'frecuencia_viernes', 'frecuencia_sabado', 'frecuencia_domingo'
-    ]
-    
     # Detectar si el modelo espera coordenadas de destino favorito
     usar_destino_favorito = False
     if modelo is not None:
@@ -423,9 +636,9 @@ def create_preprocessor(modelo=None):
     
     # Construir lista de features finales
     if usar_destino_favorito:
-        features_finales = features_base + ['lat_destino_favorito', 'lon_destino_favorito']
+        features_finales = FEATURES_BASE + FEATURES_DESTINO_FAVORITO
     else:
-        features_finales = features_base
+        features_finales = list(FEATURES_BASE)
     
     # Intentar cargar datos de estaciones si existen
     estaciones_data = None
@@ -473,6 +686,225 @@ def process_input(input_data: dict, preprocessor):
     return X_processed
 
 
+class VectorizadorRapido:
+    """Camino rápido para un solo viaje: dict -> fila float32 sin pasar por el Pipeline.
+
+    Replica los pasos de create_preprocessor (temporal, geográfica, usuario y
+    selector) escribiendo directamente sobre una fila preasignada en el orden de
+    features del modelo. La fila se reutiliza entre llamadas: copiarla si se
+    necesita conservarla.
+    """
+    
+    def __init__(self, preprocessor):
+        pasos = preprocessor.named_steps
+        self.features = list(pasos['selector'].features)
+        self.geografica = pasos['geografica']
+        self._posicion = {feature: i for i, feature in enumerate(self.features)}
+        
+        # Valores por defecto: 0 (selector) salvo las features de usuario
+        self._fila_default = np.zeros((1, len(self.features)), dtype=np.float32)
+        for feature, default in pasos['usuario'].valores_default.items():
+            if feature in self._posicion and default is not None:
+                self._fila_default[0, self._posicion[feature]] = default
+        self._fila = self._fila_default.copy()
+        
+        # Capacidad y estaciones cercanas por clave de coordenadas
+        self._estaciones = {}
+        tabla = self.geografica.tabla_estaciones
+        if tabla is not None:
+            self._valores_estaciones = list(zip(tabla['capacidad'].tolist(), tabla['estaciones_cercanas'].tolist()))
+            self._estaciones = dict(zip(tabla.index.tolist(), self._valores_estaciones))
+    
+    def _asignar(self, feature, valor):
+        i = self._posicion.get(feature)
+        if i is not None:
+            self._fila[0, i] = valor
+    
+    def transform(self, input_data: dict):
+        """Devuelve la fila de features (1, n_features) en float32"""
+        fila = self._fila
+        fila[:] = self._fila_default
+        for feature, valor in input_data.items():
+            self._asignar(feature, np.nan if valor is None else valor)
+        
+        # Features temporales
+        hora, dia = input_data['hora_salida'], input_data['dia_semana']
+        if hora in range(24) and dia in range(7):
+            periodo, fin_semana, hora_pico = TABLA_TEMPORAL[int(hora), int(dia)]
+        else:
+            periodo, fin_semana, hora_pico = _features_temporales(hora, dia)
+        self._asignar('periodo_dia_numerico', periodo)
+        self._asignar('es_fin_semana', fin_semana)
+        self._asignar('es_hora_pico', hora_pico)
+        
+        # Features geográficas
+        lat = input_data.get('origen_lat', 0)
+        lon = input_data.get('origen_lon', 0)
+        lat = np.nan if lat is None else lat
+        lon = np.nan if lon is None else lon
+        self._asignar('zona_origen', self.geografica._clasificar_zona(lat, lon))
+        if self.geografica.tabla_estaciones is not None:
+            clave = int(_clave_coordenadas(lat, lon))
+            valores = self._estaciones.get(clave)
+            if valores is None:
+                # Coordenadas que no coinciden exactamente: estación a menos de TOLERANCIA_AJUSTE_M (como el Pipeline)
+                posicion = self.geografica.posiciones_estaciones([lat], [lon])[0]
+                valores = self._valores_estaciones[posicion] if posicion >= 0 else (15, 5)
+            capacidad, cercanas = valores
+        else:
+            capacidad, cercanas = 15, 5
+        self._asignar('capacidad_origen', capacidad)
+        self._asignar('estaciones_cercanas_origen', cercanas)
+        
+        # Evitar división por cero (igual que FeatureEngineeringUsuario)
+        i = self._posicion.get('semanas_activas')
+        if i is not None and fila[0, i] == 0:
+            fila[0, i] = 1
+        
+        return fila
+
+
+class CachePredicciones:
+    """Cache LRU de predicciones indexado por la fila de features procesada.
+    
+    La clave es un hash canónico de la fila en float32 (y de k), así entradas que
+    producen las mismas features comparten resultado. El cache se vacía cuando
+    cambia la huella del modelo.
+    """
+    
+    def __init__(self, max_entradas=4096):
+        self.max_entradas = max_entradas
+        self.huella_modelo = None
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def clave(fila, k=5):
+        """Hash canónico de la fila de features"""
+        fila = np.ascontiguousarray(fila, dtype=np.float32).ravel() + np.float32(0)  # -0.0 -> 0.0
+        fila[np.isnan(fila)] = np.nan  # un único patrón de bits para NaN
+        return hashlib.blake2b(fila.tobytes() + k.to_bytes(2, 'little'), digest_size=16).digest()
+    
+    def validar_modelo(self, huella):
+        """Invalida el cache si el artefacto del modelo cambió"""
+        with self._lock:
+            if huella != self.huella_modelo:
+                self._entradas.clear()
+                self.huella_modelo = huella
+    
+    def obtener(self, fila, calcular, k=5):
+        """Devuelve el resultado cacheado para la fila o lo calcula con calcular()"""
+        clave = self.clave(fila, k)
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave]
+            self.fallos += 1
+        
+        resultado = calcular()
+        with self._lock:
+            self._entradas[clave] = resultado
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return resultado
+    
+    def estadisticas(self):
+        """Contadores de aciertos/fallos y ocupación del cache"""
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / total if total > 0 else 0.0,
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def load_cache_predicciones(max_entradas=4096):
+    """Cache de predicciones compartido por todas las sesiones del proceso"""
+    return CachePredicciones(max_entradas=max_entradas)
+
+
+def predict_top_k_cacheado(modelo, fila, cache, k=5):
+    """predict_top_k para una sola fila pasando por el cache de predicciones"""
+    def calcular():
+        top_classes, top_probs = predict_top_k(modelo, fila, k=k)
+        # Los resultados se comparten entre sesiones: protegerlos contra escritura
+        top_classes.setflags(write=False)
+        top_probs.setflags(write=False)
+        return top_classes, top_probs
+    
+    return cache.obtener(fila, calcular, k=k)
+
+
+def load_viajes(path):
+    """Carga un lote de viajes desde CSV o Parquet"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def process_batch(df_viajes: pd.DataFrame, preprocessor):
+    """Procesa un lote de viajes aplicando el preprocessor una sola vez"""
+    df_input = df_viajes
+
+    # Derivar viajes_por_semana igual que en el formulario del Modelo
+    if 'viajes_por_semana' not in df_input.columns and \
+            'viajes_totales' in df_input.columns and 'semanas_activas' in df_input.columns:
+        semanas = df_input['semanas_activas'].where(df_input['semanas_activas'] > 0)
+        df_input = df_input.assign(
+            viajes_por_semana=(df_input['viajes_totales'] / semanas).fillna(0)
+        )
+
+    return preprocessor.transform(df_input)
+
+
+def predict_top_k(modelo, X_processed, k=5):
+    """Calcula los top-k destinos con una única llamada a predict_proba"""
+    if isinstance(X_processed, np.ndarray) and isinstance(modelo, BaseEstimator) \
+            and hasattr(modelo, 'feature_names_in_'):
+        # Los modelos sklearn entrenados con nombres de features esperan un DataFrame
+        X_processed = pd.DataFrame(X_processed, columns=modelo.feature_names_in_)
+    probabilidades = np.asarray(modelo.predict_proba(X_processed))
+    k = min(k, probabilidades.shape[1])
+
+    # Orden estable descendente: ante empates gana el primer índice (igual que argmax/predict)
+    top_indices = np.argsort(-probabilidades, axis=1, kind='stable')[:, :k]
+    top_probs = np.take_along_axis(probabilidades, top_indices, axis=1)
+    top_classes = np.asarray(modelo.classes_)[top_indices]
+
+    return top_classes, top_probs
+
+
+def accuracy_top_k(top_classes, y, k):
+    """Fracción de viajes cuyo destino real está entre las primeras k clases de top_classes"""
+    aciertos = top_classes[:, :k] == np.asarray(y)[:, np.newaxis]
+    return float(aciertos.any(axis=1).mean())
+
+
+def predict_batch(df_viajes: pd.DataFrame, modelo, preprocessor, top_k=5):
+    """Predice el destino de un lote de viajes (top-1 y top-k)"""
+    X_processed = process_batch(df_viajes, preprocessor)
+    top_classes, top_probs = predict_top_k(modelo, X_processed, k=top_k)
+
+    resultado = {
+        'destino_predicho': top_classes[:, 0],
+        'probabilidad': top_probs[:, 0]
+    }
+    for i in range(top_classes.shape[1]):
+        resultado[f'destino_{i + 1}'] = top_classes[:, i]
+        resultado[f'probabilidad_{i + 1}'] = top_probs[:, i]
+
+    return pd.DataFrame(resultado, index=df_viajes.index)
+
+
 # ============================================================================
 # FUNCIONES DE VISUALIZACIÓN
 # ============================================================================
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para materializar la tabla de top-k destinos del Modelo
+- Recorre todos los usuarios de usuarios.json (más el usuario por defecto del formulario)
+- Recorre todas las estaciones de origen y todas las combinaciones de hora, día y mes
+- Guarda el top-k de cada combinación en static/tabla_topk/ (arrays .npy mapeables en memoria)
+
+La página del Modelo responde desde la tabla cuando la entrada coincide con un
+usuario y una estación conocidos, y usa inferencia en vivo para el resto.
+
+Uso:
+    python materializar_topk.py --top-k 5
+"""
+
+import argparse
+import os
+import time
+
+from lib import (
+    load_model, load_preprocessor, create_preprocessor, load_usuarios,
+    huella_modelo, hash_contenido_modelo, VectorizadorRapido
+)
+from estaciones import construir_dimension
+from motor_forest import compilar_modelo
+from tabla_topk import construir_tabla, TABLA_PATHS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Materialización de la tabla top-k")
+    parser.add_argument("-o", "--salida", default=TABLA_PATHS[0],
+                        help="Directorio de salida")
+    parser.add_argument("-k", "--top-k", type=int, default=5,
+                        help="Cantidad de destinos a guardar por combinación")
+    parser.add_argument("--max-usuarios", type=int, default=None,
+                        help="Limitar la cantidad de usuarios (para pruebas)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("MATERIALIZACIÓN DE TABLA TOP-K")
+    print("=" * 70)
+
+    huella = huella_modelo()
+    modelo = load_model()
+    if modelo is None or huella is None:
+        print("[ERROR] No se pudo cargar el modelo")
+        return
+
+    preprocessor = load_preprocessor()
+    if preprocessor is None:
+        preprocessor = create_preprocessor(modelo=modelo)
+    vectorizador = VectorizadorRapido(preprocessor)
+
+    dimension = construir_dimension()
+    n_estaciones = len(dimension.ids_catalogo())
+    usuarios = load_usuarios()
+    if n_estaciones == 0:
+        print("[ERROR] No se encontraron estaciones")
+        return
+    if args.max_usuarios is not None:
+        usuarios = dict(list(usuarios.items())[:args.max_usuarios])
+
+    n_combinaciones = (len(usuarios) + 1) * n_estaciones * 24 * 7 * 12
+    print(f"[OK] {len(usuarios) + 1} usuarios x {n_estaciones} estaciones x 24 h x 7 días x 12 meses")
+    print(f"     {n_combinaciones:,} combinaciones")
+
+    def progreso(hechos, total):
+        print(f"     Usuarios procesados: {hechos}/{total}", end="\r")
+
+    t0 = time.time()
+    tabla = construir_tabla(
+        compilar_modelo(modelo), vectorizador, dimension, usuarios,
+        hash_modelo=hash_contenido_modelo(huella[0]), k=args.top_k, progreso=progreso
+    )
+    tiempo = time.time() - t0
+    print()
+
+    tabla.guardar(args.salida)
+
+    tamano_mb = sum(os.path.getsize(os.path.join(args.salida, archivo))
+                    for archivo in os.listdir(args.salida)) / 1024 / 1024
+    print(f"[OK] Tabla guardada en: {args.salida} ({tamano_mb:.1f} MB)")
+    print(f"     Tiempo: {tiempo:.1f} s ({n_combinaciones / tiempo:,.0f} combinaciones/s)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
@@ -3,19 +3,38 @@ Página del modelo - Inferencia y visualización
 Permite al usuario ingresar datos nuevos y probar el modelo entrenado
 """
 
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
 import altair as alt
-from lib import load_model, load_preprocessor, process_input, load_stations, load_usuarios
+from lib import USUARIO_FORMULARIO_DEFAULT, load_modelo_compilado, load_preprocessor, process_input, VectorizadorRapido, huella_modelo, load_cache_predicciones, predict_top_k_cacheado, load_usuarios
+from estaciones import load_dimension_estaciones
+from tabla_topk import load_tabla_topk
+from servicio_prediccion import VARIABLE_SERVICIO, conectar_servicio_prediccion
 
-def model_page():
-    st.title("🤖 Modelo de Predicción")
-    st.markdown("---")
+# Segundos que se reutiliza el chequeo de salud del servicio de predicción
+TTL_SERVICIO_S = 30
+
+
+@st.cache_resource(ttl=TTL_SERVICIO_S, show_spinner=False)
+def load_servicio_prediccion(direccion):
+    """Cliente del servicio (None si no está configurado o no responde), compartido entre reruns.
+
+    Sin cache cada interacción con un widget repetiría el chequeo de salud; con el
+    servicio caído la app pasa al modelo local y vuelve a probar cada TTL_SERVICIO_S.
+    """
+    return conectar_servicio_prediccion(direccion)
+
+def cargar_backend_local():
+    """Carga modelo, preprocessor, cache, tabla top-k y vectorizador en este proceso.
     
-    # Cargar modelo con manejo de errores
+    Devuelve None (después de mostrar el error) si no se pudo cargar el modelo o el preprocessor.
+    """
+    # Cargar modelo (aplanado para inferencia rápida) con manejo de errores
     try:
-        modelo = load_model()
+        huella = huella_modelo()
+        modelo = load_modelo_compilado(huella)
     except Exception as e:
         st.error(f"Error al cargar el modelo: {e}")
         st.info("💡 La app puede funcionar sin el modelo, pero las predicciones no estarán disponibles.")
@@ -24,7 +43,7 @@ def model_page():
     if modelo is None:
         st.warning("⚠️ No se pudo cargar el modelo. Algunas funcionalidades no estarán disponibles.")
         st.info("💡 Asegúrate de que el modelo esté en la carpeta static/")
-        return
+        return None
     
     # Cargar preprocessor con manejo de errores
     try:
@@ -41,11 +60,43 @@ def model_page():
             preprocessor = create_preprocessor(modelo=modelo)
         except Exception as e2:
             st.error(f"No se pudo crear el preprocessor: {e2}")
-            return
+            return None
     
     if preprocessor is None:
         st.error("No se pudo cargar o crear el preprocessor.")
-        return
+        return None
+    
+    # Cache de predicciones compartido (se invalida si cambia el artefacto del modelo)
+    cache_predicciones = load_cache_predicciones()
+    cache_predicciones.validar_modelo(huella)
+    
+    # Tabla materializada para usuarios y estaciones conocidos (None si no existe o es de otro modelo)
+    try:
+        tabla_topk = load_tabla_topk(huella)
+    except Exception:
+        tabla_topk = None
+    
+    # Camino rápido dict -> fila de features (si el preprocessor tiene la estructura esperada)
+    try:
+        vectorizador = VectorizadorRapido(preprocessor)
+    except Exception:
+        vectorizador = None
+    
+    return huella, modelo, preprocessor, cache_predicciones, tabla_topk, vectorizador
+
+def model_page():
+    st.title("🤖 Modelo de Predicción")
+    st.markdown("---")
+    
+    # Backend: servicio de predicción compartido (si está configurado y responde) o modelo en este proceso
+    servicio = load_servicio_prediccion(os.environ.get(VARIABLE_SERVICIO))
+    if servicio is not None:
+        huella = modelo = preprocessor = cache_predicciones = tabla_topk = vectorizador = None
+    else:
+        backend = cargar_backend_local()
+        if backend is None:
+            return
+        huella, modelo, preprocessor, cache_predicciones, tabla_topk, vectorizador = backend
     
     # Interfaz de inferencia
     st.subheader("🔮 Probar el Modelo")
@@ -54,8 +105,10 @@ def model_page():
     Si no tienes datos del historial del usuario, se usarán valores por defecto.
     """)
     
-    # Cargar estaciones para el selector
-    estaciones = load_stations()
+    # Cargar la dimensión de estaciones para el selector (solo se ofrecen las del catálogo)
+    dimension = load_dimension_estaciones()
+    nombres_estaciones = dimension.nombres_catalogo()
+    hay_estaciones = len(nombres_estaciones) > 0
     
     # Selector de estación fuera del formulario para que se actualice en tiempo real
     col_geo_header, col_temp_header = st.columns(2)
@@ -63,9 +116,8 @@ def model_page():
     with col_geo_header:
         st.markdown("### 📍 Datos Geográficos")
         
-        if estaciones:
+        if hay_estaciones:
             # Si hay estaciones disponibles, usar selector
-            nombres_estaciones = sorted(list(estaciones.keys()))
             estacion_seleccionada = st.selectbox(
                 "Estación de Origen",
                 options=nombres_estaciones,
@@ -76,8 +128,9 @@ def model_page():
             
             # Obtener coordenadas de la estación seleccionada
             if estacion_seleccionada:
-                origen_lat = estaciones[estacion_seleccionada]['lat']
-                origen_lon = estaciones[estacion_seleccionada]['lon']
+                id_origen = dimension.id(estacion_seleccionada)
+                origen_lat = float(dimension.lat[id_origen])
+                origen_lon = float(dimension.lon[id_origen])
             else:
                 origen_lat = -32.89
                 origen_lon = -68.84
@@ -164,7 +217,7 @@ def model_page():
         
         with col1:
             # Mostrar coordenadas seleccionadas (más grande y sin fondo azul)
-            if estaciones:
+            if hay_estaciones:
                 st.markdown(f"### 📍 Coordenadas")
                 st.markdown(f"**Latitud**: {origen_lat:.5f}  \n**Longitud**: {origen_lon:.5f}")
         
@@ -194,43 +247,24 @@ def model_page():
         st.markdown("*Si no conoces estos datos, déjalos en los valores por defecto o selecciona un usuario*")
         
         # Obtener datos del usuario seleccionado o valores por defecto
-        if st.session_state.usuario_data:
-            usuario_data = st.session_state.usuario_data
-            default_viajes_totales = usuario_data['viajes_totales']
-            default_semanas_activas = usuario_data['semanas_activas']
-            default_duracion_promedio_min = usuario_data['duracion_promedio_min']
-            default_distancia_promedio_usuario = usuario_data['distancia_promedio_usuario']
-            default_variedad_destinos = usuario_data['variedad_destinos']
-            default_variedad_origenes = usuario_data['variedad_origenes']
-            default_consistencia_horaria = usuario_data['consistencia_horaria']
-            default_dia_favorito = usuario_data['dia_favorito']
-            default_lat_destino_favorito = usuario_data.get('lat_destino_favorito', 0.0)
-            default_lon_destino_favorito = usuario_data.get('lon_destino_favorito', 0.0)
-            default_frecuencia_lunes = usuario_data['frecuencia_lunes']
-            default_frecuencia_martes = usuario_data['frecuencia_martes']
-            default_frecuencia_miercoles = usuario_data['frecuencia_miercoles']
-            default_frecuencia_jueves = usuario_data['frecuencia_jueves']
-            default_frecuencia_viernes = usuario_data['frecuencia_viernes']
-            default_frecuencia_sabado = usuario_data['frecuencia_sabado']
-            default_frecuencia_domingo = usuario_data['frecuencia_domingo']
-        else:
-            default_viajes_totales = 25
-            default_semanas_activas = 10
-            default_duracion_promedio_min = 20.0
-            default_distancia_promedio_usuario = 0.025
-            default_variedad_destinos = 8
-            default_variedad_origenes = 5
-            default_consistencia_horaria = 3.0
-            default_dia_favorito = 0
-            default_lat_destino_favorito = 0.0
-            default_lon_destino_favorito = 0.0
-            default_frecuencia_lunes = 5
-            default_frecuencia_martes = 4
-            default_frecuencia_miercoles = 4
-            default_frecuencia_jueves = 4
-            default_frecuencia_viernes = 5
-            default_frecuencia_sabado = 3
-            default_frecuencia_domingo = 2
+        usuario_data = st.session_state.usuario_data or USUARIO_FORMULARIO_DEFAULT
+        default_viajes_totales = usuario_data['viajes_totales']
+        default_semanas_activas = usuario_data['semanas_activas']
+        default_duracion_promedio_min = usuario_data['duracion_promedio_min']
+        default_distancia_promedio_usuario = usuario_data['distancia_promedio_usuario']
+        default_variedad_destinos = usuario_data['variedad_destinos']
+        default_variedad_origenes = usuario_data['variedad_origenes']
+        default_consistencia_horaria = usuario_data['consistencia_horaria']
+        default_dia_favorito = usuario_data['dia_favorito']
+        default_lat_destino_favorito = usuario_data.get('lat_destino_favorito', 0.0)
+        default_lon_destino_favorito = usuario_data.get('lon_destino_favorito', 0.0)
+        default_frecuencia_lunes = usuario_data['frecuencia_lunes']
+        default_frecuencia_martes = usuario_data['frecuencia_martes']
+        default_frecuencia_miercoles = usuario_data['frecuencia_miercoles']
+        default_frecuencia_jueves = usuario_data['frecuencia_jueves']
+        default_frecuencia_viernes = usuario_data['frecuencia_viernes']
+        default_frecuencia_sabado = usuario_data['frecuencia_sabado']
+        default_frecuencia_domingo = usuario_data['frecuencia_domingo']
         
         col3, col4 = st.columns(2)
         
@@ -303,24 +337,14 @@ def model_page():
             )
             
             # Selector de destino favorito (para obtener coordenadas)
-            if estaciones:
-                nombres_estaciones = sorted(list(estaciones.keys()))
-                
+            if hay_estaciones:
                 # Buscar estación por coordenadas si hay coordenadas por defecto
                 index_destino = 0
                 if default_lat_destino_favorito != 0.0 and default_lon_destino_favorito != 0.0:
                     # Buscar estación más cercana a las coordenadas por defecto
-                    min_dist = float('inf')
-                    estacion_cercana = None
-                    for nombre, datos in estaciones.items():
-                        if isinstance(datos, dict) and 'lat' in datos and 'lon' in datos:
-                            dist = ((default_lat_destino_favorito - datos['lat'])**2 + 
-                                   (default_lon_destino_favorito - datos['lon'])**2)**0.5
-                            if dist < min_dist:
-                                min_dist = dist
-                                estacion_cercana = nombre
-                    if estacion_cercana and estacion_cercana in nombres_estaciones:
-                        index_destino = nombres_estaciones.index(estacion_cercana) + 1
+                    id_cercana = dimension.mas_cercana(default_lat_destino_favorito, default_lon_destino_favorito)
+                    if id_cercana >= 0:
+                        index_destino = int(np.searchsorted(dimension.ids_catalogo(), id_cercana)) + 1
                 
                 destino_favorito_nombre = st.selectbox(
                     "Destino Favorito del Usuario",
@@ -330,9 +354,10 @@ def model_page():
                     key=f"destino_favorito_{usuario_key_suffix}"
                 )
                 # Convertir nombre de estación a coordenadas
-                if destino_favorito_nombre and destino_favorito_nombre in estaciones:
-                    lat_destino_favorito = estaciones[destino_favorito_nombre]['lat']
-                    lon_destino_favorito = estaciones[destino_favorito_nombre]['lon']
+                id_destino_favorito = dimension.id(destino_favorito_nombre) if destino_favorito_nombre else -1
+                if id_destino_favorito >= 0:
+                    lat_destino_favorito = float(dimension.lat[id_destino_favorito])
+                    lon_destino_favorito = float(dimension.lon[id_destino_favorito])
                 else:
                     # Si no hay selección, usar coordenadas por defecto del usuario
                     lat_destino_favorito = default_lat_destino_favorito
@@ -394,21 +419,35 @@ def model_page():
         }
         
         try:
-            # Procesar input
-            X_processed = process_input(input_data, preprocessor)
-            
-            # Hacer predicción
-            prediccion = modelo.predict(X_processed)[0]
-            probabilidades = modelo.predict_proba(X_processed)[0]
+            if servicio is not None:
+                # El servicio preprocesa y agrupa las solicitudes de todas las sesiones
+                top_classes, top_probs = servicio.predecir(input_data, k=5)
+                origen_prediccion = "servicio de predicción"
+            else:
+                # Procesar input
+                if vectorizador is not None:
+                    X_processed = vectorizador.transform(input_data)
+                else:
+                    X_processed = process_input(input_data, preprocessor)
+                
+                # Buscar en la tabla materializada; si la entrada es personalizada, inferencia en vivo
+                # (una sola llamada a predict_proba para top-1 y top-5, cacheada)
+                resultado_tabla = None
+                if tabla_topk is not None and tabla_topk.k >= 5:
+                    resultado_tabla = tabla_topk.consultar(X_processed)
+                if resultado_tabla is not None:
+                    top_classes, top_probs = resultado_tabla
+                    top_classes, top_probs = top_classes[:, :5], top_probs[:, :5]
+                    origen_prediccion = "tabla materializada"
+                else:
+                    top_classes, top_probs = predict_top_k_cacheado(modelo, X_processed, cache_predicciones, k=5)
+                    origen_prediccion = "inferencia en vivo"
+            top_classes, top_probs = top_classes[0], top_probs[0]
+            prediccion = top_classes[0]
             
             # Mostrar resultado principal
             st.success(f"🎯 **Destino Predicho**: {prediccion}")
             
-            # Mostrar top 5 predicciones
-            top_indices = np.argsort(probabilidades)[-5:][::-1]
-            top_probs = probabilidades[top_indices]
-            top_classes = modelo.classes_[top_indices]
-            
             st.markdown("### Top 5 Destinos Más Probables")
             
             # Crear DataFrame para visualización
@@ -452,7 +491,19 @@ def model_page():
             pred_df.columns = ['Destino', 'Probabilidad (%)']
             st.dataframe(pred_df, width='stretch')
             
+            if cache_predicciones is not None:
+                stats = cache_predicciones.estadisticas()
+                st.caption(
+                    f"Fuente: {origen_prediccion} · Cache de predicciones: {stats['aciertos']:,} aciertos / {stats['fallos']:,} fallos "
+                    f"({stats['tasa_aciertos']:.0%}) · {stats['entradas']:,}/{stats['max_entradas']:,} entradas"
+                )
+            else:
+                st.caption(f"Fuente: {origen_prediccion} ({servicio.direccion})")
+            
         except Exception as e:
+            if servicio is not None:
+                # El servicio dejó de responder: volver a chequearlo en el próximo rerun
+                load_servicio_prediccion.clear()
             st.error(f"Error al procesar la predicción: {e}")
             st.exception(e)
 
@@ -5,52 +5,180 @@ Script para entrenar modelo Random Forest con feature de destino favorito
 Incluye:
 - Uso de coordenadas de destino favorito (lat_destino_favorito, lon_destino_favorito)
 - Modelo con 29 features (27 originales + lat_destino_favorito + lon_destino_favorito)
+- Modo incremental (--incremental): agrega árboles con los viajes nuevos (entrenamiento_incremental.py)
 """
 
 import pandas as pd
 import numpy as np
 import time
 import os
+import json
+import argparse
 from datetime import datetime
-import joblib
 import warnings
 warnings.filterwarnings("ignore")
 
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, f1_score, top_k_accuracy_score
 
-def main():
-    print("=" * 70)
-    print("ENTRENAMIENTO DE MODELO CON DESTINO FAVORITO")
-    print("=" * 70)
-    print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    RANDOM_SEED = 42
-    
-    # Verificar que existe el dataset
-    dataset_path = "prediccion/dataset_modelo_final.csv"
-    if not os.path.exists(dataset_path):
-        dataset_path = "../prediccion/dataset_modelo_final.csv"
-        if not os.path.exists(dataset_path):
-            print("[ERROR] No se encontró dataset_modelo_final.csv")
-            return
-    
+from backend_modelo import BACKEND_DEFAULT, BACKENDS
+from datos import COLUMNA_PARTICION, leer_dataset
+from estaciones import DimensionEstaciones
+from entrenamiento_incremental import agregar_argumentos, entrenar_incremental
+
+RANDOM_SEED = 42
+
+# Modelo que genera el script (y que actualiza el modo incremental)
+MODEL_FILE = "static/modelo_con_destino_favorito.pkl"
+
+# Rutas posibles del dataset (en orden de prioridad)
+DATASET_PATHS = [
+    "prediccion/dataset_modelo_final.csv",
+    "../prediccion/dataset_modelo_final.csv"
+]
+
+# Features base (27 características originales)
+FEATURES_ORIGINALES = [
+    'origen_lat','origen_lon',
+    'hora_salida','dia_semana','mes',
+    'viajes_totales','semanas_activas','viajes_por_semana','duracion_promedio_min'
+]
+FEATURES_MEJORADAS = [
+    'periodo_dia_numerico','es_fin_semana','es_hora_pico','zona_origen',
+    'capacidad_origen','estaciones_cercanas_origen','variedad_destinos','variedad_origenes',
+    'consistencia_horaria','distancia_promedio_usuario','dia_favorito',
+    'frecuencia_lunes','frecuencia_martes','frecuencia_miercoles',
+    'frecuencia_jueves','frecuencia_viernes','frecuencia_sabado','frecuencia_domingo'
+]
+FEATURES_BASE = FEATURES_ORIGINALES + FEATURES_MEJORADAS
+
+# Catálogos de estaciones para las coordenadas del destino favorito (en orden de prioridad)
+ESTACIONES_PATHS = [
+    "static/estaciones.json",
+    "../prediccion/estaciones.json",
+    "estaciones.json"
+]
+
+# Destinos con menos registros se descartan (estratificación y tamaño <100MB)
+MIN_REGISTROS_DESTINO = 50
+
+# Hiperparámetros del Random Forest (optimizados para <100MB)
+HIPERPARAMETROS = {
+    'n_estimators': 95,         # Reducido ligeramente para estar bajo 100MB
+    'max_depth': 15,            # Mantener igual
+    'min_samples_split': 15,    # Mantener igual
+    'min_samples_leaf': 5,      # Mantener igual
+    'max_features': 0.5         # Mantener igual
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Entrenamiento del modelo con destino favorito")
+    parser.add_argument("--hiperparametros", default=None,
+                        help="JSON con hiperparámetros (por ejemplo, el mejor de busqueda_hiperparametros.py)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND_DEFAULT,
+                        help="Tipo de modelo a entrenar")
+    agregar_argumentos(parser)
+    return parser.parse_args()
+
+
+def cargar_hiperparametros(path, backend=BACKEND_DEFAULT):
+    """Hiperparámetros por defecto del backend actualizados con los del JSON (si se indica).
+
+    Los del Random Forest son los de este script (HIPERPARAMETROS).
+    """
+    hiperparametros = dict(HIPERPARAMETROS if backend == BACKEND_DEFAULT else BACKENDS[backend].HIPERPARAMETROS)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            hiperparametros.update(json.load(f))
+    return hiperparametros
+
+
+def buscar_dataset_entrenamiento():
+    """Primera ruta existente de DATASET_PATHS (o None)"""
+    return next((path for path in DATASET_PATHS if os.path.exists(path)), None)
+
+
+def clave_usuario_sintetica(df):
+    """Usuario_key sintético: hash int64 de origen_lat/origen_lon (4 decimales), viajes_totales
+    y semanas_activas. Agrupa los viajes igual que concatenar esos valores como texto."""
+    columnas = pd.DataFrame({
+        'origen_lat': df['origen_lat'].round(4),
+        'origen_lon': df['origen_lon'].round(4),
+        'viajes_totales': df['viajes_totales'],
+        'semanas_activas': df['semanas_activas']
+    })
+    return pd.util.hash_pandas_object(columnas, index=False).to_numpy().view(np.int64)
+
+
+def destino_favorito_por_usuario(usuarios, destinos):
+    """Destino más frecuente de cada usuario (Series indexada por usuario).
+
+    Ante empates gana el primero que aparece en sus viajes, como value_counts
+    sobre el CSV leído con pd.read_csv, también si los destinos son categóricos.
+    """
+    destinos = pd.Series(destinos).reset_index(drop=True)
+    desempate = np.arange(len(destinos))
+    tabla = pd.DataFrame({'usuario': np.asarray(usuarios), 'destino': destinos, 'desempate': desempate})
+    conteos = tabla.groupby(['usuario', 'destino'], observed=True, sort=False).agg(
+        viajes=('desempate', 'size'), desempate=('desempate', 'min')).reset_index()
+    mejores = conteos.sort_values(['viajes', 'desempate'], ascending=[False, True], kind='stable') \
+        .drop_duplicates('usuario')
+    return pd.Series(mejores['destino'].to_numpy(), index=pd.Index(mejores['usuario'].to_numpy()))
+
+
+def cargar_catalogo_estaciones():
+    """Primer estaciones.json de ESTACIONES_PATHS con alguna estación con coordenadas ({} si no hay)"""
+    for path in ESTACIONES_PATHS:
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                catalogo = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if any(isinstance(datos, dict) and 'lat' in datos and 'lon' in datos for datos in catalogo.values()):
+            return catalogo
+    return {}
+
+
+def coordenadas_estaciones(nombres):
+    """(lat, lon) de cada nombre según el catálogo, con 0.0 para estaciones desconocidas o sin coordenadas"""
+    dimension = DimensionEstaciones.construir(cargar_catalogo_estaciones())
+    ids = dimension.ids(nombres)
+    # Un 0.0 al final de cada columna: ID_DESCONOCIDO (-1) lo selecciona
+    lat = np.append(np.nan_to_num(dimension.lat, nan=0.0), 0.0)[ids]
+    lon = np.append(np.nan_to_num(dimension.lon, nan=0.0), 0.0)[ids]
+    return lat, lon
+
+
+def preparar_datos(dataset_path, meses=None, clases=None, min_registros=MIN_REGISTROS_DESTINO):
+    """Carga el dataset y arma X, y como para el entrenamiento (destinos con pocos registros filtrados).
+
+    Descarta los destinos con menos de `min_registros` registros. Con `meses` lee
+    solo esas particiones (si el destino favorito hay que calcularlo, se calcula
+    con todos los meses y después se filtran los viajes); con `clases` conserva los
+    destinos que conoce el modelo en lugar de filtrar por cantidad de registros
+    (entrenamiento incremental). Devuelve (X, y, features_finales).
+    """
     # Cargar datos
     print("\nCargando dataset final...")
-    df = pd.read_csv(dataset_path)
+    columnas = FEATURES_BASE + ['destino', 'Usuario_key', 'lat_destino_favorito', 'lon_destino_favorito']
+    df, _ = leer_dataset(columnas, [dataset_path], meses=meses)
+    en_meses = None
+    if meses is not None and not {'lat_destino_favorito', 'lon_destino_favorito'} <= set(df.columns):
+        # El destino favorito de cada usuario depende de todos sus viajes: calcularlo solo con
+        # `meses` le daría a los árboles nuevos una feature distinta de la de los ya entrenados
+        print("[INFO] Sin destino favorito en el dataset: se calcula con todos los meses")
+        df, _ = leer_dataset(columnas, [dataset_path])
+        en_meses = df[COLUMNA_PARTICION].isin(list(meses)).to_numpy()
     print(f"[OK] Dataset cargado: {len(df):,} registros")
     
     # Verificar si existe Usuario_key, si no, calcularlo
     if 'Usuario_key' not in df.columns:
         print("[ADVERTENCIA] No se encontró Usuario_key. Calculando desde datos originales...")
         # Calcular Usuario_key sintético basado en características únicas
-        df['Usuario_key'] = (
-            df['origen_lat'].round(4).astype(str) + '_' +
-            df['origen_lon'].round(4).astype(str) + '_' +
-            df['viajes_totales'].astype(str) + '_' +
-            df['semanas_activas'].astype(str)
-        )
+        df['Usuario_key'] = clave_usuario_sintetica(df)
     
     # Usar coordenadas de destino favorito directamente (sin buscar nombre ni codificar)
     if 'lat_destino_favorito' in df.columns and 'lon_destino_favorito' in df.columns:
@@ -65,88 +193,78 @@ def main():
         # Si no hay coordenadas, calcular desde destino más frecuente
         print("\n[ADVERTENCIA] No se encontraron coordenadas de destino favorito. Calculando desde destinos...")
         
-        # Obtener destino más frecuente por usuario
-        destino_favorito_por_usuario = df.groupby('Usuario_key')['destino'].agg(
-            lambda x: x.value_counts().index[0] if len(x.value_counts()) > 0 else None
-        ).to_dict()
+        # Destino más frecuente por usuario y sus coordenadas (un valor por usuario). leer_dataset
+        # devuelve destino como category (categorías en orden alfabético): los empates se resuelven
+        # por orden de aparición, como al leer el CSV con pd.read_csv
+        favoritos = destino_favorito_por_usuario(df['Usuario_key'], df['destino'])
+        lat_favorito, lon_favorito = coordenadas_estaciones(favoritos.to_numpy())
         
-        # Cargar estaciones para obtener coordenadas desde nombre
-        import json
-        estaciones_dict_coords = {}  # nombre -> (lat, lon)
-        estaciones_paths = [
-            "static/estaciones.json",
-            "../prediccion/estaciones.json",
-            "estaciones.json"
-        ]
-        
-        for path in estaciones_paths:
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        estaciones_json = json.load(f)
-                    for nombre, datos in estaciones_json.items():
-                        if isinstance(datos, dict) and 'lat' in datos and 'lon' in datos:
-                            estaciones_dict_coords[nombre] = (float(datos['lat']), float(datos['lon']))
-                    if estaciones_dict_coords:
-                        break
-                except:
-                    continue
-        
-        # Mapear destino favorito a coordenadas
-        def obtener_coordenadas_destino(destino):
-            if pd.isna(destino) or destino is None:
-                return (0.0, 0.0)
-            if destino in estaciones_dict_coords:
-                return estaciones_dict_coords[destino]
-            return (0.0, 0.0)
-        
-        df['destino_favorito_nombre'] = df['Usuario_key'].map(destino_favorito_por_usuario)
-        coords = df['destino_favorito_nombre'].apply(obtener_coordenadas_destino)
-        df['lat_destino_favorito'] = coords.apply(lambda x: x[0])
-        df['lon_destino_favorito'] = coords.apply(lambda x: x[1])
+        # Join por posición del usuario; -1 (sin destino favorito) selecciona el 0.0 agregado al final
+        posiciones = favoritos.index.get_indexer(df['Usuario_key'])
+        df['lat_destino_favorito'] = np.append(lat_favorito, 0.0)[posiciones]
+        df['lon_destino_favorito'] = np.append(lon_favorito, 0.0)[posiciones]
         
         print(f"[OK] Coordenadas de destino favorito calculadas desde nombres para {len(df):,} registros")
+
+    if en_meses is not None:
+        df = df[en_meses].reset_index(drop=True)
+        print(f"[OK] Viajes de los meses {', '.join(str(mes) for mes in meses)}: {len(df):,} registros")
     
     # No necesitamos LabelEncoder ni destino_favorito_encoded
     label_encoder = None
     
-    # Features base (27 características originales)
-    features_originales = [
-        'origen_lat','origen_lon',
-        'hora_salida','dia_semana','mes',
-        'viajes_totales','semanas_activas','viajes_por_semana','duracion_promedio_min'
-    ]
-    features_mejoradas = [
-        'periodo_dia_numerico','es_fin_semana','es_hora_pico','zona_origen',
-        'capacidad_origen','estaciones_cercanas_origen','variedad_destinos','variedad_origenes',
-        'consistencia_horaria','distancia_promedio_usuario','dia_favorito',
-        'frecuencia_lunes','frecuencia_martes','frecuencia_miercoles',
-        'frecuencia_jueves','frecuencia_viernes','frecuencia_sabado','frecuencia_domingo'
-    ]
-    features_base = features_originales + features_mejoradas
-    
     # Agregar coordenadas de destino favorito (en lugar de encoded)
-    features_finales = features_base + ['lat_destino_favorito', 'lon_destino_favorito']
+    features_finales = FEATURES_BASE + ['lat_destino_favorito', 'lon_destino_favorito']
     
     X = df[features_finales].fillna(0)
     y = df['destino'].astype(str)
     
-    print(f"\nFeatures base: {len(features_base)}")
+    print(f"\nFeatures base: {len(FEATURES_BASE)}")
     print(f"Features finales (con lat_destino_favorito y lon_destino_favorito): {len(features_finales)}")
     print(f"Destinos únicos: {y.nunique()}")
     
-    # Filtrar destinos con muy pocos registros (necesarios para estratificación y reducir tamaño)
-    print("\nFiltrando destinos con pocos registros...")
-    destino_counts = y.value_counts()
-    # Filtrar destinos con al menos 50 registros (más agresivo para reducir clases y tamaño <100MB)
-    destinos_validos = destino_counts[destino_counts >= 50].index
-    mask_validos = y.isin(destinos_validos)
+    if clases is None:
+        # Filtrar destinos con muy pocos registros (necesarios para estratificación y reducir tamaño)
+        print("\nFiltrando destinos con pocos registros...")
+        destino_counts = y.value_counts()
+        # Filtrar destinos con al menos 50 registros (más agresivo para reducir clases y tamaño <100MB)
+        destinos_validos = destino_counts[destino_counts >= min_registros].index
+        mask_validos = y.isin(destinos_validos)
+    else:
+        print("\nFiltrando destinos que el modelo no conoce...")
+        mask_validos = y.isin(clases)
     X = X[mask_validos].reset_index(drop=True)
     y = y[mask_validos].reset_index(drop=True)
     
     print(f"Registros después de filtrar: {len(X):,}")
     print(f"Destinos únicos después de filtrar: {y.nunique()}")
     
+    return X, y, features_finales
+
+
+def main():
+    args = parse_args()
+    if args.incremental:
+        entrenar_incremental(args, MODEL_FILE, buscar_dataset_entrenamiento, preparar_datos, RANDOM_SEED)
+        return
+    
+    print("=" * 70)
+    print("ENTRENAMIENTO DE MODELO CON DESTINO FAVORITO")
+    print("=" * 70)
+    print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    # Verificar que existe el dataset
+    dataset_path = buscar_dataset_entrenamiento()
+    if dataset_path is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        return
+    
+    backend = BACKENDS[args.backend]
+    hiperparametros = cargar_hiperparametros(args.hiperparametros, backend.nombre)
+    # El umbral de destinos no es del modelo: lo puede fijar el JSON (optimizador_presupuesto.py)
+    min_registros = hiperparametros.pop('min_registros_destino', MIN_REGISTROS_DESTINO)
+    X, y, features_finales = preparar_datos(dataset_path, min_registros=min_registros)
+    
     # Split
     print("\nDividiendo datos...")
     X_train, X_test, y_train, y_test = train_test_split(
@@ -155,31 +273,26 @@ def main():
     print(f"Entrenamiento: {len(X_train):,}")
     print(f"Prueba: {len(X_test):,}")
     
-    # Modelo Random Forest (optimizado para tamaño <100MB)
+    # Modelo (Random Forest optimizado para tamaño <100MB, u otro backend)
     print("\n" + "=" * 70)
-    print("ENTRENANDO MODELO RANDOM FOREST")
+    print(f"ENTRENANDO MODELO {backend.titulo}")
     print("=" * 70)
-    print("Hiperparámetros (optimizados para <100MB):")
-    print("  - n_estimators: 95 (balance tamaño/performance)")
-    print("  - max_depth: 15 (balance)")
-    print("  - min_samples_split: 15 (balance)")
-    print("  - min_samples_leaf: 5 (balance)")
-    print("  - max_features: 0.5 (igual)")
-    print("  - Filtro: destinos con >= 50 registros (reduce clases y tamaño <100MB)")
+    if hiperparametros == HIPERPARAMETROS:
+        print("Hiperparámetros (optimizados para <100MB):")
+        print("  - n_estimators: 95 (balance tamaño/performance)")
+        print("  - max_depth: 15 (balance)")
+        print("  - min_samples_split: 15 (balance)")
+        print("  - min_samples_leaf: 5 (balance)")
+        print("  - max_features: 0.5 (igual)")
+    else:
+        origen = f", desde {args.hiperparametros}" if args.hiperparametros else ""
+        print(f"Hiperparámetros ({backend.nombre}{origen}):")
+        for nombre, valor in hiperparametros.items():
+            print(f"  - {nombre}: {valor}")
+    print(f"  - Filtro: destinos con >= {min_registros} registros (reduce clases y tamaño <100MB)")
     print("=" * 70)
     
-    modelo = RandomForestClassifier(
-        n_estimators=95,         # Reducido ligeramente para estar bajo 100MB
-        max_depth=15,             # Mantener igual
-        min_samples_split=15,    # Mantener igual
-        min_samples_leaf=5,      # Mantener igual
-        max_features=0.5,         # Mantener igual
-        bootstrap=True,
-        oob_score=True,
-        class_weight=None,
-        random_state=RANDOM_SEED,
-        n_jobs=-1
-    )
+    modelo = backend.crear(hiperparametros, random_state=RANDOM_SEED)
     
     # Entrenamiento
     print("\nEntrenando modelo...")
@@ -187,7 +300,8 @@ def main():
     modelo.fit(X_train, y_train)
     tiempo_entrenamiento = time.time() - t0
     print(f"[OK] Entrenamiento completado en {tiempo_entrenamiento:.2f} segundos")
-    print(f"OOB score: {modelo.oob_score_*100:.2f}%")
+    for linea in backend.resumen_entrenamiento(modelo):
+        print(linea)
     
     # Evaluación
     print("\nEvaluando modelo...")
@@ -208,7 +322,7 @@ def main():
         print(f"Top-5 accuracy: {top5*100:.2f}%")
     
     # Importancias
-    importances = pd.Series(modelo.feature_importances_, index=features_finales).sort_values(ascending=False)
+    importances = backend.importancias(modelo, features_finales).sort_values(ascending=False)
     print(f"\n[TOP 10 FEATURES IMPORTANTES]")
     for i, (feature, importance) in enumerate(importances.head(10).items(), 1):
         tag = "[NUEVA]" if feature in ['lat_destino_favorito', 'lon_destino_favorito'] else "[ORIGINAL]"
@@ -230,13 +344,13 @@ def main():
         print("[OK] Carpeta modelos creada")
     
     # Guardar en static/ (para uso en app-streamlit)
-    model_file = "static/modelo_con_destino_favorito.pkl"
+    model_file = MODEL_FILE
     features_file = "modelos/features_con_destino_favorito.txt"
     
     # Guardar modelo con compresión (reduce tamaño significativamente)
     print(f"\nGuardando modelo en: {model_file}")
     print("Usando compresión de joblib para reducir tamaño...")
-    joblib.dump(modelo, model_file, compress=3)
+    backend.guardar(modelo, model_file)
     
     # Guardar lista de features
     print(f"Guardando lista de features en: {features_file}")
@@ -245,10 +359,10 @@ def main():
         f.write("=" * 70 + "\n\n")
         f.write(f"Total features: {len(features_finales)}\n\n")
         f.write("Features originales:\n")
-        for feat in features_originales:
+        for feat in FEATURES_ORIGINALES:
             f.write(f"  - {feat}\n")
         f.write("\nFeatures mejoradas:\n")
-        for feat in features_mejoradas:
+        for feat in FEATURES_MEJORADAS:
             f.write(f"  - {feat}\n")
         f.write("\nFeatures nuevas:\n")
         f.write(f"  - lat_destino_favorito\n")
@@ -264,7 +378,8 @@ def main():
     print("=" * 70)
     print(f"\nResumen:")
     print(f"  - Accuracy: {acc*100:.2f}%")
-    print(f"  - OOB score: {modelo.oob_score_*100:.2f}%")
+    for linea in backend.resumen_entrenamiento(modelo):
+        print(f"  - {linea}")
     print(f"  - Features: {len(features_finales)}")
     if 'lat_destino_favorito' in importances:
         print(f"  - Importancia lat_destino_favorito: {importances['lat_destino_favorito']:.6f}")
@@ -0,0 +1,387 @@
+"""
+Motor de inferencia para Random Forest con árboles aplanados
+- Convierte estimators_ de sklearn en tablas contiguas de nodos (struct-of-arrays)
+- Recorre todos los árboles a la vez con NumPy vectorizado
+- Devuelve las mismas probabilidades que RandomForestClassifier.predict_proba (también con
+  NaN: cada nodo manda los valores faltantes al hijo que eligió sklearn al entrenar)
+- Se guarda como arrays .npy sin comprimir para cargarlo con mmap
+- Formato compacto: índices enteros pequeños, umbrales float32 y hojas cuantizadas y deduplicadas
+"""
+
+import json
+import os
+
+import numpy as np
+
+# Marca de nodo hoja en sklearn (tree_.children_left == -1)
+HOJA = -1
+
+# Filas procesadas a la vez en predict_proba
+FILAS_POR_BLOQUE = 1024
+
+# Arrays guardados como .npy individuales (mapeables en memoria)
+ARRAYS_FOREST = ['feature', 'umbral', 'hijos', 'indice_hoja', 'proba_hojas', 'raices']
+
+# Hojas cuantizadas a la vez al exportar el formato compacto
+HOJAS_POR_BLOQUE = 65536
+
+
+def _umbral_float32(umbral):
+    """Convierte umbrales float64 a float32 sin cambiar el resultado de x <= umbral.
+
+    sklearn compara X en float32 contra umbrales float64; el mayor float32 que no
+    supera el umbral produce exactamente las mismas decisiones.
+    """
+    umbral32 = umbral.astype(np.float32)
+    excede = umbral32.astype(np.float64) > umbral
+    umbral32[excede] = np.nextafter(umbral32[excede], np.float32(-np.inf))
+    return umbral32
+
+
+def _dtype_indices(maximo):
+    """Entero más chico que representa valores entre 0 y maximo"""
+    for dtype in (np.int16, np.uint16, np.int32):
+        if maximo <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _cuantizar_filas(proba, niveles):
+    """Cuantiza distribuciones a enteros que suman exactamente niveles (mayor resto)"""
+    escalado = proba * niveles
+    cuantizado = np.floor(escalado)
+    faltante = np.clip(np.rint(niveles - cuantizado.sum(axis=1)), 0, proba.shape[1])
+
+    # Se suma 1 a las clases con mayor resto hasta completar niveles en cada fila
+    orden = np.argsort(cuantizado - escalado, axis=1, kind='stable')
+    rango = np.empty_like(orden)
+    np.put_along_axis(rango, orden, np.arange(proba.shape[1])[np.newaxis, :], axis=1)
+    cuantizado += rango < faltante[:, np.newaxis]
+    return cuantizado
+
+
+class ForestCompilado:
+    """Random Forest aplanado en tablas de nodos para inferencia rápida.
+
+    Todos los árboles se concatenan en arrays únicos:
+    - feature: índice de la feature evaluada en cada nodo (int32)
+    - umbral: umbral de decisión en float32
+    - hijos: matriz (n_nodos, 2) con el índice global del hijo izquierdo y derecho
+      (las hojas apuntan a sí mismas)
+    - indice_hoja: fila de proba_hojas para cada hoja (-1 en nodos internos)
+    - proba_hojas: matriz (n_hojas, n_clases) con la distribución de clases de cada hoja
+    - raices: índice global del nodo raíz de cada árbol
+    - nan_izquierda: si el nodo manda los NaN al hijo izquierdo (tree_.missing_go_to_left);
+      los artefactos guardados sin este array mandan los NaN a la izquierda
+    """
+
+    def __init__(self, feature, umbral, hijos, indice_hoja, proba_hojas,
+                 raices, profundidad, classes_, feature_names_in_=None, feature_importances_=None,
+                 nan_izquierda=None):
+        self.feature = feature
+        self.umbral = umbral
+        self.hijos = hijos
+        self.indice_hoja = indice_hoja
+        self.proba_hojas = proba_hojas
+        self.raices = raices
+        self.profundidad = int(profundidad)
+        self.classes_ = classes_
+        self.feature_names_in_ = feature_names_in_
+        self.feature_importances_ = feature_importances_
+        if nan_izquierda is None:
+            nan_izquierda = np.ones(len(feature), dtype=bool)
+        self.nan_izquierda = nan_izquierda
+
+    @property
+    def n_estimators(self):
+        return len(self.raices)
+
+    @property
+    def n_features_in_(self):
+        if self.feature_names_in_ is not None:
+            return len(self.feature_names_in_)
+        return int(self.feature.max()) + 1
+
+    @classmethod
+    def desde_sklearn(cls, modelo):
+        """Aplana un RandomForestClassifier entrenado (una sola salida)"""
+        arboles = [estimador.tree_ for estimador in modelo.estimators_]
+        if any(arbol.n_outputs != 1 for arbol in arboles):
+            raise ValueError("ForestCompilado solo soporta modelos de una salida")
+
+        n_nodos = np.array([arbol.node_count for arbol in arboles])
+        desplazamientos = np.concatenate([[0], np.cumsum(n_nodos)[:-1]])
+
+        feature, umbral, hijos, nan_izquierda, valores_hojas = [], [], [], [], []
+        for arbol, desplazamiento in zip(arboles, desplazamientos):
+            locales = np.arange(arbol.node_count)
+            es_hoja = arbol.children_left == HOJA
+            # sklearn < 1.3 no guarda missing_go_to_left (y no acepta NaN)
+            faltantes_izquierda = getattr(arbol, 'missing_go_to_left', np.ones(arbol.node_count))
+            nan_izquierda.append(np.asarray(faltantes_izquierda).astype(bool) & ~es_hoja)
+
+            # Las hojas apuntan a sí mismas y nunca cambian de nodo al iterar
+            feature.append(np.where(es_hoja, 0, arbol.feature))
+            umbral.append(np.where(es_hoja, np.inf, arbol.threshold))
+            hijos.append(np.column_stack([
+                np.where(es_hoja, locales, arbol.children_left),
+                np.where(es_hoja, locales, arbol.children_right)
+            ]) + desplazamiento)
+
+            # sklearn >= 1.4 guarda fracciones en tree_.value y las devuelve tal cual;
+            # versiones anteriores guardan conteos y predict_proba los normaliza
+            valores = arbol.value[es_hoja, 0, :].astype(np.float64)
+            normalizador = valores.sum(axis=1, keepdims=True)
+            normalizador[np.isclose(normalizador, 1.0) | (normalizador == 0.0)] = 1.0
+            valores_hojas.append(valores / normalizador)
+
+        es_hoja_global = np.concatenate([arbol.children_left == HOJA for arbol in arboles])
+        indice_hoja = np.full(len(es_hoja_global), -1, dtype=np.int32)
+        indice_hoja[es_hoja_global] = np.arange(es_hoja_global.sum(), dtype=np.int32)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(feature), dtype=np.int32),
+            umbral=_umbral_float32(np.concatenate(umbral)),
+            hijos=np.ascontiguousarray(np.concatenate(hijos), dtype=np.int32),
+            indice_hoja=indice_hoja,
+            proba_hojas=np.ascontiguousarray(np.concatenate(valores_hojas)),
+            raices=desplazamientos.astype(np.int32),
+            profundidad=max(arbol.max_depth for arbol in arboles),
+            classes_=modelo.classes_,
+            feature_names_in_=getattr(modelo, 'feature_names_in_', None),
+            feature_importances_=getattr(modelo, 'feature_importances_', None),
+            nan_izquierda=np.concatenate(nan_izquierda)
+        )
+
+    def guardar(self, directorio):
+        """Guarda el forest como un .npy sin comprimir por array más metadata.json"""
+        os.makedirs(directorio, exist_ok=True)
+        for nombre in ARRAYS_FOREST:
+            np.save(os.path.join(directorio, f"{nombre}.npy"), np.ascontiguousarray(getattr(self, nombre)))
+        if self.feature_importances_ is not None:
+            np.save(os.path.join(directorio, "feature_importances.npy"), np.asarray(self.feature_importances_))
+        np.save(os.path.join(directorio, "nan_izquierda.npy"), np.ascontiguousarray(self.nan_izquierda, dtype=bool))
+
+        metadata = {
+            'profundidad': self.profundidad,
+            'classes': np.asarray(self.classes_).tolist(),
+            'feature_names': None if self.feature_names_in_ is None else list(map(str, self.feature_names_in_))
+        }
+        with open(os.path.join(directorio, "metadata.json"), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+
+    @classmethod
+    def cargar(cls, directorio, mmap_mode='r'):
+        """Carga un forest guardado con guardar().
+
+        Con mmap_mode='r' los arrays quedan mapeados en memoria: solo se leen del
+        disco las páginas que se tocan y varios procesos comparten las mismas
+        páginas físicas del cache del sistema operativo.
+        """
+        with open(os.path.join(directorio, "metadata.json"), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        arrays = {nombre: np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode=mmap_mode)
+                  for nombre in ARRAYS_FOREST}
+
+        path_importancias = os.path.join(directorio, "feature_importances.npy")
+        importancias = np.load(path_importancias) if os.path.exists(path_importancias) else None
+        path_nan = os.path.join(directorio, "nan_izquierda.npy")
+        nan_izquierda = np.load(path_nan, mmap_mode=mmap_mode) if os.path.exists(path_nan) else None
+        nombres = metadata.get('feature_names')
+
+        # sklearn guarda las clases de texto como arrays object
+        clases = np.array(metadata['classes'])
+        if clases.dtype.kind == 'U':
+            clases = clases.astype(object)
+
+        return cls(
+            profundidad=metadata['profundidad'],
+            classes_=clases,
+            feature_names_in_=None if nombres is None else np.array(nombres, dtype=object),
+            feature_importances_=importancias,
+            nan_izquierda=nan_izquierda,
+            **arrays
+        )
+
+    def guardar_compacto(self, path, bits=8):
+        """Exporta el forest en un .npz comprimido y compacto.
+
+        - Solo se guardan feature, umbral (float32) e hijos de los nodos internos;
+          qué nodos son hojas va en un bitmap
+        - Los hijos se guardan como índices locales de cada árbol (int16 si entran)
+        - Las distribuciones de hoja se cuantizan a enteros de `bits` bits que suman
+          exactamente 2**bits - 1, se deduplican y se guardan en formato disperso (CSR)
+
+        La única pérdida es la cuantización de las hojas: las decisiones de los
+        árboles son idénticas.
+        """
+        if bits not in (8, 16):
+            raise ValueError("bits debe ser 8 o 16")
+        niveles = 2 ** bits - 1
+        dtype_valores = np.uint8 if bits == 8 else np.uint16
+
+        n_nodos = len(self.feature)
+        n_nodos_arbol = np.diff(np.append(np.asarray(self.raices, dtype=np.int64), n_nodos))
+        base = np.repeat(np.asarray(self.raices, dtype=np.int64), n_nodos_arbol)
+        es_hoja = np.asarray(self.indice_hoja) >= 0
+        internos = ~es_hoja
+
+        # Cuantización por bloques para acotar memoria en forests grandes
+        filas_hojas = np.asarray(self.indice_hoja)[es_hoja]
+        cuantizadas = np.empty((len(filas_hojas), self.proba_hojas.shape[1]), dtype=dtype_valores)
+        for inicio in range(0, len(filas_hojas), HOJAS_POR_BLOQUE):
+            bloque = np.asarray(self.proba_hojas[filas_hojas[inicio:inicio + HOJAS_POR_BLOQUE]])
+            cuantizadas[inicio:inicio + HOJAS_POR_BLOQUE] = _cuantizar_filas(bloque, niveles)
+
+        # Hojas idénticas tras cuantizar se guardan una sola vez
+        unicas, fila_hoja = np.unique(cuantizadas, axis=0, return_inverse=True)
+        filas_nz, clases_nz = np.nonzero(unicas)
+        punteros = np.searchsorted(filas_nz, np.arange(len(unicas) + 1)).astype(np.int64)
+
+        metadata = {
+            'formato': 'forest_compacto',
+            'version': 1,
+            'bits': bits,
+            'profundidad': self.profundidad,
+            'n_nodos': n_nodos,
+            'classes': np.asarray(self.classes_).tolist(),
+            'feature_names': None if self.feature_names_in_ is None else list(map(str, self.feature_names_in_))
+        }
+        arrays = {
+            'metadata': np.asarray(json.dumps(metadata, ensure_ascii=False)),
+            'n_nodos_arbol': n_nodos_arbol.astype(_dtype_indices(n_nodos_arbol.max())),
+            'es_hoja': np.packbits(es_hoja),
+            'feature': np.asarray(self.feature)[internos].astype(_dtype_indices(self.feature.max())),
+            'umbral': np.asarray(self.umbral, dtype=np.float32)[internos],
+            'hijos': (np.asarray(self.hijos)[internos] - base[internos, np.newaxis]).astype(
+                _dtype_indices(n_nodos_arbol.max())),
+            'fila_hoja': fila_hoja.ravel().astype(_dtype_indices(len(unicas))),
+            'hojas_punteros': punteros.astype(_dtype_indices(punteros[-1])),
+            'hojas_clases': clases_nz.astype(_dtype_indices(unicas.shape[1])),
+            'hojas_valores': unicas[filas_nz, clases_nz],
+            'nan_izquierda': np.packbits(np.asarray(self.nan_izquierda, dtype=bool)[internos])
+        }
+        if self.feature_importances_ is not None:
+            arrays['feature_importances'] = np.asarray(self.feature_importances_, dtype=np.float32)
+
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def cargar_compacto(cls, path):
+        """Carga un forest exportado con guardar_compacto()"""
+        with np.load(path, allow_pickle=False) as datos:
+            metadata = json.loads(str(datos['metadata']))
+            n_nodos = metadata['n_nodos']
+            niveles = 2 ** metadata['bits'] - 1
+
+            n_nodos_arbol = datos['n_nodos_arbol'].astype(np.int64)
+            raices = np.concatenate([[0], np.cumsum(n_nodos_arbol)[:-1]])
+            es_hoja = np.unpackbits(datos['es_hoja'], count=n_nodos).astype(bool)
+            internos = ~es_hoja
+
+            feature = np.zeros(n_nodos, dtype=np.int32)
+            feature[internos] = datos['feature']
+            umbral = np.full(n_nodos, np.inf, dtype=np.float32)
+            umbral[internos] = datos['umbral']
+
+            # Las hojas apuntan a sí mismas, como en desde_sklearn
+            locales = np.arange(n_nodos, dtype=np.int64)
+            hijos = np.column_stack([locales, locales])
+            hijos[internos] = datos['hijos'].astype(np.int64) + np.repeat(raices, n_nodos_arbol)[internos, np.newaxis]
+
+            indice_hoja = np.full(n_nodos, -1, dtype=np.int32)
+            indice_hoja[es_hoja] = datos['fila_hoja']
+
+            punteros = datos['hojas_punteros'].astype(np.int64)
+            n_unicas = len(punteros) - 1
+            proba_hojas = np.zeros((n_unicas, len(metadata['classes'])), dtype=np.float64)
+            filas = np.repeat(np.arange(n_unicas), np.diff(punteros))
+            proba_hojas[filas, datos['hojas_clases']] = datos['hojas_valores'] / niveles
+
+            importancias = datos['feature_importances'].astype(np.float64) if 'feature_importances' in datos.files else None
+
+            nan_izquierda = None
+            if 'nan_izquierda' in datos.files:
+                nan_izquierda = np.zeros(n_nodos, dtype=bool)
+                nan_izquierda[internos] = np.unpackbits(datos['nan_izquierda'], count=int(internos.sum())).astype(bool)
+
+        clases = np.array(metadata['classes'])
+        if clases.dtype.kind == 'U':
+            clases = clases.astype(object)
+        nombres = metadata.get('feature_names')
+
+        return cls(
+            feature=feature,
+            umbral=umbral,
+            hijos=np.ascontiguousarray(hijos, dtype=np.int32),
+            indice_hoja=indice_hoja,
+            proba_hojas=proba_hojas,
+            raices=raices.astype(np.int32),
+            profundidad=metadata['profundidad'],
+            classes_=clases,
+            feature_names_in_=None if nombres is None else np.array(nombres, dtype=object),
+            feature_importances_=importancias,
+            nan_izquierda=nan_izquierda
+        )
+
+    def _preparar_X(self, X):
+        """Convierte X a una matriz float32 contigua en el orden de features del modelo"""
+        if hasattr(X, 'columns') and self.feature_names_in_ is not None:
+            if list(X.columns) != list(self.feature_names_in_):
+                X = X[list(self.feature_names_in_)]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X
+
+    def apply(self, X):
+        """Índice global de la hoja alcanzada en cada árbol, forma (n_muestras, n_arboles)"""
+        X = self._preparar_X(X)
+        X_plano = X.ravel()
+        base_filas = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, np.newaxis]
+        hijos_plano = self.hijos.ravel()
+        nodos = np.broadcast_to(self.raices.astype(np.intp), (X.shape[0], len(self.raices))).copy()
+        # NaN > umbral es False (iría a la izquierda): sin NaN no hace falta corregir
+        hay_nan = bool(np.isnan(X_plano).any())
+
+        # Un paso por nivel: todos los árboles y todas las muestras a la vez.
+        # hijos_plano[2 * nodo + 1] es el hijo derecho, así cada paso es un único take
+        for _ in range(self.profundidad):
+            valores = X_plano.take(base_filas + self.feature.take(nodos))
+            va_der = valores > self.umbral.take(nodos)
+            if hay_nan:
+                va_der |= np.isnan(valores) & ~self.nan_izquierda.take(nodos)
+            nodos = hijos_plano.take(2 * nodos + va_der)
+
+        return nodos
+
+    def predict_proba(self, X):
+        """Promedio de las distribuciones de hoja de todos los árboles"""
+        X = self._preparar_X(X)
+        proba = np.zeros((X.shape[0], self.proba_hojas.shape[1]), dtype=np.float64)
+
+        # Bloques de filas para acotar memoria y mantener los datos en caché
+        for inicio in range(0, X.shape[0], FILAS_POR_BLOQUE):
+            bloque = proba[inicio:inicio + FILAS_POR_BLOQUE]
+            hojas = self.indice_hoja.take(self.apply(X[inicio:inicio + FILAS_POR_BLOQUE]))
+
+            # Acumulación árbol por árbol, en el mismo orden que sklearn
+            for t in range(hojas.shape[1]):
+                bloque += self.proba_hojas.take(hojas[:, t], axis=0)
+        proba /= len(self.raices)
+
+        return proba
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        return np.asarray(self.classes_)[np.argmax(proba, axis=1)]
+
+
+def compilar_modelo(modelo):
+    """Compila el modelo si es un Random Forest; si no, lo devuelve sin cambios"""
+    if isinstance(modelo, ForestCompilado) or not hasattr(modelo, 'estimators_'):
+        return modelo
+    try:
+        return ForestCompilado.desde_sklearn(modelo)
+    except Exception:
+        return modelo
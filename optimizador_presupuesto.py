@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Optimizador de la forma del Random Forest con presupuestos explícitos
+- Presupuestos: tamaño del artefacto (.pkl de joblib con compress=3), latencia p99 de
+  predecir un viaje (motor_forest, como la app) y memoria residente (RSS) del proceso que
+  carga el modelo y predice
+- Busca la forma del forest: árboles, profundidad máxima, mínimo de viajes por hoja y
+  umbral de registros por destino (filtrado de clases); el resto de los hiperparámetros
+  son los del script de entrenamiento
+- Cada forma (profundidad, hoja, umbral) se entrena una sola vez con el máximo de árboles:
+  las variantes con menos árboles son los primeros árboles de ese forest (iguales a
+  entrenarlas con esa cantidad de árboles y la misma semilla)
+- Las formas se entrenan en un pool de procesos; la latencia y la RSS se miden después,
+  de a un modelo y sin entrenamientos en paralelo que compitan por la CPU
+- La RSS se mide en un proceso nuevo: carga el .pkl, lo compila y predice un viaje
+- Todas las configuraciones se evalúan sobre la misma prueba: los viajes a destinos que
+  descarta el umbral cuentan como errores
+- Reanudable: las configuraciones ya guardadas en el JSONL no se vuelven a entrenar, y las
+  formas entrenadas que no llegaron a medirse se miden sin reentrenarlas
+- Elige la configuración más precisa que entra en los presupuestos (JSON para
+  `--hiperparametros` de los scripts de entrenamiento) y escribe la frontera de Pareto
+  (métrica contra tamaño, p99 y RSS) en un reporte Markdown
+
+Uso:
+    python optimizador_presupuesto.py --max-mb 100 --max-p99-ms 5 --max-rss-mb 800
+    python optimizador_presupuesto.py --modelo ligero --formas 12 --procesos 4
+    python modelo_con_destino_favorito.py --hiperparametros modelos/hiperparametros_presupuesto_destino_favorito.json
+"""
+
+import argparse
+import copy
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from agregados import huella_dataset
+from busqueda_hiperparametros import (METRICAS, MODELOS, ModelosPendientes, ResultadosBusqueda, clave_prueba,
+                                      latencia_un_viaje, medir_calidad, preparar_busqueda)
+from lib import predict_top_k
+from motor_forest import compilar_modelo
+from registro_modelos import rss_mb
+
+# Valores posibles de cada dimensión de la forma del forest
+ARBOLES = [25, 50, 75, 100, 150, 200]
+ESPACIO_FORMA = {
+    'max_depth': [8, 10, 12, 15, 20, None],
+    'min_samples_leaf': [1, 2, 5, 10, 20, 50],
+    'min_registros_destino': [10, 25, 50, 100, 200]
+}
+
+# Métricas de la frontera de Pareto que se minimizan (la métrica elegida se maximiza)
+COSTOS = ('tamano_bytes', 'latencia_p99_ms', 'rss_mb')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Optimizador de la forma del Random Forest con presupuestos")
+    parser.add_argument("--modelo", choices=sorted(MODELOS), default='destino_favorito',
+                        help="Script de entrenamiento cuyos datos e hiperparámetros se usan")
+    parser.add_argument("--max-mb", type=float, default=100.0,
+                        help="Presupuesto de tamaño del artefacto (.pkl comprimido) en MB")
+    parser.add_argument("--max-p99-ms", type=float, default=None,
+                        help="Presupuesto de latencia p99 de predecir un viaje, en ms (por defecto, sin límite)")
+    parser.add_argument("--max-rss-mb", type=float, default=None,
+                        help="Presupuesto de memoria residente del proceso que sirve el modelo, en MB "
+                             "(por defecto, sin límite)")
+    parser.add_argument("--formas", type=int, default=24,
+                        help="Formas (profundidad, hoja, umbral) a entrenar; incluye la actual del script")
+    parser.add_argument("--arboles", type=int, nargs="+", default=None,
+                        help="Cantidades de árboles a evaluar por forma (por defecto, las de ARBOLES "
+                             "más la del script)")
+    parser.add_argument("--muestras", type=int, default=None,
+                        help="Viajes de entrenamiento (por defecto, todo el split de entrenamiento)")
+    parser.add_argument("--muestras-prueba", type=int, default=20000,
+                        help="Viajes del conjunto de prueba usados para evaluar cada configuración")
+    parser.add_argument("--metrica", choices=[m for m in METRICAS if m != 'oob'], default='accuracy',
+                        help="Métrica que se maximiza")
+    parser.add_argument("--repeticiones", type=int, default=200,
+                        help="Viajes individuales para medir la latencia de predicción")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="Procesos que entrenan formas en paralelo")
+    parser.add_argument("--semilla", type=int, default=42,
+                        help="Semilla para muestrear formas y la submuestra de entrenamiento")
+    parser.add_argument("--resultados", default=None,
+                        help="Archivo JSONL de resultados (por defecto modelos/optimizacion_<modelo>.jsonl)")
+    parser.add_argument("--reporte", default=None,
+                        help="Reporte Markdown (por defecto modelos/optimizacion_<modelo>.md)")
+    parser.add_argument("--mejor", default=None,
+                        help="JSON con la mejor configuración "
+                             "(por defecto modelos/hiperparametros_presupuesto_<modelo>.json)")
+    return parser.parse_args()
+
+
+def muestrear_formas(actual, n, semilla):
+    """La forma actual más n-1 formas distintas de ESPACIO_FORMA"""
+    rng = np.random.default_rng(semilla)
+    formas = [dict(actual)]
+    vistas = {json.dumps(actual, sort_keys=True)}
+    total_espacio = math.prod(len(valores) for valores in ESPACIO_FORMA.values())
+    while len(formas) < min(n, total_espacio):
+        forma = {nombre: valores[rng.integers(len(valores))] for nombre, valores in ESPACIO_FORMA.items()}
+        clave = json.dumps(forma, sort_keys=True)
+        if clave not in vistas:
+            vistas.add(clave)
+            formas.append(forma)
+    return formas
+
+
+def destinos_con_registros(registros_destino, min_registros):
+    """Destinos que conserva el umbral (None: todos)"""
+    return sorted(destino for destino, cantidad in registros_destino.items()
+                  if min_registros is None or cantidad >= min_registros)
+
+
+def primeros_arboles(modelo, n):
+    """Copia del Random Forest con sus primeros n árboles"""
+    recortado = copy.copy(modelo)
+    recortado.estimators_ = modelo.estimators_[:n]
+    recortado.n_estimators = n
+    return recortado
+
+
+def _medir_rss_servicio(path, fila):
+    """Se ejecuta en un proceso nuevo: RSS (MB) antes y después de cargar, compilar y predecir un viaje"""
+    antes = rss_mb()
+    modelo = compilar_modelo(joblib.load(path))
+    predict_top_k(modelo, fila, k=5)
+    return antes, rss_mb()
+
+
+def medir_rss(modelo, fila):
+    """(RSS total, RSS del modelo) en MB de servir el modelo, medidos en un proceso nuevo.
+
+    El total incluye el intérprete y las librerías que importa la predicción
+    (numpy, pandas, sklearn); el del modelo es lo que agrega cargarlo y predecir.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as f:
+        path = f.name
+    try:
+        joblib.dump(modelo, path, compress=3)
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+            antes, despues = executor.submit(_medir_rss_servicio, path, fila).result()
+    finally:
+        os.remove(path)
+    return despues, despues - antes
+
+
+# Datos compartidos por las formas de cada proceso del pool (se envían una vez por proceso)
+_DATOS = {}
+
+
+def _inicializar_proceso(X_train, y_train, X_test, y_test):
+    import warnings
+    warnings.filterwarnings("ignore")
+    _DATOS.update(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test)
+
+
+def entrenar_forma(clave, forma, destinos, arboles, hiperparametros, semilla, directorio_pendientes):
+    """Se ejecuta en un proceso del pool: entrena la forma con max(arboles) árboles y mide calidad
+    y tamaño de cada cantidad de árboles de `arboles`. Deja el forest y la lista de métricas (una por
+    cantidad) en ModelosPendientes para medir latencia y RSS después; devuelve las métricas."""
+    mascara = np.isin(_DATOS['y_train'], destinos)
+    X_train = _DATOS['X_train'][mascara]
+    y_train = _DATOS['y_train'][mascara]
+    X_test, y_test = _DATOS['X_test'], _DATOS['y_test']
+
+    configuracion = dict(hiperparametros)
+    configuracion.update(max_depth=forma['max_depth'], min_samples_leaf=forma['min_samples_leaf'],
+                         n_estimators=max(arboles))
+    modelo = RandomForestClassifier(
+        **configuracion,
+        bootstrap=True,
+        oob_score=False,
+        class_weight=None,
+        random_state=semilla,
+        n_jobs=1
+    )
+    t0 = time.perf_counter()
+    modelo.fit(X_train, y_train)
+    tiempo_entrenamiento = time.perf_counter() - t0
+
+    medidas = [{
+        'n_estimators': n,
+        **medir_calidad(primeros_arboles(modelo, n), X_test, y_test),
+        'n_entrenamiento': int(mascara.sum()),
+        'destinos': len(modelo.classes_),
+        # Tiempo del forest completo, proporcional a los árboles
+        'tiempo_entrenamiento_s': tiempo_entrenamiento * n / max(arboles)
+    } for n in sorted(arboles)]
+    ModelosPendientes(directorio_pendientes).guardar(clave, modelo, medidas)
+    return medidas
+
+
+def medir_forma(modelo, medidas, X_test, repeticiones):
+    """Agrega latencia de un viaje y RSS a las métricas de cada cantidad de árboles. Se ejecuta
+    en el proceso principal, sin entrenamientos en paralelo que inflen el p99."""
+    fila = np.asarray(X_test.iloc[:1], dtype=np.float64)
+    for medida in medidas:
+        recortado = primeros_arboles(modelo, medida['n_estimators'])
+        latencia_p50, latencia_p99 = latencia_un_viaje(recortado, X_test, repeticiones)
+        rss_total, rss_modelo = medir_rss(recortado, fila)
+        medida.update(latencia_p50_ms=latencia_p50, latencia_p99_ms=latencia_p99,
+                      rss_mb=rss_total, rss_modelo_mb=rss_modelo)
+    return medidas
+
+
+def cumple_presupuestos(prueba, presupuestos):
+    """True si la configuración no supera ningún presupuesto (None: sin límite)"""
+    return all(limite is None or prueba[costo] <= limite for costo, limite in presupuestos.items())
+
+
+def frontera_pareto(pruebas, metrica):
+    """Configuraciones no dominadas: ninguna otra tiene mejor o igual métrica y menor o igual
+    tamaño, p99 y RSS (con al menos una estrictamente mejor). Mejor métrica primero."""
+    def domina(a, b):
+        no_peor = a[metrica] >= b[metrica] and all(a[costo] <= b[costo] for costo in COSTOS)
+        mejor = a[metrica] > b[metrica] or any(a[costo] < b[costo] for costo in COSTOS)
+        return no_peor and mejor
+
+    frontera = [p for p in pruebas if not any(domina(otra, p) for otra in pruebas)]
+    return sorted(frontera, key=lambda p: (-p[metrica], p['tamano_bytes']))
+
+
+def formatear_limite(limite, unidad, escala=1):
+    return "sin límite" if limite is None else f"{limite / escala:,.2f} {unidad}"
+
+
+def escribir_reporte(path, args, datos, presupuestos, pruebas, frontera, mejor):
+    """Reporte Markdown con los presupuestos, la mejor configuración y la frontera de Pareto"""
+    def fila(prueba):
+        c = prueba['configuracion']
+        return (f"| {c['n_estimators']} | {c['max_depth']} | {c['min_samples_leaf']} "
+                f"| {c['min_registros_destino']} | {prueba['destinos']} "
+                f"| {prueba['accuracy']*100:.2f}% | {prueba['top3']*100:.2f}% | {prueba['top5']*100:.2f}% "
+                f"| {prueba['tamano_bytes'] / 1024 / 1024:.2f} | {prueba['latencia_p50_ms']:.3f} "
+                f"| {prueba['latencia_p99_ms']:.3f} | {prueba['rss_mb']:.0f} ({prueba['rss_modelo_mb']:+.0f}) "
+                f"| {'sí' if cumple_presupuestos(prueba, presupuestos) else 'no'} |")
+
+    lineas = [
+        f"# Optimización con presupuesto: {args.modelo}",
+        "",
+        f"- Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- Dataset: `{datos['dataset_path']}`",
+        f"- Entrenamiento: {len(datos['X_train']):,} viajes | prueba: {len(datos['X_test']):,} viajes",
+        f"- Configuraciones evaluadas: {len(pruebas)} | métrica: {args.metrica}",
+        "",
+        "## Presupuestos",
+        "",
+        f"- Tamaño del artefacto (.pkl con compress=3): "
+        f"{formatear_limite(presupuestos['tamano_bytes'], 'MB', 1024 * 1024)}",
+        f"- Latencia p99 de predecir un viaje: {formatear_limite(presupuestos['latencia_p99_ms'], 'ms')}",
+        f"- RSS del proceso que sirve el modelo: {formatear_limite(presupuestos['rss_mb'], 'MB')}",
+        "",
+        "## Mejor configuración dentro del presupuesto",
+        ""
+    ]
+    if mejor is None:
+        lineas.append("Ninguna configuración entra en los presupuestos.")
+    else:
+        lineas += [
+            f"- {args.metrica}: {mejor[args.metrica]*100:.2f}% | tamaño: {mejor['tamano_bytes'] / 1024 / 1024:.2f} MB "
+            f"| p99: {mejor['latencia_p99_ms']:.3f} ms | RSS: {mejor['rss_mb']:.0f} MB",
+            "",
+            "```json",
+            json.dumps(mejor['configuracion'], indent=2),
+            "```"
+        ]
+    encabezado = ("| Árboles | Profundidad | Hoja | Umbral | Destinos | Top-1 | Top-3 | Top-5 "
+                  "| Tamaño (MB) | p50 (ms) | p99 (ms) | RSS (MB) | Cumple |")
+    lineas += [
+        "",
+        f"## Frontera de Pareto ({len(frontera)} de {len(pruebas)} configuraciones)",
+        "",
+        f"Ninguna otra configuración tiene {args.metrica} mayor o igual con tamaño, p99 y RSS menores o "
+        "iguales. RSS: total del proceso (entre paréntesis, lo que agrega el modelo).",
+        "",
+        encabezado,
+        "|" + "---|" * encabezado.count(" | ") + "---|"
+    ]
+    lineas += [fila(prueba) for prueba in frontera]
+
+    directorio = os.path.dirname(path)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lineas) + "\n")
+
+
+def main():
+    args = parse_args()
+    modulo = MODELOS[args.modelo]
+    resultados_path = args.resultados or os.path.join("modelos", f"optimizacion_{args.modelo}.jsonl")
+    reporte_path = args.reporte or os.path.join("modelos", f"optimizacion_{args.modelo}.md")
+    mejor_path = args.mejor or os.path.join("modelos", f"hiperparametros_presupuesto_{args.modelo}.json")
+    presupuestos = {
+        'tamano_bytes': args.max_mb * 1024 * 1024,
+        'latencia_p99_ms': args.max_p99_ms,
+        'rss_mb': args.max_rss_mb
+    }
+
+    print("=" * 70)
+    print("OPTIMIZACIÓN DEL RANDOM FOREST CON PRESUPUESTOS")
+    print("=" * 70)
+    print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Presupuestos: tamaño {formatear_limite(presupuestos['tamano_bytes'], 'MB', 1024 * 1024)} "
+          f"| p99 {formatear_limite(args.max_p99_ms, 'ms')} | RSS {formatear_limite(args.max_rss_mb, 'MB')}")
+
+    hiperparametros = dict(modulo.HIPERPARAMETROS)
+    actual = {
+        'max_depth': hiperparametros['max_depth'],
+        'min_samples_leaf': hiperparametros['min_samples_leaf'],
+        'min_registros_destino': modulo.MIN_REGISTROS_DESTINO
+    }
+    formas = muestrear_formas(actual, args.formas, args.semilla)
+    arboles = sorted(set(args.arboles or ARBOLES + [hiperparametros['n_estimators']]))
+
+    # Se cargan los destinos del umbral más bajo; cada forma filtra el entrenamiento con el suyo
+    umbrales = [forma['min_registros_destino'] for forma in formas]
+    min_carga = None if None in umbrales else max(2, min(umbrales))
+    datos = preparar_busqueda(modulo, args.muestras_prueba, args.semilla, min_registros=min_carga)
+    if datos is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        return
+    if args.muestras is not None and args.muestras < len(datos['X_train']):
+        indices = np.sort(datos['orden'][:args.muestras])
+        datos['X_train'] = datos['X_train'].iloc[indices].reset_index(drop=True)
+        datos['y_train'] = datos['y_train'][indices]
+
+    huella = huella_dataset(datos['dataset_path'])
+    resultados = ResultadosBusqueda(resultados_path)
+    modelos = ModelosPendientes(os.path.splitext(resultados_path)[0] + ".pendientes")
+    base = {'modelo': args.modelo, 'semilla': args.semilla}
+
+    def configuracion_de(forma, n):
+        configuracion = dict(hiperparametros)
+        configuracion.update(n_estimators=n, max_depth=forma['max_depth'],
+                             min_samples_leaf=forma['min_samples_leaf'],
+                             min_registros_destino=forma['min_registros_destino'])
+        return configuracion
+
+    def clave_de(forma, n):
+        return clave_prueba(args.modelo, configuracion_de(forma, n), len(datos['X_train']), huella, args.semilla)
+
+    def clave_forma(forma):
+        """Forest entrenado de la forma (con max(arboles) árboles) que espera sus mediciones"""
+        configuracion = {**configuracion_de(forma, max(arboles)), 'arboles': arboles}
+        return clave_prueba(args.modelo, configuracion, len(datos['X_train']), huella, args.semilla)
+
+    pendientes = [forma for forma in formas if any(clave_de(forma, n) not in resultados for n in arboles)]
+    a_entrenar = [forma for forma in pendientes if clave_forma(forma) not in modelos]
+    print(f"\n[OK] Entrenamiento: {len(datos['X_train']):,} viajes | prueba: {len(datos['X_test']):,} viajes")
+    print(f"[OK] Formas: {len(formas)} ({len(formas) - len(pendientes)} ya evaluadas) "
+          f"| árboles por forma: {', '.join(str(n) for n in arboles)}")
+    print(f"[OK] Resultados: {resultados_path} ({len(resultados)} configuraciones guardadas)")
+
+    print("\n" + "=" * 70)
+    print(f"ENTRENANDO {len(a_entrenar)} FORMAS ({len(pendientes) - len(a_entrenar)} ya entrenadas sin medir)")
+    print("=" * 70)
+    contexto = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(
+        max_workers=max(1, args.procesos), mp_context=contexto, initializer=_inicializar_proceso,
+        initargs=(datos['X_train'], datos['y_train'], datos['X_test'], datos['y_test'])
+    )
+    t0 = time.time()
+    try:
+        futuros = {
+            executor.submit(entrenar_forma, clave_forma(forma), forma,
+                            destinos_con_registros(datos['registros_destino'], forma['min_registros_destino']),
+                            arboles, hiperparametros, args.semilla, modelos.directorio): forma
+            for forma in a_entrenar
+        }
+        for i, futuro in enumerate(as_completed(futuros), 1):
+            forma = futuros[futuro]
+            medida = futuro.result()[-1]
+            print(f"  [{i}/{len(a_entrenar)}] {json.dumps(forma)} | {medida['destinos']} destinos "
+                  f"| {medida['n_estimators']} árboles: {args.metrica} {medida[args.metrica]*100:.2f}% "
+                  f"| {medida['tamano_bytes'] / 1024 / 1024:.1f} MB")
+        executor.shutdown()
+        print(f"[OK] Formas entrenadas en {time.time() - t0:.1f} segundos")
+
+        # Latencia y RSS de a un modelo, sin entrenamientos en paralelo que compitan por la CPU
+        print("\n" + "=" * 70)
+        print(f"MIDIENDO LATENCIA Y RSS DE {len(pendientes)} FORMAS")
+        print("=" * 70)
+        t0 = time.time()
+        for i, forma in enumerate(pendientes, 1):
+            modelo, medidas = modelos.cargar(clave_forma(forma))
+            for medida in medir_forma(modelo, medidas, datos['X_test'], args.repeticiones):
+                n = medida.pop('n_estimators')
+                resultados.guardar({
+                    'clave': clave_de(forma, n),
+                    **base,
+                    'configuracion': configuracion_de(forma, n),
+                    **medida,
+                    'fecha': datetime.now().isoformat(timespec='seconds')
+                })
+            modelos.eliminar(clave_forma(forma))
+            print(f"  [{i}/{len(pendientes)}] {json.dumps(forma)} | {n} árboles: "
+                  f"p99 {medida['latencia_p99_ms']:.2f} ms | RSS {medida['rss_mb']:.0f} MB")
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print(f"\n[INFO] Optimización interrumpida: {len(resultados)} configuraciones guardadas en {resultados_path}")
+        print("       Volver a ejecutar con los mismos argumentos para reanudar")
+        return
+    print(f"[OK] Formas medidas en {time.time() - t0:.1f} segundos")
+
+    pruebas = [resultados.obtener(clave_de(forma, n)) for forma in formas for n in arboles]
+    frontera = frontera_pareto(pruebas, args.metrica)
+    candidatas = [prueba for prueba in pruebas if cumple_presupuestos(prueba, presupuestos)]
+    mejor = min(candidatas, key=lambda p: (-p[args.metrica], p['tamano_bytes']), default=None)
+    escribir_reporte(reporte_path, args, datos, presupuestos, pruebas, frontera, mejor)
+
+    print("\n" + "=" * 70)
+    print(f"FRONTERA DE PARETO ({len(frontera)} de {len(pruebas)} configuraciones)")
+    print("=" * 70)
+    for prueba in frontera:
+        marca = "[OK]" if cumple_presupuestos(prueba, presupuestos) else "    "
+        print(f"{marca} {args.metrica} {prueba[args.metrica]*100:.2f}% "
+              f"| {prueba['tamano_bytes'] / 1024 / 1024:.1f} MB | p99 {prueba['latencia_p99_ms']:.2f} ms "
+              f"| RSS {prueba['rss_mb']:.0f} MB")
+        c = prueba['configuracion']
+        print(f"     árboles {c['n_estimators']} | profundidad {c['max_depth']} "
+              f"| hoja {c['min_samples_leaf']} | umbral {c['min_registros_destino']}")
+
+    print("\n" + "=" * 70)
+    print("[OK] PROCESO COMPLETADO")
+    print("=" * 70)
+    print(f"Reporte: {reporte_path}")
+    if mejor is None:
+        print(f"[ADVERTENCIA] Ninguna de las {len(pruebas)} configuraciones entra en los presupuestos")
+        return
+
+    directorio = os.path.dirname(mejor_path)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(mejor_path, 'w', encoding='utf-8') as f:
+        json.dump(mejor['configuracion'], f, indent=2)
+    print(f"Mejor configuración dentro del presupuesto: {json.dumps(mejor['configuracion'])}")
+    print(f"  - {args.metrica}: {mejor[args.metrica]*100:.2f}% | {mejor['tamano_bytes'] / 1024 / 1024:.2f} MB "
+          f"| p99 {mejor['latencia_p99_ms']:.2f} ms | RSS {mejor['rss_mb']:.0f} MB")
+    print(f"Guardada en: {mejor_path}")
+    print(f"Para entrenar con ella: python {modulo.__name__}.py --hiperparametros {mejor_path}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
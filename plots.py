@@ -3,46 +3,149 @@ Página de visualizaciones interactivas con Altair
 Implementa 2-3 visualizaciones aplicando principios de gramática de gráficos
 """
 
+import functools
+import time
 import streamlit as st
 import pandas as pd
 import numpy as np
 import altair as alt
-import os
-import seaborn as sns
-import matplotlib.pyplot as plt
 import folium
-from streamlit_folium import st_folium
+import streamlit.components.v1 as components
+from folium.utilities import JsCode
+from agregados import load_cubo, load_matriz_od, huella_dataset
+from estaciones import load_dimension_estaciones
+from render_od import (CacheRenders, LIMITE_HEATMAP_IMAGEN, MODO_ALTAIR, MODO_IMAGEN,
+                       heatmap_altair, heatmap_png, load_cache_renders, modo_automatico)
 # from lib import load_model  # No se usa directamente
 
-def plots_page():
-    st.title("📊 Visualizaciones Interactivas")
-    st.markdown("---")
+# Radio (metros) para contar estaciones cercanas en el popup del mapa
+RADIO_CERCANIA_M = 500
+
+# Aplica a cada CircleMarker del GeoJSON el radio y color precalculados en sus propiedades
+ESTILO_ESTACION_JS = JsCode("""
+function(feature, layer) {
+    layer.setStyle({radius: feature.properties.radio, fillColor: feature.properties.color});
+}
+""")
+
+
+def fragmento(funcion):
+    """st.fragment si la versión de Streamlit lo soporta (>= 1.37); si no, la función tal cual"""
+    return st.fragment(funcion) if hasattr(st, 'fragment') else funcion
+
+
+def medir_seccion(nombre):
+    """Mide cada ejecución de la sección y la muestra al pie (tiempo y número de ejecución).
+
+    Los tiempos quedan también en st.session_state['tiempos_secciones'] para inspeccionarlos.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = funcion(*args, **kwargs)
+            ms = (time.perf_counter() - inicio) * 1000
+            tiempos = st.session_state.setdefault('tiempos_secciones', {})
+            ejecuciones = tiempos.get(nombre, {}).get('ejecuciones', 0) + 1
+            tiempos[nombre] = {'ms': ms, 'ejecuciones': ejecuciones}
+            st.caption(f"⏱️ {nombre}: {ms:,.0f} ms (ejecución #{ejecuciones})")
+            return resultado
+        return envoltura
+    return decorador
+
+
+def meses_del_filtro(mes_numero, meses_temporada):
+    """Meses que dejan pasar los filtros de mes y temporada (None = todos)"""
+    if mes_numero is None:
+        return meses_temporada
+    if meses_temporada is not None and mes_numero not in meses_temporada:
+        return []
+    return [mes_numero]
+
+
+def frecuencias_estaciones(cubo):
+    """Viajes por estación como origen, como destino y en total (solo estaciones con viajes)"""
+    origen = cubo.contar(('origen',))
+    destino = cubo.contar(('destino',))
+    presentes = np.flatnonzero(origen + destino)
+    return pd.DataFrame({
+        'estacion': cubo.estaciones[presentes],
+        'frecuencia_origen': origen[presentes],
+        'frecuencia_destino': destino[presentes],
+        'frecuencia_total': origen[presentes] + destino[presentes]
+    })
+
+
+def geojson_estaciones(cubo, dimension):
+    """FeatureCollection con una estación por punto y su radio, color, popup y tooltip ya calculados.
+
+    Coordenadas: las del primer viaje desde la estación; si nunca fue origen, las del catálogo
+    (dimensión de estaciones).
+    """
+    frecuencias = frecuencias_estaciones(cubo)
+    codigos = np.searchsorted(cubo.estaciones, frecuencias['estacion'].to_numpy())
+    lat = cubo.lat_origen[codigos].copy()
+    lon = cubo.lon_origen[codigos].copy()
+    ids = dimension.ids(cubo.estaciones[codigos])
+    faltan = (np.isnan(lat) | np.isnan(lon)) & (ids >= 0)
+    lat[faltan] = dimension.lat[ids[faltan]]
+    lon[faltan] = dimension.lon[ids[faltan]]
+    frecuencias['lat'] = lat
+    frecuencias['lon'] = lon
+    frecuencias = frecuencias.dropna(subset=['lat', 'lon'])
+    
+    # Otras estaciones del catálogo a menos de RADIO_CERCANIA_M (consulta por lotes al índice espacial)
+    lat, lon = frecuencias['lat'].to_numpy(), frecuencias['lon'].to_numpy()
+    propia = dimension.ajustar(lat, lon, tolerancia_m=1.0) >= 0
+    frecuencias['cercanas'] = dimension.contar_en_radio(lat, lon, RADIO_CERCANIA_M) - propia
+    
+    # Tamaño del círculo (entre 5 y 30) y color (rojo más intenso = mayor frecuencia)
+    proporcion = frecuencias['frecuencia_total'] / frecuencias['frecuencia_total'].max()
+    frecuencias['radio'] = 5 + proporcion * 25
+    frecuencias['color'] = ['#%02x0000' % intensidad for intensidad in (proporcion * 255).astype(int)]
+    frecuencias['tooltip'] = (frecuencias['estacion'] + ': ' +
+                              frecuencias['frecuencia_total'].map('{:,.0f}'.format) + ' viajes')
+    frecuencias['popup'] = (
+        '<b>' + frecuencias['estacion'] + '</b><br>'
+        'Frecuencia Total: ' + frecuencias['frecuencia_total'].map('{:,.0f}'.format) + '<br>'
+        'Como Origen: ' + frecuencias['frecuencia_origen'].map('{:,.0f}'.format) + '<br>'
+        'Como Destino: ' + frecuencias['frecuencia_destino'].map('{:,.0f}'.format) + '<br>'
+        f'Estaciones a menos de {RADIO_CERCANIA_M} m: ' + frecuencias['cercanas'].astype(str) + '<br>'
+        'Lat: ' + frecuencias['lat'].map('{:.5f}'.format) + ', Lon: ' + frecuencias['lon'].map('{:.5f}'.format)
+    )
     
-    # Cargar datos del dataset
-    try:
-        # Intentar diferentes rutas posibles
-        dataset_paths = [
-            "dataset_modelo_final.csv",
-            "../prediccion/dataset_modelo_final.csv",
-            "../../prediccion/dataset_modelo_final.csv"
+    propiedades = frecuencias[['estacion', 'radio', 'color', 'tooltip', 'popup']].to_dict('records')
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [x, y]}, 'properties': p}
+            for x, y, p in zip(frecuencias['lon'].tolist(), frecuencias['lat'].tolist(), propiedades)
         ]
-        df = None
-        for path in dataset_paths:
-            try:
-                if os.path.exists(path):
-                    df = pd.read_csv(path)
-                    st.success(f"Dataset cargado: {len(df):,} registros desde {path}")
-                    break
-            except FileNotFoundError:
-                continue
-        
-        if df is None:
-            st.warning("⚠️ No se encontró el dataset. Las visualizaciones de datos no estarán disponibles.")
-            st.info("💡 Puedes copiar el dataset desde la carpeta prediccion/ a esta carpeta o ajustar la ruta.")
-            return
-    except Exception as e:
-        st.error(f"Error al cargar el dataset: {e}")
-        return
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def html_mapa_estaciones(csv_path, huella):
+    """HTML del mapa de calor de estaciones (todos los meses), cacheado por huella del dataset"""
+    cubo, _ = load_cubo([csv_path])
+    
+    # Centro de Mendoza: -32.89, -68.84
+    mapa = folium.Map(location=[-32.89, -68.84], zoom_start=13, tiles='OpenStreetMap')
+    folium.GeoJson(
+        geojson_estaciones(cubo, load_dimension_estaciones([csv_path])),
+        name='Estaciones',
+        marker=folium.CircleMarker(color='darkred', fill=True, fill_opacity=0.6, weight=2),
+        on_each_feature=ESTILO_ESTACION_JS,
+        tooltip=folium.GeoJsonTooltip(fields=['tooltip'], labels=False),
+        popup=folium.GeoJsonPopup(fields=['popup'], labels=False, max_width=300)
+    ).add_to(mapa)
+    return mapa.get_root().render()
+
+
+@fragmento
+@medir_seccion("Distribución temporal")
+def seccion_distribucion_temporal(path):
+    cubo, _ = load_cubo([path])
     
     # Visualización 1: Distribución Temporal de Viajes
     st.markdown("## 1. Distribución Temporal de Viajes")
@@ -62,7 +165,7 @@ def plots_page():
             9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
         }
         
-        meses_disponibles = sorted(df['mes'].unique())
+        meses_disponibles = cubo.meses_disponibles()
         opciones_meses = ['Todos los meses'] + [meses_nombres[m] for m in meses_disponibles]
         
         mes_seleccionado = st.selectbox(
@@ -89,49 +192,28 @@ def plots_page():
             help="Selecciona una temporada del año para filtrar los datos"
         )
     
-    # Aplicar filtros
-    df_filtrado = df.copy()
-    
-    # Filtro por mes
-    filtro_mes_aplicado = False
+    # Aplicar filtros: meses que quedan seleccionados (el cubo suma solo esos meses)
+    mes_numero = None
     if mes_seleccionado != 'Todos los meses':
         mes_numero = [k for k, v in meses_nombres.items() if v == mes_seleccionado][0]
-        df_filtrado = df_filtrado[df_filtrado['mes'] == mes_numero]
-        filtro_mes_aplicado = True
-    
-    # Filtro por temporada
-    filtro_temporada_aplicado = False
-    if temporada_seleccionada != 'Todas las temporadas':
-        meses_temporada = temporadas[temporada_seleccionada]
-        if filtro_mes_aplicado:
-            # Si ya hay un mes seleccionado, verificar que esté en la temporada
-            if mes_numero in meses_temporada:
-                # El mes ya está filtrado, no necesitamos filtrar más
-                filtro_temporada_aplicado = True
-            else:
-                # El mes seleccionado no está en la temporada, no hay datos
-                df_filtrado = df_filtrado[df_filtrado['mes'].isin([])]  # DataFrame vacío
-                filtro_temporada_aplicado = True
-        else:
-            # Solo filtrar por temporada
-            df_filtrado = df_filtrado[df_filtrado['mes'].isin(meses_temporada)]
-            filtro_temporada_aplicado = True
+    meses_filtro = meses_del_filtro(mes_numero, temporadas[temporada_seleccionada])
+    total_filtrado = int(cubo.contar((), meses_filtro))
     
     # Mostrar resumen de filtros aplicados
-    if len(df_filtrado) < len(df):
-        st.info(f"📊 Mostrando {len(df_filtrado):,} viajes de {len(df):,} totales (filtros aplicados)")
+    if total_filtrado < cubo.n_viajes:
+        st.info(f"📊 Mostrando {total_filtrado:,} viajes de {cubo.n_viajes:,} totales (filtros aplicados)")
     
     # Validar que hay datos después de filtrar
-    if len(df_filtrado) == 0:
+    if total_filtrado == 0:
         st.warning("⚠️ No hay datos disponibles para los filtros seleccionados. Por favor, ajusta los filtros.")
-        st.markdown("---")
         return
     
     st.markdown("---")
     
     # Crear visualización de distribución por hora
-    hora_counts = df_filtrado['hora_salida'].value_counts().sort_index().reset_index()
-    hora_counts.columns = ['hora', 'cantidad_viajes']
+    viajes_por_hora = cubo.contar(('hora_salida',), meses_filtro)
+    horas = np.flatnonzero(viajes_por_hora)
+    hora_counts = pd.DataFrame({'hora': horas, 'cantidad_viajes': viajes_por_hora[horas]})
     
     chart2a = (
         alt.Chart(hora_counts)
@@ -158,8 +240,12 @@ def plots_page():
     )
     
     st.altair_chart(chart2a, width='stretch')
-    
-    st.markdown("---")
+
+
+@fragmento
+@medir_seccion("Top destinos")
+def seccion_top_destinos(path):
+    cubo, _ = load_cubo([path])
     
     # Visualización 2: Análisis Geográfico - Top Destinos
     st.markdown("## 2. Top Destinos Más Frecuentes")
@@ -179,7 +265,7 @@ def plots_page():
             9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
         }
         
-        meses_disponibles_dest = sorted(df['mes'].unique())
+        meses_disponibles_dest = cubo.meses_disponibles()
         opciones_meses_dest = ['Todos los meses'] + [meses_nombres_dest[m] for m in meses_disponibles_dest]
         
         mes_seleccionado_dest = st.selectbox(
@@ -209,43 +295,26 @@ def plots_page():
         )
     
     # Aplicar filtros temporales
-    df_filtrado_dest = df.copy()
-    
-    # Filtro por mes
-    filtro_mes_aplicado_dest = False
+    mes_numero_dest = None
     if mes_seleccionado_dest != 'Todos los meses':
         mes_numero_dest = [k for k, v in meses_nombres_dest.items() if v == mes_seleccionado_dest][0]
-        df_filtrado_dest = df_filtrado_dest[df_filtrado_dest['mes'] == mes_numero_dest]
-        filtro_mes_aplicado_dest = True
-    
-    # Filtro por temporada
-    filtro_temporada_aplicado_dest = False
-    if temporada_seleccionada_dest != 'Todas las temporadas':
-        meses_temporada_dest = temporadas_dest[temporada_seleccionada_dest]
-        if filtro_mes_aplicado_dest:
-            if mes_numero_dest in meses_temporada_dest:
-                filtro_temporada_aplicado_dest = True
-            else:
-                df_filtrado_dest = df_filtrado_dest[df_filtrado_dest['mes'].isin([])]
-                filtro_temporada_aplicado_dest = True
-        else:
-            df_filtrado_dest = df_filtrado_dest[df_filtrado_dest['mes'].isin(meses_temporada_dest)]
-            filtro_temporada_aplicado_dest = True
+    meses_filtro_dest = meses_del_filtro(mes_numero_dest, temporadas_dest[temporada_seleccionada_dest])
+    total_filtrado_dest = int(cubo.contar((), meses_filtro_dest))
     
     # Mostrar resumen de filtros aplicados
-    if len(df_filtrado_dest) < len(df):
-        st.info(f"📊 Mostrando {len(df_filtrado_dest):,} viajes de {len(df):,} totales (filtros aplicados)")
+    if total_filtrado_dest < cubo.n_viajes:
+        st.info(f"📊 Mostrando {total_filtrado_dest:,} viajes de {cubo.n_viajes:,} totales (filtros aplicados)")
     
     # Validar que hay datos después de filtrar
-    if len(df_filtrado_dest) == 0:
+    if total_filtrado_dest == 0:
         st.warning("⚠️ No hay datos disponibles para los filtros seleccionados. Por favor, ajusta los filtros.")
         st.markdown("---")
     else:
         # Top destinos (mostrar top 15)
-        top_destinos = df_filtrado_dest['destino'].value_counts().head(15).reset_index()
+        top_destinos = cubo.top_estaciones('destino', 15, meses_filtro_dest).reset_index()
         
         top_destinos.columns = ['destino', 'cantidad_viajes']
-        top_destinos['porcentaje'] = (top_destinos['cantidad_viajes'] / len(df_filtrado_dest) * 100).round(2)
+        top_destinos['porcentaje'] = (top_destinos['cantidad_viajes'] / total_filtrado_dest * 100).round(2)
         
         titulo_grafico = 'Top 15 Estaciones Destino Más Frecuentes'
         
@@ -280,18 +349,22 @@ def plots_page():
         # Estadísticas adicionales
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total de Viajes", f"{len(df_filtrado_dest):,}")
+            st.metric("Total de Viajes", f"{total_filtrado_dest:,}")
         with col2:
-            st.metric("Destinos Únicos", f"{df_filtrado_dest['destino'].nunique()}")
+            st.metric("Destinos Únicos", f"{np.count_nonzero(cubo.contar(('destino',), meses_filtro_dest))}")
         with col3:
-            st.metric("Usuarios Únicos", f"{df_filtrado_dest.get('Usuario_key', pd.Series()).nunique() if 'Usuario_key' in df_filtrado_dest.columns else 'N/A'}")
+            st.metric("Usuarios Únicos", f"{cubo.usuarios_unicos(meses_filtro_dest) if cubo.tiene_usuarios else 'N/A'}")
         with col4:
             if len(top_destinos) > 0:
                 st.metric("Destino Más Frecuente", f"{top_destinos.iloc[0]['destino'][:20]}...")
             else:
                 st.metric("Destino Más Frecuente", "N/A")
-    
-    st.markdown("---")
+
+
+@fragmento
+@medir_seccion("Mapa de estaciones")
+def seccion_mapa_estaciones(path):
+    cubo, _ = load_cubo([path])
     
     # Visualización 3: Mapa de Calor de Estaciones
     st.markdown("## 3. Mapa de Calor de Estaciones")
@@ -300,136 +373,45 @@ def plots_page():
     indican mayor cantidad de viajes (tanto como origen como destino).
     """)
     
-    if True:  # Mapa de calor siempre visible
-        # Calcular frecuencia de uso por estación (origen + destino)
-        if 'origen' in df.columns and 'destino' in df.columns:
-            # Contar apariciones como origen
-            frecuencia_origen = df['origen'].value_counts().reset_index()
-            frecuencia_origen.columns = ['estacion', 'frecuencia_origen']
-            
-            # Contar apariciones como destino
-            frecuencia_destino = df['destino'].value_counts().reset_index()
-            frecuencia_destino.columns = ['estacion', 'frecuencia_destino']
-            
-            # Combinar y sumar
-            frecuencia_total = frecuencia_origen.merge(
-                frecuencia_destino, 
-                on='estacion', 
-                how='outer'
-            ).fillna(0)
-            frecuencia_total['frecuencia_total'] = (
-                frecuencia_total['frecuencia_origen'] + 
-                frecuencia_total['frecuencia_destino']
-            )
-            
-            # Obtener coordenadas de las estaciones (si están en el CSV)
-            if 'origen_lat' in df.columns and 'origen_lon' in df.columns:
-                # Obtener coordenadas de origen
-                coords_origen = df.groupby('origen').agg({
-                    'origen_lat': 'first',
-                    'origen_lon': 'first'
-                }).reset_index()
-                coords_origen.columns = ['estacion', 'lat', 'lon']
-                
-                # Obtener coordenadas de destino desde estaciones.json
-                from lib import load_stations
-                estaciones_dict = load_stations()
-                
-                coords_destino_list = []
-                for estacion in frecuencia_total['estacion'].unique():
-                    if estacion in estaciones_dict:
-                        coords_destino_list.append({
-                            'estacion': estacion,
-                            'lat': estaciones_dict[estacion]['lat'],
-                            'lon': estaciones_dict[estacion]['lon']
-                        })
-                
-                if coords_destino_list:
-                    coords_destino = pd.DataFrame(coords_destino_list)
-                    # Combinar coordenadas
-                    coords = pd.concat([coords_origen, coords_destino]).drop_duplicates('estacion')
-                else:
-                    coords = coords_origen
-                
-                # Merge con frecuencia
-                frecuencia_con_coords = frecuencia_total.merge(
-                    coords, 
-                    on='estacion', 
-                    how='left'
-                ).dropna(subset=['lat', 'lon'])
-                
-                # Crear mapa base con Folium
-                # Centro de Mendoza: -32.89, -68.84
-                mapa = folium.Map(
-                    location=[-32.89, -68.84],
-                    zoom_start=13,
-                    tiles='OpenStreetMap'
-                )
-                
-                # Normalizar frecuencia para el tamaño de los círculos y el color
-                max_frecuencia = frecuencia_con_coords['frecuencia_total'].max()
-                min_frecuencia = frecuencia_con_coords['frecuencia_total'].min()
-                
-                # Agregar marcadores circulares para cada estación
-                for _, row in frecuencia_con_coords.iterrows():
-                    # Calcular tamaño del círculo (entre 5 y 30 metros de radio)
-                    radio = 5 + (row['frecuencia_total'] / max_frecuencia) * 25
-                    
-                    # Calcular color (rojo más intenso = mayor frecuencia)
-                    intensidad = int((row['frecuencia_total'] / max_frecuencia) * 255)
-                    color_hex = f'#{intensidad:02x}0000'
-                    
-                    # Crear círculo
-                    folium.CircleMarker(
-                        location=[row['lat'], row['lon']],
-                        radius=radio,
-                        popup=folium.Popup(
-                            f"""
-                            <b>{row['estacion']}</b><br>
-                            Frecuencia Total: {row['frecuencia_total']:,.0f}<br>
-                            Como Origen: {row['frecuencia_origen']:,.0f}<br>
-                            Como Destino: {row['frecuencia_destino']:,.0f}<br>
-                            Lat: {row['lat']:.5f}, Lon: {row['lon']:.5f}
-                            """,
-                            max_width=300
-                        ),
-                        tooltip=f"{row['estacion']}: {row['frecuencia_total']:,.0f} viajes",
-                        color='darkred',
-                        fill=True,
-                        fillColor=color_hex,
-                        fillOpacity=0.6,
-                        weight=2
-                    ).add_to(mapa)
-                
-                # Mostrar mapa
-                st_folium(mapa, width=700, height=500, returned_objects=[])
-            else:
-                st.warning("⚠️ No se encontraron coordenadas en el dataset. Usando gráfico de barras alternativo.")
-                # Gráfico alternativo de barras
-                top_estaciones = frecuencia_total.sort_values('frecuencia_total', ascending=False).head(20)
-                chart_barras = (
-                    alt.Chart(top_estaciones)
-                    .mark_bar()
-                    .encode(
-                        x=alt.X('frecuencia_total:Q', title='Frecuencia Total', axis=alt.Axis(format=',d')),
-                        y=alt.Y('estacion:N', sort='-x', title='Estación'),
-                        color=alt.Color('frecuencia_total:Q', scale=alt.Scale(scheme='reds'), legend=None),
-                        tooltip=[
-                            alt.Tooltip('estacion:N', title='Estación'),
-                            alt.Tooltip('frecuencia_total:Q', title='Frecuencia Total', format=',d')
-                        ]
-                    )
-                    .properties(
-                        width=700,
-                        height=600,
-                        title='Top 20 Estaciones por Frecuencia de Uso'
-                    )
-                )
-                st.altair_chart(chart_barras, use_container_width=True)
-        else:
-            st.warning("⚠️ No se encontraron las columnas 'origen' y 'destino' necesarias para este gráfico.")
+    # Calcular frecuencia de uso por estación (origen + destino) desde el cubo
+    frecuencia_total = frecuencias_estaciones(cubo)
     
-    st.markdown("---")
+    if cubo.tiene_coordenadas:
+        # Mapa Folium como un único GeoJSON; el HTML queda cacheado por dataset y filtro
+        html_mapa = html_mapa_estaciones(path, huella_dataset(path))
+        if hasattr(st, 'iframe'):
+            st.iframe(html_mapa, width=700, height=500)
+        else:
+            components.html(html_mapa, width=700, height=500)
+    else:
+        st.warning("⚠️ No se encontraron coordenadas en el dataset. Usando gráfico de barras alternativo.")
+        # Gráfico alternativo de barras
+        top_estaciones = frecuencia_total.sort_values('frecuencia_total', ascending=False).head(20)
+        chart_barras = (
+            alt.Chart(top_estaciones)
+            .mark_bar()
+            .encode(
+                x=alt.X('frecuencia_total:Q', title='Frecuencia Total', axis=alt.Axis(format=',d')),
+                y=alt.Y('estacion:N', sort='-x', title='Estación'),
+                color=alt.Color('frecuencia_total:Q', scale=alt.Scale(scheme='reds'), legend=None),
+                tooltip=[
+                    alt.Tooltip('estacion:N', title='Estación'),
+                    alt.Tooltip('frecuencia_total:Q', title='Frecuencia Total', format=',d')
+                ]
+            )
+            .properties(
+                width=700,
+                height=600,
+                title='Top 20 Estaciones por Frecuencia de Uso'
+            )
+        )
+        st.altair_chart(chart_barras, use_container_width=True)
+
+
+@fragmento
+@medir_seccion("Evolución mensual")
+def seccion_evolucion_mensual(path):
+    cubo, _ = load_cubo([path])
     
     # Visualización 4: Evolución Mensual - Línea de Tiempo de Tendencias
     st.markdown("## 4. Evolución Mensual: Línea de Tiempo de Tendencias")
@@ -438,185 +420,186 @@ def plots_page():
     Puedes ver las tendencias mensuales y filtrar por un mes específico para analizar patrones detallados.
     """)
     
-    # Verificar que existe la columna 'mes'
-    if 'mes' not in df.columns:
-        st.warning("⚠️ El dataset no contiene la columna 'mes' necesaria para este gráfico.")
-    else:
-        # Mapeo de meses a nombres
-        meses_nombres = {
-            1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-            5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-            9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-        }
-        
-        # Crear datos para la evolución temporal
-        # Agrupar por mes y contar viajes
-        evolucion_mensual = df.groupby('mes').size().reset_index(name='cantidad_viajes')
-        evolucion_mensual['mes_nombre'] = evolucion_mensual['mes'].map(meses_nombres)
-        
-        # Si hay columna 'semana', también podemos hacer evolución semanal
-        evolucion_semanal = None
-        if 'semana' in df.columns:
-            # Agrupar por semana y contar viajes
-            evolucion_semanal = df.groupby('semana').size().reset_index(name='cantidad_viajes')
-            # Ordenar por semana (asumiendo formato YYYY-WW)
-            evolucion_semanal = evolucion_semanal.sort_values('semana')
-        
-        # Crear gráfico principal de evolución mensual
-        chart_evolucion = (
-            alt.Chart(evolucion_mensual)
-            .mark_line(point=True, strokeWidth=3)
+    # Mapeo de meses a nombres
+    meses_nombres = {
+        1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
+        5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
+        9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+    }
+    
+    # Crear datos para la evolución temporal
+    # Agrupar por mes y contar viajes
+    viajes_por_mes = cubo.contar(('mes',))
+    meses_con_viajes = np.flatnonzero(viajes_por_mes)
+    evolucion_mensual = pd.DataFrame({'mes': meses_con_viajes, 'cantidad_viajes': viajes_por_mes[meses_con_viajes]})
+    evolucion_mensual['mes_nombre'] = evolucion_mensual['mes'].map(meses_nombres)
+    
+    # Si hay columna 'semana', también podemos hacer evolución semanal
+    evolucion_semanal = None
+    if cubo.tiene_semana:
+        # Viajes por semana (las semanas del cubo ya están ordenadas, asumiendo formato YYYY-WW)
+        viajes_por_semana = cubo.contar(('semana',))
+        semanas_con_viajes = np.flatnonzero(viajes_por_semana)
+        evolucion_semanal = pd.DataFrame({
+            'semana': cubo.semanas[semanas_con_viajes],
+            'cantidad_viajes': viajes_por_semana[semanas_con_viajes]
+        })
+        
+    # Crear gráfico principal de evolución mensual
+    chart_evolucion = (
+        alt.Chart(evolucion_mensual)
+        .mark_line(point=True, strokeWidth=3)
+        .encode(
+            x=alt.X('mes:O', 
+                   title='Mes',
+                   axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y('cantidad_viajes:Q', 
+                   title='Cantidad de Viajes',
+                   axis=alt.Axis(format=',d')),
+            tooltip=[
+                alt.Tooltip('mes_nombre:N', title='Mes'),
+                alt.Tooltip('cantidad_viajes:Q', title='Viajes', format=',d')
+            ],
+            color=alt.value('#1f77b4')
+        )
+        .properties(
+            width=700,
+            height=400,
+            title='Evolución Mensual de Viajes'
+        )
+    )
+    
+    # Agregar área debajo de la línea
+    chart_area = (
+        alt.Chart(evolucion_mensual)
+        .mark_area(opacity=0.3)
+        .encode(
+            x=alt.X('mes:O', axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y('cantidad_viajes:Q', axis=alt.Axis(format=',d')),
+            color=alt.value('#1f77b4')
+        )
+    )
+    
+    chart_final = chart_area + chart_evolucion
+    
+    st.altair_chart(chart_final, use_container_width=True)
+    
+    # Selector de mes (opcional, para filtrar el detalle)
+    meses_disponibles = cubo.meses_disponibles()
+    opciones_meses = ['Todos los meses'] + [meses_nombres[m] for m in meses_disponibles]
+    
+    mes_seleccionado_evo = st.selectbox(
+        "📅 Filtrar por Mes (Opcional)",
+        options=opciones_meses,
+        index=0,
+        help="Selecciona un mes específico para ver su evolución detallada, o 'Todos los meses' para ver la evolución completa",
+        key="mes_evolucion_selector"
+    )
+    
+    # Aplicar filtro de mes si se seleccionó uno
+    mostrar_detalle = False
+    if mes_seleccionado_evo != 'Todos los meses':
+        mes_numero = [k for k, v in meses_nombres.items() if v == mes_seleccionado_evo][0]
+        mostrar_detalle = True
+        
+        # Si hay filtro de mes, mostrar evolución por día de la semana o por semana del mes
+        viajes_por_dia = cubo.contar(('dia_semana',), [mes_numero])
+        dias_con_viajes = np.flatnonzero(viajes_por_dia)
+        evolucion_dia = pd.DataFrame({'dia_semana': dias_con_viajes, 'cantidad_viajes': viajes_por_dia[dias_con_viajes]})
+        dias_nombres = {0: 'Lunes', 1: 'Martes', 2: 'Miércoles', 3: 'Jueves', 
+                       4: 'Viernes', 5: 'Sábado', 6: 'Domingo'}
+        evolucion_dia['dia_nombre'] = evolucion_dia['dia_semana'].map(dias_nombres)
+        
+    # Si hay filtro de mes, mostrar gráfico detallado
+    if mostrar_detalle:
+        st.markdown(f"### 📊 Detalle del Mes Seleccionado: {mes_seleccionado_evo}")
+        
+        # Gráfico de evolución por día de la semana
+        chart_dia = (
+            alt.Chart(evolucion_dia)
+            .mark_bar()
             .encode(
-                x=alt.X('mes:O', 
-                       title='Mes',
-                       axis=alt.Axis(labelAngle=-45)),
+                x=alt.X('dia_nombre:N', 
+                       title='Día de la Semana',
+                       sort=['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']),
                 y=alt.Y('cantidad_viajes:Q', 
                        title='Cantidad de Viajes',
                        axis=alt.Axis(format=',d')),
+                color=alt.Color('cantidad_viajes:Q', 
+                               scale=alt.Scale(scheme='blues'),
+                               legend=None),
                 tooltip=[
-                    alt.Tooltip('mes_nombre:N', title='Mes'),
+                    alt.Tooltip('dia_nombre:N', title='Día'),
                     alt.Tooltip('cantidad_viajes:Q', title='Viajes', format=',d')
-                ],
-                color=alt.value('#1f77b4')
+                ]
             )
             .properties(
                 width=700,
-                height=400,
-                title='Evolución Mensual de Viajes'
-            )
-        )
-        
-        # Agregar área debajo de la línea
-        chart_area = (
-            alt.Chart(evolucion_mensual)
-            .mark_area(opacity=0.3)
-            .encode(
-                x=alt.X('mes:O', axis=alt.Axis(labelAngle=-45)),
-                y=alt.Y('cantidad_viajes:Q', axis=alt.Axis(format=',d')),
-                color=alt.value('#1f77b4')
+                height=300,
+                title=f'Distribución de Viajes por Día de la Semana - {mes_seleccionado_evo}'
             )
         )
+        st.altair_chart(chart_dia, use_container_width=True)
         
-        chart_final = chart_area + chart_evolucion
-        
-        st.altair_chart(chart_final, use_container_width=True)
-        
-        # Selector de mes (opcional, para filtrar el detalle)
-        meses_disponibles = sorted(df['mes'].unique())
-        opciones_meses = ['Todos los meses'] + [meses_nombres[m] for m in meses_disponibles]
-        
-        mes_seleccionado_evo = st.selectbox(
-            "📅 Filtrar por Mes (Opcional)",
-            options=opciones_meses,
-            index=0,
-            help="Selecciona un mes específico para ver su evolución detallada, o 'Todos los meses' para ver la evolución completa",
-            key="mes_evolucion_selector"
-        )
-        
-        # Aplicar filtro de mes si se seleccionó uno
-        df_filtrado_evo = df.copy()
-        mostrar_detalle = False
-        if mes_seleccionado_evo != 'Todos los meses':
-            mes_numero = [k for k, v in meses_nombres.items() if v == mes_seleccionado_evo][0]
-            df_filtrado_evo = df_filtrado_evo[df_filtrado_evo['mes'] == mes_numero]
-            mostrar_detalle = True
-            
-            # Si hay filtro de mes, mostrar evolución por día de la semana o por semana del mes
-            if 'dia_semana' in df_filtrado_evo.columns:
-                evolucion_dia = df_filtrado_evo.groupby('dia_semana').size().reset_index(name='cantidad_viajes')
-                dias_nombres = {0: 'Lunes', 1: 'Martes', 2: 'Miércoles', 3: 'Jueves', 
-                               4: 'Viernes', 5: 'Sábado', 6: 'Domingo'}
-                evolucion_dia['dia_nombre'] = evolucion_dia['dia_semana'].map(dias_nombres)
-        
-        # Si hay filtro de mes, mostrar gráfico detallado
-        if mostrar_detalle:
-            st.markdown(f"### 📊 Detalle del Mes Seleccionado: {mes_seleccionado_evo}")
-            
-            if 'dia_semana' in df_filtrado_evo.columns:
-                # Gráfico de evolución por día de la semana
-                chart_dia = (
-                    alt.Chart(evolucion_dia)
-                    .mark_bar()
-                    .encode(
-                        x=alt.X('dia_nombre:N', 
-                               title='Día de la Semana',
-                               sort=['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']),
-                        y=alt.Y('cantidad_viajes:Q', 
-                               title='Cantidad de Viajes',
-                               axis=alt.Axis(format=',d')),
-                        color=alt.Color('cantidad_viajes:Q', 
-                                       scale=alt.Scale(scheme='blues'),
-                                       legend=None),
-                        tooltip=[
-                            alt.Tooltip('dia_nombre:N', title='Día'),
-                            alt.Tooltip('cantidad_viajes:Q', title='Viajes', format=',d')
-                        ]
-                    )
-                    .properties(
-                        width=700,
-                        height=300,
-                        title=f'Distribución de Viajes por Día de la Semana - {mes_seleccionado_evo}'
-                    )
-                )
-                st.altair_chart(chart_dia, use_container_width=True)
-            
-            # Estadísticas del mes seleccionado
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Total de Viajes", f"{len(df_filtrado_evo):,}")
-            with col2:
-                if 'origen' in df_filtrado_evo.columns:
-                    origenes_unicos = df_filtrado_evo['origen'].nunique()
-                    st.metric("Estaciones Origen Únicas", origenes_unicos)
-            with col3:
-                if 'destino' in df_filtrado_evo.columns:
-                    destinos_unicos = df_filtrado_evo['destino'].nunique()
-                    st.metric("Estaciones Destino Únicas", destinos_unicos)
-        
-        # Mostrar evolución semanal si está disponible y no hay filtro de mes
-        if evolucion_semanal is not None and not mostrar_detalle:
-            st.markdown("### 📈 Evolución Semanal")
-            
-            chart_semanal = (
-                alt.Chart(evolucion_semanal)
-                .mark_line(point=True, strokeWidth=2)
-                .encode(
-                    x=alt.X('semana:N', 
-                           title='Semana',
-                           axis=alt.Axis(labelAngle=-45)),
-                    y=alt.Y('cantidad_viajes:Q', 
-                           title='Cantidad de Viajes',
-                           axis=alt.Axis(format=',d')),
-                    tooltip=[
-                        alt.Tooltip('semana:N', title='Semana'),
-                        alt.Tooltip('cantidad_viajes:Q', title='Viajes', format=',d')
-                    ],
-                    color=alt.value('#ff7f0e')
-                )
-                .properties(
-                    width=700,
-                    height=300,
-                    title='Evolución Semanal de Viajes'
-                )
-            )
-            st.altair_chart(chart_semanal, use_container_width=True)
-        
-        # Estadísticas generales
-        st.markdown("**📊 Estadísticas de Evolución:**")
+        # Estadísticas del mes seleccionado
         col1, col2, col3 = st.columns(3)
         with col1:
-            max_mes = evolucion_mensual.loc[evolucion_mensual['cantidad_viajes'].idxmax()]
-            st.metric("Mes con Más Viajes", 
-                     f"{max_mes['mes_nombre']}: {max_mes['cantidad_viajes']:,}")
+            st.metric("Total de Viajes", f"{int(viajes_por_mes[mes_numero]):,}")
         with col2:
-            min_mes = evolucion_mensual.loc[evolucion_mensual['cantidad_viajes'].idxmin()]
-            st.metric("Mes con Menos Viajes", 
-                     f"{min_mes['mes_nombre']}: {min_mes['cantidad_viajes']:,}")
+            origenes_unicos = np.count_nonzero(cubo.contar(('origen',), [mes_numero]))
+            st.metric("Estaciones Origen Únicas", origenes_unicos)
         with col3:
-            promedio = evolucion_mensual['cantidad_viajes'].mean()
-            st.metric("Promedio Mensual", f"{promedio:,.0f} viajes")
-    
-    st.markdown("---")
+            destinos_unicos = np.count_nonzero(cubo.contar(('destino',), [mes_numero]))
+            st.metric("Estaciones Destino Únicas", destinos_unicos)
+        
+    # Mostrar evolución semanal si está disponible y no hay filtro de mes
+    if evolucion_semanal is not None and not mostrar_detalle:
+        st.markdown("### 📈 Evolución Semanal")
+        
+        chart_semanal = (
+            alt.Chart(evolucion_semanal)
+            .mark_line(point=True, strokeWidth=2)
+            .encode(
+                x=alt.X('semana:N', 
+                       title='Semana',
+                       axis=alt.Axis(labelAngle=-45)),
+                y=alt.Y('cantidad_viajes:Q', 
+                       title='Cantidad de Viajes',
+                       axis=alt.Axis(format=',d')),
+                tooltip=[
+                    alt.Tooltip('semana:N', title='Semana'),
+                    alt.Tooltip('cantidad_viajes:Q', title='Viajes', format=',d')
+                ],
+                color=alt.value('#ff7f0e')
+            )
+            .properties(
+                width=700,
+                height=300,
+                title='Evolución Semanal de Viajes'
+            )
+        )
+        st.altair_chart(chart_semanal, use_container_width=True)
+        
+    # Estadísticas generales
+    st.markdown("**📊 Estadísticas de Evolución:**")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        max_mes = evolucion_mensual.loc[evolucion_mensual['cantidad_viajes'].idxmax()]
+        st.metric("Mes con Más Viajes", 
+                 f"{max_mes['mes_nombre']}: {max_mes['cantidad_viajes']:,}")
+    with col2:
+        min_mes = evolucion_mensual.loc[evolucion_mensual['cantidad_viajes'].idxmin()]
+        st.metric("Mes con Menos Viajes", 
+                 f"{min_mes['mes_nombre']}: {min_mes['cantidad_viajes']:,}")
+    with col3:
+        promedio = evolucion_mensual['cantidad_viajes'].mean()
+        st.metric("Promedio Mensual", f"{promedio:,.0f} viajes")
+
+
+@fragmento
+@medir_seccion("Matriz origen-destino")
+def seccion_matriz_od(path):
+    cubo, _ = load_cubo([path])
     
     # Visualización 5: Matriz Origen-Destino (Heatmap)
     st.markdown("## 5. Matriz de Probabilidad Origen-Destino")
@@ -626,129 +609,131 @@ def plots_page():
     Puedes seleccionar qué estaciones quieres visualizar en el heatmap.
     """)
     
-    # Verificar que existen las columnas origen y destino
-    if 'origen' not in df.columns or 'destino' not in df.columns:
-        st.warning("⚠️ El dataset no contiene las columnas 'origen' y 'destino' necesarias para este gráfico.")
-        st.info("💡 Ejecuta crear_dataset_final.py para generar el dataset con estas columnas.")
-    else:
-        # Crear DataFrame con origen y destino (similar a df_viajes)
-        df_viajes = df[['origen', 'destino']].copy()
-        
-        # Obtener todas las estaciones únicas (origen y destino)
-        todas_estaciones_origen = sorted(df_viajes["origen"].unique())
-        todas_estaciones_destino = sorted(df_viajes["destino"].unique())
-        
-        # Top 15 por origen y destino (para valores por defecto)
-        top_origen = df_viajes["origen"].value_counts().head(15).index.tolist()
-        top_destino = df_viajes["destino"].value_counts().head(15).index.tolist()
-        
-        # Selector de estaciones (opcional, si no selecciona nada usa top 15)
-        col_selector1, col_selector2 = st.columns(2)
-        
-        with col_selector1:
-            estaciones_origen_seleccionadas = st.multiselect(
-                "📍 Estaciones Origen (Opcional)",
-                options=todas_estaciones_origen,
-                default=[],
-                help="Selecciona estaciones específicas de origen. Si no seleccionas ninguna, se mostrarán las top 15 por defecto."
-            )
+    # Matriz OD de conteos enteros (se construye una vez por proceso a partir del cubo)
+    matriz_od = load_matriz_od([path])
+    
+    # Obtener todas las estaciones únicas (origen y destino)
+    todas_estaciones_origen = matriz_od.origenes()
+    todas_estaciones_destino = matriz_od.destinos()
+    
+    # Top 15 por origen y destino (para valores por defecto)
+    top_origen = matriz_od.top_origenes(15)
+    top_destino = matriz_od.top_destinos(15)
+    
+    # Selector de estaciones (opcional, si no selecciona nada usa top 15)
+    col_selector1, col_selector2 = st.columns(2)
+    
+    with col_selector1:
+        estaciones_origen_seleccionadas = st.multiselect(
+            "📍 Estaciones Origen (Opcional)",
+            options=todas_estaciones_origen,
+            default=[],
+            help="Selecciona estaciones específicas de origen. Si no seleccionas ninguna, se mostrarán las top 15 por defecto."
+        )
         
-        with col_selector2:
-            estaciones_destino_seleccionadas = st.multiselect(
-                "🎯 Estaciones Destino (Opcional)",
-                options=todas_estaciones_destino,
-                default=[],
-                help="Selecciona estaciones específicas de destino. Si no seleccionas ninguna, se mostrarán las top 15 por defecto."
-            )
+    with col_selector2:
+        estaciones_destino_seleccionadas = st.multiselect(
+            "🎯 Estaciones Destino (Opcional)",
+            options=todas_estaciones_destino,
+            default=[],
+            help="Selecciona estaciones específicas de destino. Si no seleccionas ninguna, se mostrarán las top 15 por defecto."
+        )
         
-        # Usar selección del usuario o top 15 por defecto
-        if len(estaciones_origen_seleccionadas) == 0:
-            estaciones_origen_finales = top_origen
-        else:
-            estaciones_origen_finales = estaciones_origen_seleccionadas
+    # Usar selección del usuario o top 15 por defecto
+    if len(estaciones_origen_seleccionadas) == 0:
+        estaciones_origen_finales = top_origen
+    else:
+        estaciones_origen_finales = estaciones_origen_seleccionadas
         
-        if len(estaciones_destino_seleccionadas) == 0:
-            estaciones_destino_finales = top_destino
-        else:
-            estaciones_destino_finales = estaciones_destino_seleccionadas
+    if len(estaciones_destino_seleccionadas) == 0:
+        estaciones_destino_finales = top_destino
+    else:
+        estaciones_destino_finales = estaciones_destino_seleccionadas
+        
+    tipo_heatmap = st.radio(
+        "🖼️ Tipo de Heatmap",
+        options=['Automático', 'Imagen (seaborn)', 'Interactivo (Altair)'],
+        index=0,
+        horizontal=True,
+        help=f"Automático usa la imagen anotada hasta {LIMITE_HEATMAP_IMAGEN} estaciones por eje y Altair para selecciones más grandes."
+    )
         
-        # Validar que hay estaciones para mostrar
-        if len(estaciones_origen_finales) == 0 or len(estaciones_destino_finales) == 0:
-            st.warning("⚠️ No hay estaciones disponibles para mostrar.")
+    # Validar que hay estaciones para mostrar
+    if len(estaciones_origen_finales) == 0 or len(estaciones_destino_finales) == 0:
+        st.warning("⚠️ No hay estaciones disponibles para mostrar.")
+    else:
+        # Matriz Origen x Destino, filtrada según selección
+        submatriz = matriz_od.submatriz(estaciones_origen_finales, estaciones_destino_finales)
+            
+        # Validar que hay datos después de filtrar
+        if submatriz.vacia:
+            st.warning("⚠️ No hay datos disponibles para las estaciones seleccionadas.")
         else:
-            # Matriz Origen x Destino, filtrada según selección
-            matriz_top = pd.crosstab(df_viajes["origen"], df_viajes["destino"])
-            matriz_top = matriz_top.loc[matriz_top.index.intersection(estaciones_origen_finales), 
-                                        matriz_top.columns.intersection(estaciones_destino_finales)]
+            # Orden por totales (ayuda a ver estructura) y el mismo orden en ambos ejes:
+            # el de las columnas, quedándose con las que también están en filas
+            # (si no hay estaciones en común, se usan todas las que hay, ordenadas)
+            matriz_sync = submatriz.ordenada().sincronizada()
+                
+            # Normalización por fila (probabilidad de destino dado origen)
+            matriz_norm = matriz_sync.a_dataframe(matriz_sync.normalizada_por_fila())
             
-            # Validar que hay datos después de filtrar
-            if matriz_top.empty:
-                st.warning("⚠️ No hay datos disponibles para las estaciones seleccionadas.")
+            # Render cacheado por selección (imagen seaborn o heatmap interactivo de Altair)
+            if tipo_heatmap == 'Automático':
+                modo = modo_automatico(len(matriz_sync.filas), len(matriz_sync.columnas))
             else:
-                # Orden por totales (ayuda a ver estructura)
-                filas = matriz_top.sum(axis=1).sort_values(ascending=False).index
-                cols = matriz_top.sum(axis=0).sort_values(ascending=False).index
-                matriz_top = matriz_top.loc[filas, cols]
-                
-                # Usar el mismo orden en ambos ejes
-                # Orden común: respetá el orden de columnas (cols) y quedate con las que también están en filas
-                orden_comun = cols.intersection(filas, sort=False)
-                
-                # Si no hay intersección, usar las que hay
-                if len(orden_comun) == 0:
-                    orden_comun = filas.intersection(cols, sort=False)
-                
-                # Reindexar filas y columnas con el mismo orden (cuadrada y sincronizada)
-                if len(orden_comun) > 0:
-                    matriz_sync = matriz_top.reindex(index=orden_comun, columns=orden_comun, fill_value=0)
-                else:
-                    # Si no hay intersección, usar todas las que hay pero ordenadas
-                    matriz_sync = matriz_top.copy()
-                
-                # Normalización por fila (probabilidad de destino dado origen)
-                matriz_norm = matriz_sync.div(matriz_sync.sum(axis=1), axis=0).fillna(0)
-                
-                # Crear el heatmap con matplotlib/seaborn
-                fig, ax = plt.subplots(figsize=(16, 12))
-                
-                # Convertir a porcentajes y reemplazar 0 con NaN para mejor visualización
-                matriz_plot = matriz_norm.replace(0, np.nan) * 100
-                
-                sns.heatmap(
-                    matriz_plot,
-                    annot=True, 
-                    fmt=".1f",  # mostrar valores con un decimal
-                    cmap="Purples",
-                    cbar=True,
-                    linewidths=0.6, 
-                    linecolor="#DDDDDD",
-                    square=True,
-                    ax=ax,
-                    cbar_kws={'label': 'Probabilidad (%)'}
-                )
-                
-                ax.set_title("Probabilidad de destino (%) dado origen", fontsize=16, pad=20)
-                ax.set_xlabel("Destino", fontsize=12)
-                ax.set_ylabel("Origen", fontsize=12)
-                plt.xticks(rotation=45, ha="right")
-                plt.yticks(rotation=0)
-                plt.tight_layout()
-                
-                # Mostrar en Streamlit
-                st.pyplot(fig)
-                plt.close(fig)
-                
-                # Estadísticas de la matriz
-                st.markdown("**Información de la Matriz:**")
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Estaciones Origen", len(matriz_sync))
-                with col2:
-                    st.metric("Estaciones Destino", len(matriz_sync.columns))
-                with col3:
-                    # Calcular el porcentaje de viajes cubiertos por estas estaciones
-                    total_viajes = len(df_viajes)
-                    viajes_en_matriz = matriz_sync.sum().sum()
-                    porcentaje = (viajes_en_matriz / total_viajes * 100) if total_viajes > 0 else 0
-                    st.metric("Cobertura", f"{porcentaje:.1f}%")
+                modo = MODO_IMAGEN if tipo_heatmap == 'Imagen (seaborn)' else MODO_ALTAIR
+            cache_renders = load_cache_renders()
+            clave = CacheRenders.clave(huella_dataset(path), modo, estaciones_origen_finales, estaciones_destino_finales)
+            if modo == MODO_IMAGEN:
+                st.image(cache_renders.obtener(clave, lambda: heatmap_png(matriz_norm)))
+            else:
+                st.vega_lite_chart(cache_renders.obtener(
+                    clave, lambda: heatmap_altair(matriz_norm, matriz_sync.a_dataframe())
+                ))
+            
+            # Estadísticas de la matriz
+            st.markdown("**Información de la Matriz:**")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Estaciones Origen", len(matriz_sync.filas))
+            with col2:
+                st.metric("Estaciones Destino", len(matriz_sync.columnas))
+            with col3:
+                # Porcentaje de viajes cubiertos por estas estaciones
+                st.metric("Cobertura", f"{matriz_od.cobertura(matriz_sync):.1f}%")
+
 
+def plots_page():
+    st.title("📊 Visualizaciones Interactivas")
+    st.markdown("---")
+    
+    # Cargar el cubo de conteos del dataset (se construye una vez por versión del CSV)
+    try:
+        # Intentar diferentes rutas posibles
+        dataset_paths = [
+            "dataset_modelo_final.csv",
+            "../prediccion/dataset_modelo_final.csv",
+            "../../prediccion/dataset_modelo_final.csv"
+        ]
+        cubo, path = load_cubo(dataset_paths)
+        if cubo is not None:
+            st.success(f"Dataset cargado: {cubo.n_viajes:,} registros desde {path}")
+        
+        if cubo is None:
+            st.warning("⚠️ No se encontró el dataset. Las visualizaciones de datos no estarán disponibles.")
+            st.info("💡 Puedes copiar el dataset desde la carpeta prediccion/ a esta carpeta o ajustar la ruta.")
+            return
+    except Exception as e:
+        st.error(f"Error al cargar el dataset: {e}")
+        return
+    
+    # Cada sección es un fragmento: un cambio en sus filtros vuelve a ejecutar solo esa sección
+    seccion_distribucion_temporal(path)
+    st.markdown("---")
+    seccion_top_destinos(path)
+    st.markdown("---")
+    seccion_mapa_estaciones(path)
+    st.markdown("---")
+    seccion_evolucion_mensual(path)
+    st.markdown("---")
+    seccion_matriz_od(path)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para predecir destinos de un lote de viajes desde la línea de comandos
+- Lee viajes desde CSV o Parquet (mismas columnas que el formulario del Modelo)
+- Aplica el preprocessor una sola vez sobre todas las filas
+- Hace una única llamada a predict_proba y deriva top-1 y top-k
+
+Uso:
+    python predecir_lote.py viajes.csv -o predicciones.csv --top-k 5
+"""
+
+import argparse
+import os
+import time
+
+from lib import load_model, load_preprocessor, create_preprocessor, load_viajes, predict_batch
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Predicción de destinos por lotes")
+    parser.add_argument("entrada", help="Archivo de viajes (.csv o .parquet)")
+    parser.add_argument("-o", "--salida", default="predicciones.csv",
+                        help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument("-k", "--top-k", type=int, default=5,
+                        help="Cantidad de destinos a devolver por viaje")
+    parser.add_argument("--incluir-entrada", action="store_true",
+                        help="Incluir las columnas de entrada en la salida")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("PREDICCIÓN DE DESTINOS POR LOTES")
+    print("=" * 70)
+
+    if not os.path.exists(args.entrada):
+        print(f"[ERROR] No se encontró el archivo de entrada: {args.entrada}")
+        return
+
+    modelo = load_model()
+    if modelo is None:
+        print("[ERROR] No se pudo cargar el modelo")
+        return
+
+    preprocessor = load_preprocessor()
+    if preprocessor is None:
+        preprocessor = create_preprocessor(modelo=modelo)
+
+    t0 = time.time()
+    df_viajes = load_viajes(args.entrada)
+    print(f"[OK] Viajes cargados: {len(df_viajes):,} desde {args.entrada}")
+
+    t1 = time.time()
+    predicciones = predict_batch(df_viajes, modelo, preprocessor, top_k=args.top_k)
+    tiempo_prediccion = time.time() - t1
+
+    if args.incluir_entrada:
+        predicciones = df_viajes.join(predicciones)
+
+    extension = os.path.splitext(args.salida)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        predicciones.to_parquet(args.salida, index=False)
+    else:
+        predicciones.to_csv(args.salida, index=False)
+
+    tiempo_total = time.time() - t0
+    viajes_por_segundo = len(df_viajes) / tiempo_prediccion if tiempo_prediccion > 0 else 0
+    print(f"[OK] Predicciones guardadas en: {args.salida}")
+    print(f"     Tiempo de predicción: {tiempo_prediccion:.2f} s ({viajes_por_segundo:,.0f} viajes/s)")
+    print(f"     Tiempo total: {tiempo_total:.2f} s")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
@@ -4,65 +4,113 @@
 Script para procesar usuarios del dataset y guardarlos en static/
 - Extrae usuarios únicos con sus métricas
 - Guarda en formato JSON para fácil acceso
+- Con --streaming recorre el dataset por bloques (memoria acotada, mismo resultado)
+
+Uso:
+    python procesar_usuarios.py
+    python procesar_usuarios.py --streaming --filas-por-bloque 100000
 """
 
+import argparse
 import pandas as pd
 import json
 import os
+from agregados import AgregadorPorGrupo
+from datos import FILAS_POR_BLOQUE, iterar_dataset, leer_dataset
 
-def main():
-    print("=" * 70)
-    print("PROCESAMIENTO DE USUARIOS")
-    print("=" * 70)
-    
-    # Rutas posibles del archivo CSV (priorizar el de prediccion que tiene las nuevas columnas)
-    csv_paths = [
-        "../prediccion/dataset_modelo_final.csv",
-        "prediccion/dataset_modelo_final.csv",
-        "dataset_modelo_final.csv"
-    ]
-    
-    df = None
-    csv_path_usado = None
-    
-    for csv_path in csv_paths:
-        try:
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path)
-                csv_path_usado = csv_path
-                print(f"[OK] CSV cargado desde: {csv_path}")
-                print(f"     Total de registros: {len(df):,}")
-                break
-        except Exception as e:
-            continue
-    
+# Columnas del dataset que usa el resumen de usuarios
+COLUMNAS_USUARIOS = [
+    'Usuario_key', 'origen', 'destino', 'origen_lat', 'origen_lon',
+    'viajes_totales', 'semanas_activas', 'viajes_por_semana', 'duracion_promedio_min',
+    'variedad_destinos', 'variedad_origenes', 'consistencia_horaria',
+    'distancia_promedio_usuario', 'dia_favorito',
+    'frecuencia_lunes', 'frecuencia_martes', 'frecuencia_miercoles', 'frecuencia_jueves',
+    'frecuencia_viernes', 'frecuencia_sabado', 'frecuencia_domingo',
+    'lat_destino_favorito', 'lon_destino_favorito'
+]
+
+# Agregación por usuario ('mode': el día más frecuente, el menor si hay empate)
+AGREGACIONES_USUARIO = {
+    'viajes_totales': 'first',
+    'semanas_activas': 'first',
+    'viajes_por_semana': 'first',
+    'duracion_promedio_min': 'mean',
+    'variedad_destinos': 'first',
+    'variedad_origenes': 'first',
+    'consistencia_horaria': 'mean',
+    'distancia_promedio_usuario': 'mean',
+    'dia_favorito': 'mode',
+    'frecuencia_lunes': 'first',
+    'frecuencia_martes': 'first',
+    'frecuencia_miercoles': 'first',
+    'frecuencia_jueves': 'first',
+    'frecuencia_viernes': 'first',
+    'frecuencia_sabado': 'first',
+    'frecuencia_domingo': 'first'
+}
+
+# Coordenadas del destino favorito (si existen en el CSV)
+AGREGACIONES_DESTINO_FAVORITO = {
+    'lat_destino_favorito': 'first',
+    'lon_destino_favorito': 'first'
+}
+
+ESTACIONES_EXCLUIDAS = ["Hub-prueba", "TALLER BICITRAN"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resumen de usuarios del dataset en static/usuarios.json")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Recorrer el dataset por bloques (para logs que no entran en memoria)")
+    parser.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE,
+                        help=f"Filas por bloque en modo streaming (default: {FILAS_POR_BLOQUE:,})")
+    return parser.parse_args()
+
+
+def moda(serie):
+    """Valor más frecuente (el menor si hay empate), 0 si no hay valores"""
+    modas = serie.mode()
+    return modas[0] if len(modas) > 0 else 0
+
+
+def calcular_usuario_key(df):
+    """Usuario_key para datasets que no la traen"""
+    return (
+        df['origen_lat'].round(4).astype(str) + '_' +
+        df['origen_lon'].round(4).astype(str) + '_' +
+        df['viajes_totales'].astype(str) + '_' +
+        df['semanas_activas'].astype(str)
+    )
+
+
+def usuarios_excluidos(df):
+    """Usuarios con algún viaje desde o hacia una estación excluida"""
+    return df[
+        df['origen'].isin(ESTACIONES_EXCLUIDAS) |
+        df['destino'].isin(ESTACIONES_EXCLUIDAS)
+    ]['Usuario_key'].unique()
+
+
+def resumir_usuarios(csv_paths):
+    """Resumen por usuario cargando las columnas necesarias en memoria"""
+    # Solo las columnas necesarias, desde el Parquet tipado (se genera la primera vez)
+    df, csv_path_usado = leer_dataset(COLUMNAS_USUARIOS, csv_paths)
     if df is None:
-        print("[ERROR] No se encontró dataset_modelo_final.csv")
-        print("Rutas probadas:")
-        for path in csv_paths:
-            print(f"  - {path}")
-        return
+        return None, None
+    print(f"[OK] CSV cargado desde: {csv_path_usado}")
+    print(f"     Total de registros: {len(df):,}")
     
     # Verificar que tiene Usuario_key
     if 'Usuario_key' not in df.columns:
         print("[ADVERTENCIA] No se encontró Usuario_key. Calculando...")
-        df['Usuario_key'] = (
-            df['origen_lat'].round(4).astype(str) + '_' +
-            df['origen_lon'].round(4).astype(str) + '_' +
-            df['viajes_totales'].astype(str) + '_' +
-            df['semanas_activas'].astype(str)
-        )
+        df['Usuario_key'] = calcular_usuario_key(df)
     
     # Filtrar usuarios que usen estaciones excluidas
     print("\nFiltrando usuarios que usen estaciones excluidas...")
-    estaciones_excluidas = ["Hub-prueba", "TALLER BICITRAN"]
     
     # Verificar si existen columnas origen y destino
     if 'origen' in df.columns and 'destino' in df.columns:
-        usuarios_con_estaciones_excluidas = df[
-            df['origen'].isin(estaciones_excluidas) | 
-            df['destino'].isin(estaciones_excluidas)
-        ]['Usuario_key'].unique()
+        usuarios_con_estaciones_excluidas = usuarios_excluidos(df)
         cantidad_usuarios_eliminados = len(usuarios_con_estaciones_excluidas)
         df = df[~df['Usuario_key'].isin(usuarios_con_estaciones_excluidas)]
         print(f"[OK] Eliminados {cantidad_usuarios_eliminados:,} usuarios que usaron estaciones excluidas")
@@ -72,32 +120,15 @@ def main():
     # Agrupar por usuario y obtener métricas promedio/únicas
     print("\nProcesando usuarios únicos...")
     
-    usuarios_resumen = df.groupby('Usuario_key').agg({
-        'viajes_totales': 'first',
-        'semanas_activas': 'first',
-        'viajes_por_semana': 'first',
-        'duracion_promedio_min': 'mean',
-        'variedad_destinos': 'first',
-        'variedad_origenes': 'first',
-        'consistencia_horaria': 'mean',
-        'distancia_promedio_usuario': 'mean',
-        'dia_favorito': lambda x: x.mode()[0] if len(x.mode()) > 0 else 0,
-        'frecuencia_lunes': 'first',
-        'frecuencia_martes': 'first',
-        'frecuencia_miercoles': 'first',
-        'frecuencia_jueves': 'first',
-        'frecuencia_viernes': 'first',
-        'frecuencia_sabado': 'first',
-        'frecuencia_domingo': 'first'
+    usuarios_resumen = df.groupby('Usuario_key', observed=True).agg({
+        columna: moda if operacion == 'mode' else operacion
+        for columna, operacion in AGREGACIONES_USUARIO.items()
     }).reset_index()
     
     # Agregar coordenadas de destino favorito si existen en el CSV
     if 'lat_destino_favorito' in df.columns and 'lon_destino_favorito' in df.columns:
         usuarios_resumen = usuarios_resumen.merge(
-            df.groupby('Usuario_key').agg({
-                'lat_destino_favorito': 'first',
-                'lon_destino_favorito': 'first'
-            }).reset_index(),
+            df.groupby('Usuario_key', observed=True).agg(AGREGACIONES_DESTINO_FAVORITO).reset_index(),
             on='Usuario_key',
             how='left'
         )
@@ -105,6 +136,89 @@ def main():
         usuarios_resumen['lat_destino_favorito'] = None
         usuarios_resumen['lon_destino_favorito'] = None
     
+    return usuarios_resumen, csv_path_usado
+
+
+def resumir_usuarios_streaming(csv_paths, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Mismo resumen que resumir_usuarios recorriendo el dataset por bloques.
+
+    Los agregados parciales de cada bloque se combinan en un AgregadorPorGrupo
+    (primer valor, sumas y conteos para las medias, frecuencias para la moda) y
+    los usuarios excluidos se descartan al final: como todo se agrega por usuario,
+    es equivalente a filtrar sus viajes antes de agrupar.
+    """
+    bloques, csv_path_usado = iterar_dataset(COLUMNAS_USUARIOS, csv_paths, filas_por_bloque)
+    if bloques is None:
+        return None, None
+    print(f"[OK] CSV encontrado en: {csv_path_usado} (bloques de {filas_por_bloque:,} filas)")
+
+    agregador = None
+    excluidos = set()
+    filtrar_excluidos = True
+    n_bloques = 0
+    for bloque in bloques:
+        if agregador is None:
+            if 'Usuario_key' not in bloque.columns:
+                print("[ADVERTENCIA] No se encontró Usuario_key. Calculando...")
+            filtrar_excluidos = 'origen' in bloque.columns and 'destino' in bloque.columns
+            operaciones = dict(AGREGACIONES_USUARIO)
+            if 'lat_destino_favorito' in bloque.columns and 'lon_destino_favorito' in bloque.columns:
+                operaciones.update(AGREGACIONES_DESTINO_FAVORITO)
+            agregador = AgregadorPorGrupo(['Usuario_key'], operaciones)
+
+        if 'Usuario_key' not in bloque.columns:
+            bloque = bloque.assign(Usuario_key=calcular_usuario_key(bloque))
+        if filtrar_excluidos:
+            excluidos.update(str(usuario) for usuario in usuarios_excluidos(bloque))
+        agregador.agregar(bloque)
+        n_bloques += 1
+
+    if agregador is None:
+        return pd.DataFrame(columns=['Usuario_key'] + list(AGREGACIONES_USUARIO)), csv_path_usado
+    print(f"     Total de registros: {agregador.n_filas:,} en {n_bloques} bloques")
+
+    print("\nFiltrando usuarios que usen estaciones excluidas...")
+    usuarios_resumen = agregador.resultado()
+    if filtrar_excluidos:
+        usuarios_resumen = usuarios_resumen[~usuarios_resumen.index.astype(str).isin(excluidos)]
+        print(f"[OK] Eliminados {len(excluidos):,} usuarios que usaron estaciones excluidas")
+    else:
+        print("[ADVERTENCIA] No se encontraron columnas 'origen' y 'destino' para filtrar usuarios")
+
+    print("\nProcesando usuarios únicos...")
+    usuarios_resumen = usuarios_resumen.rename_axis('Usuario_key').reset_index()
+    if 'lat_destino_favorito' not in usuarios_resumen.columns:
+        usuarios_resumen['lat_destino_favorito'] = None
+        usuarios_resumen['lon_destino_favorito'] = None
+    return usuarios_resumen, csv_path_usado
+
+
+def main():
+    args = parse_args()
+    
+    print("=" * 70)
+    print("PROCESAMIENTO DE USUARIOS")
+    print("=" * 70)
+    
+    # Rutas posibles del archivo CSV (priorizar el de prediccion que tiene las nuevas columnas)
+    csv_paths = [
+        "../prediccion/dataset_modelo_final.csv",
+        "prediccion/dataset_modelo_final.csv",
+        "dataset_modelo_final.csv"
+    ]
+    
+    if args.streaming:
+        usuarios_resumen, _ = resumir_usuarios_streaming(csv_paths, args.filas_por_bloque)
+    else:
+        usuarios_resumen, _ = resumir_usuarios(csv_paths)
+    
+    if usuarios_resumen is None:
+        print("[ERROR] No se encontró dataset_modelo_final.csv")
+        print("Rutas probadas:")
+        for path in csv_paths:
+            print(f"  - {path}")
+        return
+    
     # Crear diccionario de usuarios
     usuarios_dict = {}
     
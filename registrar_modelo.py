@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para registrar el modelo en el registro de modelos mapeables en memoria
+- Carga el .pkl (joblib) una vez y lo aplana con motor_forest
+- Guarda los arrays sin comprimir en static/registro/<nombre>/
+- Compara arranque en frío y memoria (RSS) de joblib.load contra el registro con mmap
+
+Uso:
+    python registrar_modelo.py
+    python registrar_modelo.py --solo-reporte
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lib import load_model, huella_modelo, hash_contenido_modelo
+from registro_modelos import RegistroModelos, REGISTRO_PATH, origen_desde_huella, rss_mb
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Registro de modelos mapeables en memoria")
+    parser.add_argument("--registro", default=REGISTRO_PATH,
+                        help="Directorio del registro")
+    parser.add_argument("--nombre", default=None,
+                        help="Nombre de la entrada (por defecto, el nombre del .pkl)")
+    parser.add_argument("--solo-reporte", action="store_true",
+                        help="No registrar; solo medir arranque en frío y memoria")
+    return parser.parse_args()
+
+
+def memoria_anonima_mb():
+    """Memoria anónima del proceso en MB (heap, no compartible entre procesos), None fuera de Linux.
+
+    Las páginas mapeadas desde archivo (RssFile) pertenecen al cache del sistema
+    operativo y las comparten todos los procesos que mapean el mismo archivo.
+    """
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for linea in f:
+                if linea.startswith("RssAnon:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _medir_arranque(metodo, registro_path, nombre):
+    """Se ejecuta en un proceso nuevo: carga el modelo, predice un viaje y mide tiempos y memoria"""
+    import numpy as np
+    from lib import predict_top_k
+
+    rss_inicial = rss_mb()
+    anonima_inicial = memoria_anonima_mb()
+    t0 = time.perf_counter()
+    if metodo == 'joblib':
+        modelo = load_model()
+    else:
+        modelo = RegistroModelos(registro_path).cargar(nombre)
+    tiempo_carga = time.perf_counter() - t0
+    rss_carga = rss_mb()
+
+    t1 = time.perf_counter()
+    predict_top_k(modelo, np.zeros((1, modelo.n_features_in_), dtype=np.float32), k=5)
+    tiempo_prediccion = time.perf_counter() - t1
+
+    return {
+        'tiempo_carga': tiempo_carga,
+        'tiempo_prediccion': tiempo_prediccion,
+        'rss_carga': rss_carga - rss_inicial,
+        'rss_prediccion': rss_mb() - rss_inicial,
+        'anonima': None if anonima_inicial is None else memoria_anonima_mb() - anonima_inicial
+    }
+
+
+def medir_en_proceso_nuevo(metodo, registro_path, nombre):
+    """Cada medición en un proceso nuevo para que sea un arranque en frío real"""
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+        return executor.submit(_medir_arranque, metodo, registro_path, nombre).result()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("REGISTRO DE MODELOS (MMAP)")
+    print("=" * 70)
+
+    huella = huella_modelo()
+    if huella is None:
+        print("[ERROR] No se encontró el modelo")
+        return
+
+    registro = RegistroModelos(args.registro)
+    nombre = args.nombre or os.path.splitext(os.path.basename(huella[0]))[0]
+
+    if not args.solo_reporte:
+        from motor_forest import ForestCompilado
+
+        modelo = load_model()
+        if modelo is None:
+            print("[ERROR] No se pudo cargar el modelo")
+            return
+        if not hasattr(modelo, 'estimators_'):
+            print(f"[ERROR] El registro solo admite Random Forest (el modelo es {type(modelo).__name__})")
+            return
+        t0 = time.time()
+        forest = ForestCompilado.desde_sklearn(modelo)
+        origen = origen_desde_huella(huella, sha256=hash_contenido_modelo(huella[0]))
+        destino = registro.registrar(forest, nombre, origen=origen)
+        print(f"[OK] Modelo registrado en: {destino} ({time.time() - t0:.1f} s)")
+    else:
+        # Se reporta la entrada que corresponde al modelo actual, no la de --nombre
+        nombre = registro.buscar(huella)
+        if nombre is None:
+            print(f"[ERROR] El modelo actual no está en el registro {args.registro}")
+            return
+
+    print(f"     Pickle:   {huella[1] / 1024 / 1024:,.1f} MB")
+    print(f"     Registro: {registro.tamano_mb(nombre):,.1f} MB (sin comprimir)")
+
+    print("\n[ARRANQUE EN FRÍO] (un proceso nuevo por medición)")
+    resultados = {
+        'joblib.load': medir_en_proceso_nuevo('joblib', args.registro, nombre),
+        'registro mmap': medir_en_proceso_nuevo('registro', args.registro, nombre)
+    }
+    for metodo, r in resultados.items():
+        anonima = f" | anónima +{r['anonima']:,.1f} MB" if r['anonima'] is not None else ""
+        print(f"  {metodo:<14} carga {r['tiempo_carga'] * 1000:9.1f} ms | 1ª predicción {r['tiempo_prediccion'] * 1000:7.1f} ms"
+              f" | RSS +{r['rss_carga']:,.1f} MB (tras predecir +{r['rss_prediccion']:,.1f} MB){anonima}")
+
+    mejora = resultados['joblib.load']['tiempo_carga'] / max(resultados['registro mmap']['tiempo_carga'], 1e-9)
+    print(f"\n  Carga {mejora:,.0f}x más rápida con el registro.")
+    print("  Con mmap las páginas del modelo pertenecen al cache del sistema operativo y se")
+    print("  comparten entre todos los procesos del servidor que usen la misma entrada.")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,135 @@
+"""
+Registro de modelos aplanados para inferencia compartida entre procesos
+- Cada entrada es un directorio con los arrays del forest en .npy sin comprimir
+- Los arrays se cargan con mmap: varios procesos de Streamlit comparten las mismas páginas
+- La carga es perezosa: nada se lee hasta pedir el modelo y solo se tocan los nodos recorridos
+"""
+
+import json
+import os
+import shutil
+import time
+
+from motor_forest import ForestCompilado
+
+# Directorio por defecto del registro
+REGISTRO_PATH = "static/registro"
+
+MANIFIESTO = "manifiesto.json"
+
+
+def rss_mb():
+    """Memoria residente (RSS) actual del proceso en MB"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            paginas_residentes = int(f.read().split()[1])
+        return paginas_residentes * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        # Fuera de Linux: pico de memoria (KB en Linux, bytes en macOS)
+        import resource
+        import sys
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / 1024 / 1024 if sys.platform == "darwin" else maximo / 1024
+
+
+class RegistroModelos:
+    """Directorio de modelos aplanados, identificados por nombre.
+
+    Cada entrada guarda en manifiesto.json el artefacto .pkl de origen (nombre,
+    tamaño, fecha de modificación y SHA-256) para reconocer a qué modelo
+    corresponde sin volver a cargar el pickle.
+    """
+
+    def __init__(self, directorio=REGISTRO_PATH):
+        self.directorio = directorio
+        self._cargados = {}
+
+    def _path(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def listar(self):
+        """Nombres de las entradas registradas"""
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted(
+            nombre for nombre in os.listdir(self.directorio)
+            if os.path.exists(os.path.join(self._path(nombre), MANIFIESTO))
+        )
+
+    def manifiesto(self, nombre):
+        with open(os.path.join(self._path(nombre), MANIFIESTO), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def registrar(self, forest, nombre, origen=None):
+        """Guarda un ForestCompilado bajo nombre (reemplaza la entrada si existe).
+
+        Se escribe en un directorio temporal y se renombra al final, así un
+        proceso que esté leyendo el registro nunca ve una entrada a medias.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = self._path(f".{nombre}.tmp")
+        if os.path.exists(temporal):
+            shutil.rmtree(temporal)
+
+        forest.guardar(temporal)
+        manifiesto = {
+            'nombre': nombre,
+            'creado': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'n_estimators': forest.n_estimators,
+            'n_nodos': int(len(forest.feature)),
+            'n_clases': int(len(forest.classes_)),
+            'origen': origen
+        }
+        with open(os.path.join(temporal, MANIFIESTO), 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+        destino = self._path(nombre)
+        if os.path.exists(destino):
+            shutil.rmtree(destino)
+        os.replace(temporal, destino)
+        self._cargados.pop(nombre, None)
+        return destino
+
+    def buscar(self, huella, sha256=None):
+        """Nombre de la entrada generada desde el artefacto huella (o None).
+
+        Coincide si el tamaño es igual y además coincide la fecha de modificación
+        o el SHA-256 (sha256 puede ser un callable para calcularlo solo si hace falta).
+        """
+        if huella is None:
+            return None
+        _, tamano, mtime_ns = huella
+        for nombre in self.listar():
+            origen = self.manifiesto(nombre).get('origen') or {}
+            if origen.get('tamano') != tamano:
+                continue
+            if origen.get('mtime_ns') == mtime_ns:
+                return nombre
+            if sha256 is not None:
+                if callable(sha256):
+                    sha256 = sha256()
+                if origen.get('sha256') == sha256:
+                    return nombre
+        return None
+
+    def cargar(self, nombre, mmap_mode='r'):
+        """ForestCompilado de la entrada nombre, mapeado en memoria (se reutiliza en el proceso)"""
+        if nombre not in self._cargados:
+            self._cargados[nombre] = ForestCompilado.cargar(self._path(nombre), mmap_mode=mmap_mode)
+        return self._cargados[nombre]
+
+    def tamano_mb(self, nombre):
+        """Tamaño en disco de la entrada en MB"""
+        path = self._path(nombre)
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1024 / 1024
+
+
+def origen_desde_huella(huella, sha256=None):
+    """Datos del artefacto .pkl de origen para el manifiesto"""
+    path, tamano, mtime_ns = huella
+    return {
+        'archivo': os.path.basename(path),
+        'tamano': tamano,
+        'mtime_ns': mtime_ns,
+        'sha256': sha256
+    }
@@ -0,0 +1,158 @@
+"""
+Render del heatmap de probabilidad origen-destino
+- Imagen PNG con seaborn (igual al heatmap original) o spec interactivo de Altair (mark_rect)
+- Cache LRU compartida por todas las sesiones, indexada por huella del dataset y
+  selección ordenada de estaciones: repetir una combinación no vuelve a dibujar
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+import altair as alt
+import numpy as np
+import seaborn as sns
+import streamlit as st
+from matplotlib.figure import Figure
+
+# A partir de este tamaño (filas o columnas) el modo automático usa Altair en lugar de la imagen
+LIMITE_HEATMAP_IMAGEN = 30
+
+# Modos de render del heatmap
+MODO_IMAGEN = 'imagen'
+MODO_ALTAIR = 'altair'
+
+
+def modo_automatico(n_filas, n_columnas):
+    """Imagen anotada para selecciones chicas; Altair para las grandes"""
+    return MODO_ALTAIR if max(n_filas, n_columnas) > LIMITE_HEATMAP_IMAGEN else MODO_IMAGEN
+
+
+def heatmap_png(matriz_norm):
+    """PNG del heatmap seaborn de probabilidades (DataFrame origen x destino normalizado por fila).
+
+    Usa Figure directamente (sin pyplot) para poder dibujar desde varias sesiones a la vez.
+    """
+    fig = Figure(figsize=(16, 12))
+    ax = fig.subplots()
+
+    # Convertir a porcentajes y reemplazar 0 con NaN para mejor visualización
+    matriz_plot = matriz_norm.replace(0, np.nan) * 100
+
+    sns.heatmap(
+        matriz_plot,
+        annot=True,
+        fmt=".1f",  # mostrar valores con un decimal
+        cmap="Purples",
+        cbar=True,
+        linewidths=0.6,
+        linecolor="#DDDDDD",
+        square=True,
+        ax=ax,
+        cbar_kws={'label': 'Probabilidad (%)'}
+    )
+
+    ax.set_title("Probabilidad de destino (%) dado origen", fontsize=16, pad=20)
+    ax.set_xlabel("Destino", fontsize=12)
+    ax.set_ylabel("Origen", fontsize=12)
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_rotation(45)
+        etiqueta.set_horizontalalignment("right")
+    for etiqueta in ax.get_yticklabels():
+        etiqueta.set_rotation(0)
+    fig.tight_layout()
+
+    # Mismos parámetros que usa st.pyplot
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def heatmap_altair(matriz_norm, matriz_conteos):
+    """Spec Vega-Lite de un heatmap interactivo (mark_rect) con tooltip de probabilidad y viajes"""
+    datos = matriz_norm.stack().rename('probabilidad').reset_index()
+    datos['probabilidad'] = datos['probabilidad'] * 100
+    datos['viajes'] = matriz_conteos.stack().to_numpy()
+    datos = datos[datos['viajes'] > 0]
+
+    orden_origen = list(matriz_norm.index)
+    orden_destino = list(matriz_norm.columns)
+    # Los valores se agregan después de to_dict: la matriz completa (estaciones²) supera el límite
+    # de filas de Altair para DataFrames y validar cada fila contra el schema lleva segundos
+    chart = (
+        alt.Chart(alt.NamedData(name='matriz_od'))
+        .mark_rect(stroke='#DDDDDD', strokeWidth=0.3)
+        .encode(
+            x=alt.X('destino:N', title='Destino', sort=orden_destino, axis=alt.Axis(labelAngle=-45)),
+            y=alt.Y('origen:N', title='Origen', sort=orden_origen),
+            color=alt.Color('probabilidad:Q', title='Probabilidad (%)', scale=alt.Scale(scheme='purples')),
+            tooltip=[
+                alt.Tooltip('origen:N', title='Origen'),
+                alt.Tooltip('destino:N', title='Destino'),
+                alt.Tooltip('probabilidad:Q', title='Probabilidad (%)', format='.1f'),
+                alt.Tooltip('viajes:Q', title='Viajes', format=',d')
+            ]
+        )
+        .properties(
+            width=max(300, 14 * len(orden_destino)),
+            height=max(300, 14 * len(orden_origen)),
+            title='Probabilidad de destino (%) dado origen'
+        )
+    )
+    spec = chart.to_dict()
+    spec['data'] = {'values': datos.to_dict(orient='records')}
+    return spec
+
+
+class CacheRenders:
+    """Cache LRU de renders del heatmap (bytes PNG o spec de Altair).
+
+    La clave la arma quien llama: huella del dataset, modo y la selección de
+    estaciones ordenada, así el orden en que se eligieron no genera renders nuevos.
+    """
+
+    def __init__(self, max_entradas=32):
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(huella, modo, origenes, destinos):
+        return (huella, modo, tuple(sorted(origenes)), tuple(sorted(destinos)))
+
+    def obtener(self, clave, calcular):
+        """Devuelve el render cacheado para la clave o lo calcula con calcular()"""
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave]
+            self.fallos += 1
+
+        resultado = calcular()
+        with self._lock:
+            self._entradas[clave] = resultado
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return resultado
+
+    def estadisticas(self):
+        """Contadores de aciertos/fallos y ocupación del cache"""
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / total if total > 0 else 0.0,
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def load_cache_renders(max_entradas=32):
+    """Cache de renders del heatmap compartido por todas las sesiones del proceso"""
+    return CacheRenders(max_entradas=max_entradas)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servicio local de predicción con micro-lotes dinámicos (asyncio)
+- Un solo proceso carga el modelo y el preprocessor para todas las sesiones de Streamlit
+- Las solicitudes concurrentes se agrupan en un lote dentro de una ventana de espera configurable
+- HTTP sobre TCP o sobre un socket Unix; responde el mismo top-k que muestra la página del Modelo
+
+Uso:
+    python servicio_prediccion.py --puerto 8765 --espera-ms 5
+    python servicio_prediccion.py --socket /tmp/prediccion.sock
+
+La página del Modelo usa el servicio si está definida la variable de entorno
+PREDICCION_SERVICIO (por ejemplo http://127.0.0.1:8765 o unix:/tmp/prediccion.sock).
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Variable de entorno con la dirección del servicio
+VARIABLE_SERVICIO = "PREDICCION_SERVICIO"
+
+# Timeout del chequeo de salud: si el servicio no responde, la app pasa al modelo local enseguida
+TIMEOUT_SALUD_S = 0.5
+
+# Tamaño máximo de una solicitud HTTP (bytes)
+MAX_CUERPO = 1 << 20
+
+
+class MicroLotes:
+    """Agrupa solicitudes concurrentes en lotes para una sola llamada a predict_proba.
+
+    El primer elemento abre una ventana de espera_ms; todo lo que llegue dentro
+    de la ventana (hasta max_lote) se predice junto. Mientras un lote se calcula
+    en el hilo de inferencia las nuevas solicitudes se acumulan para el siguiente.
+    """
+
+    def __init__(self, predecir_lote, espera_ms=5.0, max_lote=256):
+        self.predecir_lote = predecir_lote
+        self.espera = espera_ms / 1000
+        self.max_lote = max_lote
+        self.cola = asyncio.Queue()
+        self.ejecutor = ThreadPoolExecutor(max_workers=1)
+        self.solicitudes = 0
+        self.lotes = 0
+        self.max_lote_visto = 0
+
+    async def predecir(self, fila, k):
+        futuro = asyncio.get_running_loop().create_future()
+        await self.cola.put((fila, k, futuro))
+        return await futuro
+
+    async def ejecutar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pendientes = [await self.cola.get()]
+            limite = loop.time() + self.espera
+            while len(pendientes) < self.max_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    pendientes.append(await asyncio.wait_for(self.cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+
+            filas = np.vstack([fila for fila, _, _ in pendientes])
+            k = max(k for _, k, _ in pendientes)
+            try:
+                top_classes, top_probs = await loop.run_in_executor(self.ejecutor, self.predecir_lote, filas, k)
+            except Exception as e:
+                for _, _, futuro in pendientes:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+
+            self.solicitudes += len(pendientes)
+            self.lotes += 1
+            self.max_lote_visto = max(self.max_lote_visto, len(pendientes))
+            for i, (_, k_fila, futuro) in enumerate(pendientes):
+                if not futuro.done():
+                    futuro.set_result((top_classes[i, :k_fila], top_probs[i, :k_fila]))
+
+    def estadisticas(self):
+        return {
+            'solicitudes': self.solicitudes,
+            'lotes': self.lotes,
+            'lote_medio': self.solicitudes / self.lotes if self.lotes else 0.0,
+            'lote_maximo': self.max_lote_visto,
+            'espera_ms': self.espera * 1000,
+            'max_lote': self.max_lote
+        }
+
+
+class ServicioPrediccion:
+    """Servidor HTTP mínimo: POST /predecir y GET /salud"""
+
+    def __init__(self, modelo, preprocessor, espera_ms=5.0, max_lote=256):
+        from lib import VectorizadorRapido, predict_top_k, process_input
+
+        self.modelo = modelo
+        self.preprocessor = preprocessor
+        try:
+            self.vectorizador = VectorizadorRapido(preprocessor)
+        except Exception:
+            self.vectorizador = None
+        self._process_input = process_input
+        self.lotes = MicroLotes(lambda X, k: predict_top_k(modelo, X, k=k), espera_ms, max_lote)
+        self.inicio = time.time()
+
+    def vectorizar(self, input_data):
+        """Fila de features float32 (copia: VectorizadorRapido reutiliza su buffer)"""
+        if self.vectorizador is not None:
+            return self.vectorizador.transform(input_data).copy()
+        return np.asarray(self._process_input(input_data, self.preprocessor), dtype=np.float32)
+
+    async def atender(self, reader, writer):
+        try:
+            linea = await reader.readline()
+            metodo, ruta, _ = linea.decode('latin-1').split(' ', 2)
+            largo = 0
+            while True:
+                cabecera = await reader.readline()
+                if cabecera in (b'\r\n', b'\n', b''):
+                    break
+                nombre, _, valor = cabecera.decode('latin-1').partition(':')
+                if nombre.strip().lower() == 'content-length':
+                    largo = int(valor.strip())
+            if largo > MAX_CUERPO:
+                raise ValueError("Solicitud demasiado grande")
+            cuerpo = await reader.readexactly(largo) if largo else b''
+
+            estado, respuesta = await self.responder(metodo, ruta, cuerpo)
+        except Exception as e:
+            estado, respuesta = 400, {'error': str(e)}
+
+        datos = json.dumps(respuesta, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {estado} {http.client.responses.get(estado, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(datos)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + datos
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def responder(self, metodo, ruta, cuerpo):
+        if metodo == 'GET' and ruta == '/salud':
+            return 200, {
+                'estado': 'ok',
+                'modelo': type(self.modelo).__name__,
+                'activo_s': round(time.time() - self.inicio, 1),
+                **self.lotes.estadisticas()
+            }
+        if metodo == 'POST' and ruta == '/predecir':
+            solicitud = json.loads(cuerpo or b'{}')
+            k = int(solicitud.pop('k', 5))
+            try:
+                destinos, probabilidades = await self.lotes.predecir(self.vectorizar(solicitud), k)
+            except Exception as e:
+                return 500, {'error': str(e)}
+            return 200, {
+                'destinos': np.asarray(destinos).tolist(),
+                'probabilidades': np.asarray(probabilidades, dtype=float).tolist()
+            }
+        return 404, {'error': f"Ruta no encontrada: {metodo} {ruta}"}
+
+    async def servir(self, host='127.0.0.1', puerto=8765, socket_path=None):
+        tarea_lotes = asyncio.create_task(self.lotes.ejecutar())
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            servidor = await asyncio.start_unix_server(self.atender, path=socket_path)
+        else:
+            servidor = await asyncio.start_server(self.atender, host, puerto)
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            tarea_lotes.cancel()
+
+
+class _ConexionUnix(http.client.HTTPConnection):
+    """HTTPConnection sobre un socket Unix"""
+
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ClienteServicio:
+    """Cliente síncrono del servicio (http://host:puerto o unix:/ruta/al.sock)"""
+
+    def __init__(self, direccion, timeout=5.0):
+        self.direccion = direccion
+        self.timeout = timeout
+
+    def _conexion(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if self.direccion.startswith('unix:'):
+            return _ConexionUnix(self.direccion[len('unix:'):], timeout)
+        host_puerto = self.direccion.split('://', 1)[-1].rstrip('/')
+        host, _, puerto = host_puerto.partition(':')
+        return http.client.HTTPConnection(host, int(puerto or 80), timeout=timeout)
+
+    def _solicitud(self, metodo, ruta, cuerpo=None, timeout=None):
+        conexion = self._conexion(timeout)
+        try:
+            datos = None if cuerpo is None else json.dumps(cuerpo).encode('utf-8')
+            cabeceras = {'Content-Type': 'application/json'} if datos is not None else {}
+            conexion.request(metodo, ruta, body=datos, headers=cabeceras)
+            respuesta = conexion.getresponse()
+            contenido = json.loads(respuesta.read() or b'{}')
+        finally:
+            conexion.close()
+        if respuesta.status != 200:
+            raise RuntimeError(f"Servicio de predicción: {contenido.get('error', respuesta.status)}")
+        return contenido
+
+    def salud(self, timeout=None):
+        return self._solicitud('GET', '/salud', timeout=timeout)
+
+    def predecir(self, input_data, k=5):
+        """Top-k con la misma forma que predict_top_k: arrays (1, k)"""
+        solicitud = {clave: (valor.item() if isinstance(valor, np.generic) else valor)
+                     for clave, valor in input_data.items()}
+        solicitud['k'] = k
+        respuesta = self._solicitud('POST', '/predecir', solicitud)
+        return (np.array(respuesta['destinos'], dtype=object)[np.newaxis, :],
+                np.array(respuesta['probabilidades'], dtype=np.float64)[np.newaxis, :])
+
+
+def conectar_servicio_prediccion(direccion=None, timeout=5.0, timeout_salud=TIMEOUT_SALUD_S):
+    """Cliente del servicio si está configurado y responde (en menos de timeout_salud); None en otro caso"""
+    direccion = direccion or os.environ.get(VARIABLE_SERVICIO)
+    if not direccion:
+        return None
+    cliente = ClienteServicio(direccion, timeout=timeout)
+    try:
+        cliente.salud(timeout=timeout_salud)
+    except Exception:
+        return None
+    return cliente
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servicio local de predicción con micro-lotes")
+    parser.add_argument("--host", default="127.0.0.1", help="Host TCP")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto TCP")
+    parser.add_argument("--socket", default=None, help="Ruta de socket Unix (en lugar de TCP)")
+    parser.add_argument("--espera-ms", type=float, default=5.0,
+                        help="Ventana de espera para agrupar solicitudes en un lote")
+    parser.add_argument("--max-lote", type=int, default=256, help="Tamaño máximo de lote")
+    return parser.parse_args()
+
+
+def main():
+    from lib import load_model, load_preprocessor, create_preprocessor
+    from motor_forest import compilar_modelo
+
+    args = parse_args()
+
+    print("=" * 70)
+    print("SERVICIO DE PREDICCIÓN")
+    print("=" * 70)
+
+    modelo = load_model()
+    if modelo is None:
+        print("[ERROR] No se pudo cargar el modelo")
+        return
+    preprocessor = load_preprocessor()
+    if preprocessor is None:
+        preprocessor = create_preprocessor(modelo=modelo)
+
+    servicio = ServicioPrediccion(compilar_modelo(modelo), preprocessor,
+                                  espera_ms=args.espera_ms, max_lote=args.max_lote)
+    direccion = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.puerto}"
+    print(f"[OK] Modelo cargado ({type(servicio.modelo).__name__})")
+    print(f"[OK] Escuchando en {direccion} (espera {args.espera_ms} ms, lote máx. {args.max_lote})")
+    print(f"     Para usarlo desde la app: export {VARIABLE_SERVICIO}={direccion}")
+
+    asyncio.run(servicio.servir(args.host, args.puerto, args.socket))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[OK] Servicio detenido")
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,236 @@
+"""
+Tabla materializada de top-k destinos para usuarios y estaciones conocidos
+- Precalcula el top-k para cada (usuario, estación, hora, día, mes)
+- Guarda clases (índices) y probabilidades cuantizadas como .npy sin comprimir en un
+  directorio: se cargan mapeadas en memoria y cada consulta lee solo sus páginas
+- Responde en O(1) a partir de la fila de features procesada
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import streamlit as st
+
+from lib import TABLA_TEMPORAL, hash_contenido_modelo, predict_top_k, valores_formulario_usuario
+
+# Columnas de la fila de features que identifican cada eje de la tabla
+COLUMNAS_ESTACION = ['origen_lat', 'origen_lon', 'zona_origen', 'capacidad_origen', 'estaciones_cercanas_origen']
+COLUMNAS_TEMPORALES = ['periodo_dia_numerico', 'es_fin_semana', 'es_hora_pico']
+COLUMNAS_TIEMPO = ['hora_salida', 'dia_semana', 'mes']
+
+# Escala de cuantización de probabilidades (uint16)
+ESCALA_PROBABILIDAD = 65535
+
+# Ubicaciones posibles del artefacto (directorios)
+TABLA_PATHS = [
+    "static/tabla_topk",
+    "tabla_topk"
+]
+
+# Arrays grandes de la tabla: .npy individuales mapeables en memoria
+ARRAYS_TABLA = ['clases', 'probabilidades']
+
+# Archivo con los arrays chicos (índices de usuarios, estaciones y clases)
+INDICE_TABLA = "indice.npz"
+
+# Nombre del usuario "sin seleccionar" (valores por defecto del formulario)
+USUARIO_DEFAULT = "__default__"
+
+
+class TablaTopK:
+    """Top-k precalculado con forma (n_usuarios, n_estaciones, 24, 7, 12, k).
+
+    Una fila procesada se resuelve a índices comparando sus columnas de estación
+    y de usuario con las filas exactas usadas al construir la tabla; si alguna
+    parte no coincide (entrada personalizada) consultar() devuelve None.
+    """
+
+    def __init__(self, clases, probabilidades, nombres_clases, features, filas_estaciones,
+                 filas_usuarios, nombres_usuarios, hash_modelo):
+        self.clases = clases
+        self.probabilidades = probabilidades
+        self.nombres_clases = np.asarray(nombres_clases)
+        self.features = list(features)
+        self.filas_estaciones = filas_estaciones
+        self.filas_usuarios = filas_usuarios
+        self.nombres_usuarios = list(nombres_usuarios)
+        self.hash_modelo = str(hash_modelo)
+
+        posicion = {feature: i for i, feature in enumerate(self.features)}
+        self._idx_estacion = [posicion[c] for c in COLUMNAS_ESTACION]
+        self._idx_temporal = [posicion[c] for c in COLUMNAS_TEMPORALES]
+        self._idx_tiempo = [posicion[c] for c in COLUMNAS_TIEMPO]
+        self._idx_usuario = [i for f, i in posicion.items()
+                             if f not in COLUMNAS_ESTACION + COLUMNAS_TEMPORALES + COLUMNAS_TIEMPO]
+        self._estaciones = {fila.tobytes(): i for i, fila in enumerate(filas_estaciones)}
+        self._usuarios = {fila.tobytes(): i for i, fila in enumerate(filas_usuarios)}
+
+    @property
+    def k(self):
+        return self.clases.shape[-1]
+
+    def guardar(self, directorio):
+        """Guarda la tabla en `directorio` (lo reemplaza si existe).
+
+        Se escribe en un directorio temporal único y se renombra al final: un
+        proceso que esté leyendo la tabla nunca ve una a medias.
+        """
+        padre = os.path.dirname(os.path.abspath(directorio))
+        os.makedirs(padre, exist_ok=True)
+        temporal = tempfile.mkdtemp(prefix=".tabla_topk.", dir=padre)
+        try:
+            os.chmod(temporal, 0o755)  # mkdtemp lo crea solo legible por el dueño
+            for nombre in ARRAYS_TABLA:
+                np.save(os.path.join(temporal, f"{nombre}.npy"), np.ascontiguousarray(getattr(self, nombre)))
+            self._guardar_indice(os.path.join(temporal, INDICE_TABLA))
+            if os.path.exists(directorio):
+                shutil.rmtree(directorio)
+            os.replace(temporal, directorio)
+        except BaseException:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+    def _guardar_indice(self, path):
+        np.savez_compressed(
+            path,
+            nombres_clases=self.nombres_clases.astype(str) if self.nombres_clases.dtype == object else self.nombres_clases,
+            features=np.asarray(self.features, dtype=str),
+            filas_estaciones=self.filas_estaciones,
+            filas_usuarios=self.filas_usuarios,
+            nombres_usuarios=np.asarray(self.nombres_usuarios, dtype=str),
+            hash_modelo=np.asarray(self.hash_modelo, dtype=str)
+        )
+
+    @classmethod
+    def cargar(cls, directorio, mmap_mode='r'):
+        """Carga una tabla guardada con guardar().
+
+        Con mmap_mode='r' las clases y probabilidades quedan mapeadas en memoria:
+        solo se leen del disco las páginas consultadas y los procesos de la app
+        comparten las del cache del sistema operativo.
+        """
+        arrays = {nombre: np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode=mmap_mode)
+                  for nombre in ARRAYS_TABLA}
+        with np.load(os.path.join(directorio, INDICE_TABLA), allow_pickle=False) as datos:
+            arrays.update({nombre: datos[nombre] for nombre in datos.files})
+        return cls(**arrays)
+
+    def consultar(self, fila):
+        """Devuelve (top_classes, top_probs) con forma (1, k) o None si la fila no está en la tabla"""
+        fila = np.asarray(fila, dtype=np.float32).ravel()
+        if fila.shape[0] != len(self.features):
+            return None
+
+        i_estacion = self._estaciones.get(fila[self._idx_estacion].tobytes())
+        i_usuario = self._usuarios.get(fila[self._idx_usuario].tobytes())
+        if i_estacion is None or i_usuario is None:
+            return None
+
+        hora, dia, mes = fila[self._idx_tiempo]
+        if not (hora in range(24) and dia in range(7) and mes in range(1, 13)):
+            return None
+        hora, dia, mes = int(hora), int(dia), int(mes)
+        if not np.array_equal(fila[self._idx_temporal], TABLA_TEMPORAL[hora, dia]):
+            return None
+
+        indices = np.asarray(self.clases[i_usuario, i_estacion, hora, dia, mes - 1])
+        probabilidades = np.asarray(self.probabilidades[i_usuario, i_estacion, hora, dia, mes - 1])
+        return (self.nombres_clases[indices][np.newaxis, :],
+                (probabilidades / ESCALA_PROBABILIDAD)[np.newaxis, :])
+
+
+def construir_tabla(modelo, vectorizador, dimension, usuarios, hash_modelo, k=5, progreso=None):
+    """Precalcula el top-k para todas las combinaciones de usuario, estación, hora, día y mes.
+
+    modelo debe aceptar filas float32 en el orden de vectorizador.features
+    (por ejemplo un ForestCompilado). Los usuarios incluyen los valores por
+    defecto del formulario bajo USUARIO_DEFAULT. Las estaciones son las del
+    catálogo de la dimensión (estaciones.DimensionEstaciones), en orden de ID.
+    """
+    features = vectorizador.features
+    ids_estaciones = dimension.ids_catalogo()
+    perfiles = {USUARIO_DEFAULT: valores_formulario_usuario(None, dimension)}
+    for nombre, datos in usuarios.items():
+        perfiles[nombre] = valores_formulario_usuario(datos, dimension)
+
+    # Grilla (hora, día, mes) en el orden de la tabla
+    horas, dias, meses = np.meshgrid(np.arange(24), np.arange(7), np.arange(1, 13), indexing='ij')
+    horas, dias, meses = horas.ravel(), dias.ravel(), meses.ravel()
+    temporales = TABLA_TEMPORAL[horas, dias]
+    posicion = {feature: i for i, feature in enumerate(features)}
+
+    indice_clase = {clase: i for i, clase in enumerate(modelo.classes_)}
+    dtype_clases = np.uint8 if len(modelo.classes_) <= 256 else np.uint16
+    forma = (len(perfiles), len(ids_estaciones), 24, 7, 12, k)
+    clases = np.zeros(forma, dtype=dtype_clases)
+    probabilidades = np.zeros(forma, dtype=np.uint16)
+    filas_estaciones = np.zeros((len(ids_estaciones), len(COLUMNAS_ESTACION)), dtype=np.float32)
+    filas_usuarios = None
+
+    for i_usuario, perfil in enumerate(perfiles.values()):
+        for i_estacion, id_estacion in enumerate(ids_estaciones):
+            entrada = dict(perfil)
+            entrada.update({
+                'origen_lat': float(dimension.lat[id_estacion]),
+                'origen_lon': float(dimension.lon[id_estacion]),
+                'hora_salida': 0, 'dia_semana': 0, 'mes': 1
+            })
+            fila_base = vectorizador.transform(entrada).copy()
+
+            # Misma fila para toda la grilla, cambiando solo las columnas temporales
+            X = np.repeat(fila_base, len(horas), axis=0)
+            X[:, posicion['hora_salida']] = horas
+            X[:, posicion['dia_semana']] = dias
+            X[:, posicion['mes']] = meses
+            for j, columna in enumerate(COLUMNAS_TEMPORALES):
+                X[:, posicion[columna]] = temporales[:, j]
+
+            top_classes, top_probs = predict_top_k(modelo, X, k=k)
+            clases[i_usuario, i_estacion] = np.vectorize(indice_clase.get)(top_classes).reshape(forma[2:])
+            probabilidades[i_usuario, i_estacion] = np.rint(
+                top_probs * ESCALA_PROBABILIDAD).reshape(forma[2:])
+
+            filas_estaciones[i_estacion] = fila_base[0, [posicion[c] for c in COLUMNAS_ESTACION]]
+            if filas_usuarios is None:
+                columnas_usuario = [i for f, i in posicion.items()
+                                    if f not in COLUMNAS_ESTACION + COLUMNAS_TEMPORALES + COLUMNAS_TIEMPO]
+                filas_usuarios = np.zeros((len(perfiles), len(columnas_usuario)), dtype=np.float32)
+            filas_usuarios[i_usuario] = fila_base[0, columnas_usuario]
+
+        if progreso is not None:
+            progreso(i_usuario + 1, len(perfiles))
+
+    return TablaTopK(
+        clases=clases,
+        probabilidades=probabilidades,
+        nombres_clases=np.asarray(modelo.classes_),
+        features=features,
+        filas_estaciones=filas_estaciones,
+        filas_usuarios=filas_usuarios,
+        nombres_usuarios=list(perfiles.keys()),
+        hash_modelo=hash_modelo
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_tabla_topk(huella=None):
+    """Carga la tabla materializada si existe y corresponde al modelo actual.
+
+    huella es huella_modelo(): la ruta del modelo se usa para comparar el SHA-256
+    guardado en la tabla y el resto solo invalida la cache si cambia el archivo.
+    Devuelve None si no hay tabla o si fue generada con otro modelo.
+    """
+    for path in TABLA_PATHS:
+        if os.path.isdir(path):
+            try:
+                tabla = TablaTopK.cargar(path)
+            except Exception as e:
+                print(f"Error al cargar tabla top-k desde {path}: {e}")
+                continue
+            if huella is None or tabla.hash_modelo != hash_contenido_modelo(huella[0]):
+                print(f"Tabla top-k {path} generada con otro modelo, se ignora")
+                return None
+            return tabla
+    return None